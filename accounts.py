@@ -0,0 +1,96 @@
+"""User account, subscription and per-user library queries."""
+from likes import liked_video_ids
+
+DEFAULT_AVATAR = "https://via.placeholder.com/100x100?text=User"
+DEFAULT_SUBSCRIPTIONS = ("TechReviews",)
+
+
+def authenticate(db, username, password):
+    """(id, avatar_path, bio) of the matching user, or None"""
+    return db.fetchone(
+        "SELECT id, avatar_path, bio FROM users WHERE username=? AND password=?",
+        (username, password)
+    )
+
+
+def create_user(db, username, password, avatar_path=DEFAULT_AVATAR):
+    """Insert a user with the default subscriptions and return its id.
+
+    Raises sqlite3.IntegrityError if the username is taken.
+    """
+    with db.transaction():
+        cur = db.execute(
+            "INSERT INTO users (username, password, avatar_path) VALUES (?, ?, ?)",
+            (username, password, avatar_path)
+        )
+        db.executemany(
+            "INSERT INTO subscriptions (user_id, channel_name) VALUES (?, ?)",
+            [(cur.lastrowid, channel) for channel in DEFAULT_SUBSCRIPTIONS]
+        )
+    return cur.lastrowid
+
+
+def load_user_data(db, user_id):
+    """Subscriptions, watch history, downloads and liked video ids of a user.
+
+    A user without subscriptions is given the default ones.
+    """
+    subscriptions = [
+        row[0] for row in
+        db.fetchall("SELECT channel_name FROM subscriptions WHERE user_id=?", (user_id,))
+    ]
+    if not subscriptions:
+        subscriptions = list(DEFAULT_SUBSCRIPTIONS)
+        with db.transaction():
+            db.executemany(
+                "INSERT OR IGNORE INTO subscriptions (user_id, channel_name) VALUES (?, ?)",
+                [(user_id, channel) for channel in subscriptions]
+            )
+
+    watch_history = [
+        {"id": row[0], "title": row[1], "progress": row[2], "duration": row[3]}
+        for row in db.fetchall('''
+            SELECT v.id, v.title, wh.progress, v.duration
+            FROM watch_history wh
+            JOIN videos v ON wh.video_id = v.id
+            WHERE wh.user_id = ?
+            ORDER BY wh.last_watched DESC
+        ''', (user_id,))
+    ]
+
+    downloads = [
+        {"id": row[0], "title": row[1], "path": row[2]}
+        for row in db.fetchall('''
+            SELECT v.id, v.title, d.download_path
+            FROM downloads d
+            JOIN videos v ON d.video_id = v.id
+            WHERE d.user_id = ?
+        ''', (user_id,))
+    ]
+    return {
+        "subscriptions": subscriptions,
+        "watch_history": watch_history,
+        "downloads": downloads,
+        "liked_videos": liked_video_ids(db, user_id),
+    }
+
+
+def update_profile(db, user_id, avatar_path, bio):
+    with db.transaction():
+        db.execute("UPDATE users SET avatar_path=?, bio=? WHERE id=?", (avatar_path, bio, user_id))
+
+
+def toggle_subscription(db, user_id, channel_name):
+    """Subscribe or unsubscribe; returns True if the user is now subscribed"""
+    with db.transaction():
+        cur = db.execute(
+            "DELETE FROM subscriptions WHERE user_id=? AND channel_name=?",
+            (user_id, channel_name)
+        )
+        if cur.rowcount:
+            return False
+        db.execute(
+            "INSERT INTO subscriptions (user_id, channel_name) VALUES (?, ?)",
+            (user_id, channel_name)
+        )
+    return True
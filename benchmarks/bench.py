@@ -0,0 +1,364 @@
+"""Headless benchmarks for the data and feed hot paths.
+
+Seeds a scratch database at a configurable scale with tools/generate_data.py
+and times the queries behind login, user data loading, the home feed,
+comments, progress writes, subscription toggles, channels and the
+subscription feed, likes, recommendations and trending updates, plus
+Raikun's intent matcher over a synthetic corpus of ``--intents`` intents.
+Nothing here imports Kivy, so it runs in CI.
+
+    python benchmarks/bench.py --scale medium --output results.json
+    python benchmarks/bench.py --compare baseline.json
+
+Results are JSON with per-benchmark percentiles in milliseconds and calls
+per second. With ``--compare`` the run exits non-zero if any p50 is slower
+than the baseline by more than ``--threshold``.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+from feed import FeedWindow
+from intents import Intent, IntentMatcher
+from migrations import migrate
+from progress import ProgressTracker
+from services import Services
+from tools import generate_data
+
+SCALES = {
+    "small": {"users": 100, "videos": 1000, "comments": 10000, "history": 5000},
+    "medium": {"users": 1000, "videos": 20000, "comments": 200000, "history": 100000},
+    "large": {"users": 10000, "videos": 200000, "comments": 2000000, "history": 1000000},
+}
+CATEGORIES = [category[0] for category in generate_data.CATEGORIES]
+SEARCH_TERMS = [topic[:4] for category in generate_data.CATEGORIES for topic in category[2]]
+CHANNELS = generate_data.TEMPLATE_CHANNELS
+PERCENTILES = (50, 90, 95, 99)
+INTENTS = 10000
+TRENDING_EVENTS = ("view",) * 8 + ("like", "comment")
+
+BENCHMARKS = []
+
+
+def benchmark(func):
+    BENCHMARKS.append(func)
+    return func
+
+
+def synthetic_intents(count, rng):
+    """``count`` intents with 1-4 patterns of 1-3 words, over a vocabulary that grows with them"""
+    vocabulary = [f"{term}{i}" for i in range(max(1, count // len(SEARCH_TERMS))) for term in SEARCH_TERMS]
+    return vocabulary, [
+        Intent(
+            f"intent{n}",
+            tuple(" ".join(rng.choices(vocabulary, k=rng.randint(1, 3))) for _ in range(rng.randint(1, 4))),
+            f"Reply {n}",
+            0,
+        )
+        for n in range(count)
+    ]
+
+
+class Context:
+    def __init__(self, db, scale, rng, intents=INTENTS):
+        self.db = db
+        self.scale = scale
+        self.rng = rng
+        self.intents = intents
+        self.intent_compile_seconds = None
+        self._matcher = None
+        self.services = Services(db, media_store=None, workers=1)
+        # Looked up once so the timings don't include it
+        self.usernames = [row[0] for row in db.fetchall("SELECT username FROM users ORDER BY id")]
+        # Comments are generated independently, so sampling them picks videos by popularity
+        self.commented = [row[0] for row in db.fetchall("SELECT video_id FROM comments ORDER BY id LIMIT 10000")]
+        # The model is built once; the benchmarks time ranking and serving
+        started = time.perf_counter()
+        self.services.recommendations.recommender.refresh()
+        self.recommender_build_seconds = time.perf_counter() - started
+
+    def user_id(self):
+        return self.rng.randint(1, self.scale["users"])
+
+    def username(self):
+        return self.rng.choice(self.usernames)
+
+    def video_id(self):
+        return self.rng.randint(1, self.scale["videos"])
+
+    def commented_video_id(self):
+        return self.rng.choice(self.commented) if self.commented else self.video_id()
+
+    def matcher(self):
+        """The intent matcher, compiled on first use so only intent benchmarks pay for it"""
+        if self._matcher is None:
+            self.vocabulary, intents = synthetic_intents(self.intents, random.Random(self.intents))
+            started = time.perf_counter()
+            self._matcher = IntentMatcher(intents)
+            self.intent_compile_seconds = time.perf_counter() - started
+        return self._matcher
+
+    def chat_message(self):
+        """A chat-sized message: mostly corpus words, with some that match nothing"""
+        self.matcher()
+        words = self.rng.choices(self.vocabulary, k=self.rng.randint(4, 16))
+        words.insert(self.rng.randint(0, len(words)), "please")
+        return " ".join(words)
+
+
+@benchmark
+def login(ctx):
+    ctx.services.accounts.login(ctx.username(), generate_data.PASSWORD)
+
+
+@benchmark
+def load_user_data(ctx):
+    ctx.services.accounts.user_data(ctx.user_id())
+
+
+@benchmark
+def feed_first_page(ctx):
+    FeedWindow(ctx.db).load_next()
+
+
+@benchmark
+def feed_scroll_five_pages(ctx):
+    window = FeedWindow(ctx.db)
+    for _ in range(5):
+        window.load_next()
+
+
+@benchmark
+def feed_category_page(ctx):
+    FeedWindow(ctx.db, category=ctx.rng.choice(CATEGORIES)).load_next()
+
+
+@benchmark
+def feed_search_page(ctx):
+    FeedWindow(ctx.db, search=ctx.rng.choice(SEARCH_TERMS)).load_next()
+
+
+@benchmark
+def comments_first_page(ctx):
+    ctx.services.comments.page(ctx.commented_video_id())
+
+
+@benchmark
+def progress_write(ctx):
+    tracker = ProgressTracker(ctx.db, flush_interval=0)
+    tracker.start(ctx.user_id(), ctx.video_id())
+    tracker.update(ctx.rng.uniform(0, 600), 600)
+
+
+@benchmark
+def subscription_toggle(ctx):
+    ctx.services.accounts.toggle_subscription(ctx.user_id(), ctx.rng.choice(CHANNELS))
+
+
+@benchmark
+def channel_profile(ctx):
+    ctx.services.channels.profile(ctx.rng.choice(CHANNELS))
+
+
+@benchmark
+def subscription_feed_cold(ctx):
+    user_id = ctx.user_id()
+    ctx.services.channels.invalidate(user_id)
+    ctx.services.channels.latest(user_id)
+
+
+@benchmark
+def subscription_feed_cached(ctx):
+    ctx.services.channels.latest(ctx.rng.randint(1, 5))
+
+
+@benchmark
+def video_like(ctx):
+    ctx.services.videos.set_like(ctx.user_id(), ctx.video_id(), ctx.rng.random() < 0.8)
+
+
+@benchmark
+def like_burst_flush(ctx):
+    # A viral video: a burst of likes and unlikes from many users, then one flush
+    video_id = ctx.video_id()
+    for _ in range(200):
+        ctx.services.videos.set_like(ctx.user_id(), video_id, ctx.rng.random() < 0.8)
+    ctx.services.videos.flush_likes()
+
+
+@benchmark
+def recommend_cold(ctx):
+    user_id = ctx.user_id()
+    ctx.services.recommendations.recommender.invalidate(user_id)
+    ctx.services.recommendations.for_user(user_id)
+
+
+@benchmark
+def recommend_cached(ctx):
+    # A handful of users, so the warmup calls fill the cache
+    ctx.services.recommendations.for_user(ctx.rng.randint(1, 5))
+
+
+@benchmark
+def feed_for_you_page(ctx):
+    ranked = ctx.services.recommendations.for_user(ctx.user_id())
+    FeedWindow(ctx.db, ranked=ranked).load_next()
+
+
+@benchmark
+def trending_event(ctx):
+    ctx.services.trending.index.record(ctx.commented_video_id(), ctx.rng.choice(TRENDING_EVENTS))
+
+
+@benchmark
+def trending_flush_1k_events(ctx):
+    # A few seconds of traffic at millions of events a day, skewed to popular videos
+    index = ctx.services.trending.index
+    for _ in range(1000):
+        index.record(ctx.commented_video_id(), ctx.rng.choice(TRENDING_EVENTS))
+    index.flush()
+
+
+@benchmark
+def trending_top(ctx):
+    ctx.services.trending.top()
+
+
+@benchmark
+def intent_match(ctx):
+    ctx.matcher().respond(ctx.chat_message())
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of sorted samples"""
+    rank = max(1, -(-len(samples) * p // 100))
+    return samples[int(rank) - 1]
+
+
+def run(func, ctx, repeat, warmup):
+    for _ in range(warmup):
+        func(ctx)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(ctx)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    total = sum(samples)
+    result = {"n": repeat, "min": samples[0], "max": samples[-1], "mean": total / repeat}
+    result["per_second"] = repeat * 1000 / total if total else None
+    for p in PERCENTILES:
+        result[f"p{p}"] = percentile(samples, p)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print p50 ratios against a baseline run; returns the names that regressed"""
+    regressed = []
+    for name, result in sorted(results["results"].items()):
+        base = baseline["results"].get(name)
+        if not base:
+            print(f"{name:28} {result['p50']:10.3f} ms  (new)", file=sys.stderr)
+            continue
+        ratio = result["p50"] / base["p50"] if base["p50"] else 1.0
+        flag = " REGRESSED" if ratio > threshold else ""
+        print(f"{name:28} {result['p50']:10.3f} ms  x{ratio:.2f}{flag}", file=sys.stderr)
+        if flag:
+            regressed.append(name)
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    for table in ("users", "videos", "comments", "history"):
+        parser.add_argument(f"--{table}", type=int, help=f"override the number of {table} rows")
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "amazstreme-bench", "amazstreme.db"))
+    parser.add_argument("--reuse", action="store_true", help="keep an already seeded --db")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--intents", type=int, default=INTENTS, help="size of the synthetic intent corpus")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--only", action="append", help="run just the named benchmark (repeatable)")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON results to compare p50s against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="p50 ratio counted as a regression")
+    args = parser.parse_args(argv)
+
+    scale = dict(SCALES[args.scale])
+    for table in scale:
+        if getattr(args, table) is not None:
+            scale[table] = getattr(args, table)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+    if not args.reuse:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    db = Database(args.db)
+    migrate(db)
+    started = time.perf_counter()
+    if not db.fetchone("SELECT 1 FROM videos LIMIT 1"):
+        generate_data.generate(db, seed=args.seed, **scale)
+    seed_seconds = time.perf_counter() - started
+
+    ctx = Context(db, scale, random.Random(args.seed), intents=args.intents)
+    results = {}
+    for func in BENCHMARKS:
+        if args.only and func.__name__ not in args.only:
+            continue
+        results[func.__name__] = run(func, ctx, args.repeat, args.warmup)
+    ctx.services.shutdown()
+    db.close()
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "scale": scale,
+        "seed": args.seed,
+        "seed_seconds": seed_seconds,
+        "recommender_build_seconds": ctx.recommender_build_seconds,
+        "intents": args.intents,
+        "intent_compile_seconds": ctx.intent_compile_seconds,
+        "unit": "ms",
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,7 +6,7 @@ package.name = amazstreme
 package.domain = org.amazstreme
 version = 1.0.0
 source.dir = .
-source.include_exts = py,png,jpg,kv,ttf,sqlite,mp4,db
+source.include_exts = py,png,jpg,kv,ttf,sqlite,mp4,db,json
 
 # Requirements
 requirements = 
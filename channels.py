@@ -0,0 +1,156 @@
+"""Channels and the "latest from my subscriptions" feed.
+
+Channels live in the ``channels`` table. Triggers on ``subscriptions`` and
+``videos`` keep its subscriber_count and video_count current, so showing a
+channel is one primary key read and never counts rows.
+
+The subscription feed is a k-way merge. Each subscribed channel's videos
+are read newest first from the (channel_id, created_at, id) index, a few
+rows at a time and only as the merge needs them, so a page costs one short
+index read per channel plus about ``limit`` rows, however many videos the
+channels have.
+A user's first page is cached until they change their subscriptions or
+``CACHE_TTL`` passes.
+"""
+import heapq
+import threading
+import time
+from collections import OrderedDict
+
+UPLOADS_CHANNEL = "UserUploads"
+FEED_SIZE = 50
+# Rows read per channel at a time while merging
+CHUNK_SIZE = 10
+CACHE_TTL = 120.0
+CACHE_USERS = 1000
+
+
+def _row_to_channel(row):
+    return {
+        "id": row[0],
+        "name": row[1],
+        "logo": row[2],
+        "subscriber_count": row[3],
+        "video_count": row[4],
+    }
+
+
+def get_channel(db, name):
+    """The channel called ``name`` with its counts, or None"""
+    row = db.fetchone(
+        "SELECT id, name, logo, subscriber_count, video_count FROM channels WHERE name = ?",
+        (name,)
+    )
+    return _row_to_channel(row) if row else None
+
+
+def recount_channels(db):
+    """Recompute every channel's counts, for bulk loads that ran without the count triggers"""
+    with db.transaction():
+        db.execute("UPDATE channels SET subscriber_count = 0, video_count = 0")
+        db.executemany("UPDATE channels SET subscriber_count = ? WHERE name = ?", [
+            (count, name) for name, count in
+            db.fetchall("SELECT channel_name, COUNT(*) FROM subscriptions GROUP BY channel_name")
+        ])
+        db.executemany("UPDATE channels SET video_count = ? WHERE id = ?", [
+            (count, channel_id) for channel_id, count in db.fetchall(
+                "SELECT channel_id, COUNT(*) FROM videos WHERE channel_id IS NOT NULL GROUP BY channel_id"
+            )
+        ])
+
+
+def channel_videos(db, channel_id, limit=FEED_SIZE, before=None):
+    """(created_at, id) of a channel's videos, newest first.
+
+    ``before`` is the (created_at, id) of the previous page's last video.
+    """
+    if before is None:
+        return db.fetchall('''
+            SELECT created_at, id FROM videos
+            WHERE channel_id = ?
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        ''', (channel_id, limit))
+    return db.fetchall('''
+        SELECT created_at, id FROM videos
+        WHERE channel_id = ? AND (created_at, id) < (?, ?)
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    ''', (channel_id, before[0], before[1], limit))
+
+
+def subscribed_channel_ids(db, user_id):
+    return [row[0] for row in db.fetchall('''
+        SELECT c.id
+        FROM subscriptions s
+        JOIN channels c ON c.name = s.channel_name
+        WHERE s.user_id = ?
+    ''', (user_id,))]
+
+
+def _newest_first(db, channel_id, before, chunk_size):
+    while True:
+        rows = channel_videos(db, channel_id, chunk_size, before)
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        before = tuple(rows[-1])
+        chunk_size *= 2
+
+
+def subscription_feed(db, user_id, limit=FEED_SIZE, before=None):
+    """(created_at, id) of the newest videos across the user's subscriptions, newest first"""
+    streams = [
+        _newest_first(db, channel_id, before, min(limit, CHUNK_SIZE))
+        for channel_id in subscribed_channel_ids(db, user_id)
+    ]
+    feed = []
+    for created_at, video_id in heapq.merge(*streams, reverse=True):
+        feed.append((created_at, video_id))
+        if len(feed) == limit:
+            break
+    return feed
+
+
+class SubscriptionFeedCache:
+    """Each user's first page of the subscription feed, as video ids"""
+
+    def __init__(self, db, limit=FEED_SIZE, ttl=CACHE_TTL, clock=time.monotonic):
+        self.db = db
+        self.limit = limit
+        self.ttl = ttl
+        self.clock = clock
+        self._cache = OrderedDict()  # user id -> (expires, video ids)
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def latest(self, user_id, limit=None):
+        limit = limit or self.limit
+        if limit > self.limit:
+            return [video_id for _, video_id in subscription_feed(self.db, user_id, limit)]
+        now = self.clock()
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached is not None and cached[0] >= now:
+                self._cache.move_to_end(user_id)
+                return cached[1][:limit]
+            generation = self._generation
+        # Built outside the lock so one user's merge doesn't hold up the others
+        video_ids = [video_id for _, video_id in subscription_feed(self.db, user_id, self.limit)]
+        with self._lock:
+            # An invalidation while building may mean these ids are already stale
+            if generation == self._generation:
+                self._cache[user_id] = (now + self.ttl, video_ids)
+                self._cache.move_to_end(user_id)
+                if len(self._cache) > CACHE_USERS:
+                    self._cache.popitem(last=False)
+        return video_ids[:limit]
+
+    def invalidate(self, user_id=None):
+        """Forget one user's feed, or everyone's (after an upload)"""
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(user_id, None)
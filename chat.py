@@ -0,0 +1,144 @@
+"""Persistent Raikun chat history, keyset-paginated by message id.
+
+Every message is stored per user, but only a bounded window of it is kept
+resident: the chat opens on the newest page, older pages are read when the
+user scrolls up, and pages that fall out of the window are read again by
+key when the user scrolls back to them. Opening the chat costs one indexed
+page read however long the history is.
+"""
+import threading
+
+PAGE_SIZE = 30
+MAX_RESIDENT_MESSAGES = 150
+
+
+def _row_to_message(row):
+    return {
+        "id": row[0],
+        "sender": row[1],
+        "text": row[2],
+        "is_user": bool(row[3]),
+        "timestamp": row[4],
+    }
+
+
+def fetch_messages(db, user_id, limit=PAGE_SIZE, after=None, before=None):
+    """One page of a user's messages, oldest first.
+
+    Without bounds this is the newest page. ``before`` / ``after`` are message
+    ids bounding the page from the window's first or last message.
+    """
+    query = '''
+        SELECT id, sender, text, is_user, timestamp
+        FROM chat_messages
+        WHERE user_id = ?
+    '''
+    params = [user_id]
+    if after is not None:
+        query += " AND id > ? ORDER BY id ASC"
+        params.append(after)
+    else:
+        if before is not None:
+            query += " AND id < ?"
+            params.append(before)
+        query += " ORDER BY id DESC"
+    query += " LIMIT ?"
+    params.append(limit)
+
+    rows = db.fetchall(query, params)
+    if after is None:
+        rows.reverse()
+    return [_row_to_message(row) for row in rows]
+
+
+def add_message(db, user_id, sender, text, is_user):
+    """Store a message and return it in the same shape as fetch_messages rows"""
+    with db.transaction():
+        cur = db.execute('''
+            INSERT INTO chat_messages (user_id, sender, text, is_user)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, sender, text, int(is_user)))
+    row = db.fetchone('''
+        SELECT id, sender, text, is_user, timestamp
+        FROM chat_messages
+        WHERE id = ?
+    ''', (cur.lastrowid,))
+    return _row_to_message(row)
+
+
+class ChatWindow:
+    """A bounded, scrollable window over one user's chat history.
+
+    ``messages`` holds the resident messages top (oldest) to bottom. Every
+    method returns (added, dropped), like FeedWindow, so the UI can apply the
+    change to its own list; methods are serialised, since loads and new
+    messages can run on different workers.
+    """
+
+    def __init__(self, db, user_id, page_size=PAGE_SIZE, max_messages=MAX_RESIDENT_MESSAGES):
+        self.db = db
+        self.user_id = user_id
+        self.page_size = page_size
+        self.max_messages = max(max_messages, page_size)
+        self.messages = []
+        self.at_start = True
+        self.at_end = True
+        self._lock = threading.Lock()
+
+    def load_latest(self):
+        """Replace the window with the newest page; ``dropped`` is everything it held before"""
+        with self._lock:
+            return self._load_latest()
+
+    def _load_latest(self):
+        dropped = len(self.messages)
+        self.messages = fetch_messages(self.db, self.user_id, self.page_size)
+        self.at_start = len(self.messages) < self.page_size
+        self.at_end = True
+        return list(self.messages), dropped
+
+    def load_previous(self):
+        """Prepend the page above the window; ``dropped`` messages were evicted from the bottom"""
+        with self._lock:
+            if self.at_start or not self.messages:
+                return [], 0
+            added = fetch_messages(self.db, self.user_id, self.page_size, before=self.messages[0]["id"])
+            if len(added) < self.page_size:
+                self.at_start = True
+            self.messages[:0] = added
+            dropped = max(0, len(self.messages) - self.max_messages)
+            if dropped:
+                del self.messages[len(self.messages) - dropped:]
+                self.at_end = False
+            return added, dropped
+
+    def load_next(self):
+        """Append the page below the window; ``dropped`` messages were evicted from the top"""
+        with self._lock:
+            if self.at_end or not self.messages:
+                return [], 0
+            added = fetch_messages(self.db, self.user_id, self.page_size, after=self.messages[-1]["id"])
+            if len(added) < self.page_size:
+                self.at_end = True
+            self.messages.extend(added)
+            return added, self._trim_front()
+
+    def add(self, sender, text, is_user):
+        """Store a message and show it at the bottom.
+
+        If the user had scrolled far enough up for the newest messages to be
+        evicted, the window jumps back to the newest page instead.
+        """
+        with self._lock:
+            message = add_message(self.db, self.user_id, sender, text, is_user)
+            if not self.at_end:
+                return self._load_latest()
+            self.messages.append(message)
+            return [message], self._trim_front()
+
+    def _trim_front(self):
+        dropped = max(0, len(self.messages) - self.max_messages)
+        if dropped:
+            del self.messages[:dropped]
+            self.at_start = False
+        return dropped
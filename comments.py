@@ -0,0 +1,52 @@
+"""Comment queries, keyset-paginated newest first on (timestamp, id)."""
+
+PAGE_SIZE = 30
+
+
+def _row_to_comment(row):
+    return {
+        "id": row[0],
+        "username": row[1],
+        "text": row[2],
+        "timestamp": row[3],
+    }
+
+
+def fetch_comments(db, video_id, limit=PAGE_SIZE, before=None):
+    """One page of comments for a video, newest first.
+
+    ``before`` is the (timestamp, id) of the last comment of the previous page.
+    """
+    query = '''
+        SELECT c.id, u.username, c.text, c.timestamp
+        FROM comments c
+        JOIN users u ON c.user_id = u.id
+        WHERE c.video_id = ?
+    '''
+    params = [video_id]
+    if before is not None:
+        query += " AND (c.timestamp, c.id) < (?, ?)"
+        params += list(before)
+    query += " ORDER BY c.timestamp DESC, c.id DESC LIMIT ?"
+    params.append(limit)
+    return [_row_to_comment(row) for row in db.fetchall(query, params)]
+
+
+def comment_cursor(comment):
+    return (comment["timestamp"], comment["id"])
+
+
+def add_comment(db, video_id, user_id, text):
+    """Insert a comment and return it in the same shape as fetch_comments rows"""
+    cur = db.execute('''
+        INSERT INTO comments (video_id, user_id, text)
+        VALUES (?, ?, ?)
+    ''', (video_id, user_id, text))
+    db.commit()
+    row = db.fetchone('''
+        SELECT c.id, u.username, c.text, c.timestamp
+        FROM comments c
+        JOIN users u ON c.user_id = u.id
+        WHERE c.id = ?
+    ''', (cur.lastrowid,))
+    return _row_to_comment(row)
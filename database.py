@@ -0,0 +1,131 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Database:
+    """Owns the SQLite connections used by the app.
+
+    Every thread gets its own connection, so work moved off the UI thread never
+    shares a cursor with UI callbacks. The database runs in WAL mode, which lets
+    readers proceed while a writer holds the lock.
+
+    Setting ``trace`` to a callable(sql, seconds, rows) reports every statement
+    and commit; ``rows`` is None where SQLite doesn't know it up front.
+    """
+
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA cache_size=-8000",
+    )
+
+    def __init__(self, path, timeout=5.0, cached_statements=256):
+        self.path = path
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.trace = None
+
+    def connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,
+        )
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @property
+    def connection(self):
+        """The calling thread's connection, opened on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self.connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _traced(self, sql, run, count):
+        start = time.perf_counter()
+        result = run()
+        self.trace(sql, time.perf_counter() - start, count(result))
+        return result
+
+    def execute(self, sql, params=()):
+        if self.trace is None:
+            return self.connection.execute(sql, params)
+        return self._traced(sql, lambda: self.connection.execute(sql, params), _rowcount)
+
+    def executemany(self, sql, seq_of_params):
+        if self.trace is None:
+            return self.connection.executemany(sql, seq_of_params)
+        return self._traced(sql, lambda: self.connection.executemany(sql, seq_of_params), _rowcount)
+
+    def executescript(self, script):
+        return self.connection.executescript(script)
+
+    def fetchone(self, sql, params=()):
+        if self.trace is None:
+            return self.connection.execute(sql, params).fetchone()
+        return self._traced(
+            sql, lambda: self.connection.execute(sql, params).fetchone(), lambda row: int(row is not None)
+        )
+
+    def fetchall(self, sql, params=()):
+        if self.trace is None:
+            return self.connection.execute(sql, params).fetchall()
+        return self._traced(sql, lambda: self.connection.execute(sql, params).fetchall(), len)
+
+    def commit(self):
+        if self.trace is None:
+            self.connection.commit()
+        else:
+            self._traced("COMMIT", self.connection.commit, lambda result: None)
+
+    def rollback(self):
+        self.connection.rollback()
+
+    @contextmanager
+    def transaction(self):
+        """Commit everything executed in the block, or roll it all back"""
+        conn = self.connection
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            self.commit()
+
+    def close_thread_connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            with self._lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+            conn.close()
+
+    def close(self):
+        """Close every connection opened by any thread"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+        self._local = threading.local()
+
+
+def _rowcount(cursor):
+    # -1 for SELECTs, whose rows are only counted as they are fetched
+    return cursor.rowcount if cursor.rowcount >= 0 else None
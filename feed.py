@@ -0,0 +1,195 @@
+"""Keyset-paginated home feed.
+
+The feed is read a page at a time without OFFSET: browsing walks
+``videos`` newest first by id, searching walks the FTS results by
+(score, id) and a ranked feed (recommendations) walks its list of ids by
+position. Only a bounded window of rows is kept resident; rows that fall
+out of the window are re-read by key when the user scrolls back to them.
+"""
+from search import search_videos
+
+PAGE_SIZE = 20
+MAX_RESIDENT_ROWS = 200
+
+
+def row_to_video(row, key=None):
+    """A video dict from an (id, title, likes, category, tags, file_path, channel) row"""
+    return {
+        "id": row[0],
+        "title": row[1],
+        "likes": row[2],
+        "category": row[3],
+        "tags": row[4],
+        "file_path": row[5],
+        "channel": row[6],
+        "key": key,
+    }
+
+
+def fetch_videos(db, category=None, limit=PAGE_SIZE, after=None, before=None):
+    """One page of (id, title, likes, category, tags, file_path, channel) rows, newest first.
+
+    ``after`` / ``before`` are video ids bounding the page from the previous
+    page's last row or the next page's first row.
+    """
+    query = '''
+        SELECT v.id, v.title, v.likes, v.category, v.tags, v.file_path, c.name
+        FROM videos v
+        LEFT JOIN channels c ON c.id = v.channel_id
+        WHERE 1=1
+    '''
+    params = []
+    if category:
+        query += " AND v.category = ?"
+        params.append(category)
+    if after is not None:
+        query += " AND v.id < ? ORDER BY v.id DESC"
+        params.append(after)
+    elif before is not None:
+        query += " AND v.id > ? ORDER BY v.id ASC"
+        params.append(before)
+    else:
+        query += " ORDER BY v.id DESC"
+    query += " LIMIT ?"
+    params.append(limit)
+
+    rows = db.fetchall(query, params)
+    if before is not None:
+        rows.reverse()
+    return rows
+
+
+def fetch_videos_by_id(db, video_ids):
+    """(id, title, likes, category, tags, file_path, channel) rows for ``video_ids``, in that order.
+
+    Ids that no longer exist are skipped.
+    """
+    if not video_ids:
+        return []
+    rows = db.fetchall(f'''
+        SELECT v.id, v.title, v.likes, v.category, v.tags, v.file_path, c.name
+        FROM videos v
+        LEFT JOIN channels c ON c.id = v.channel_id
+        WHERE v.id IN ({", ".join("?" * len(video_ids))})
+    ''', list(video_ids))
+    by_id = {row[0]: row for row in rows}
+    return [by_id[video_id] for video_id in video_ids if video_id in by_id]
+
+
+class FeedWindow:
+    """A bounded, scrollable window over the home feed.
+
+    ``rows`` holds the resident video dicts top to bottom. ``tail`` is a list of
+    extra entries (hard-coded channel videos, ads) shown once the database
+    results run out. ``ranked`` is a list of video ids to show in that order
+    instead of browsing or searching.
+    """
+
+    def __init__(self, db, category=None, search=None, page_size=PAGE_SIZE,
+                 max_rows=MAX_RESIDENT_ROWS, tail=(), ranked=None):
+        self.db = db
+        self.category = category
+        self.search = search
+        self.ranked = ranked
+        self.page_size = page_size
+        self.max_rows = max(max_rows, page_size + len(tail))
+        self.tail = list(tail)
+        self.rows = []
+        self.at_start = True
+        self.at_end = False
+        self._tail_shown = 0
+
+    def _fetch(self, after=None, before=None):
+        """(rows, exhausted) for the page after or before the given keys.
+
+        ``exhausted`` is True once there is nothing further in that direction.
+        """
+        if self.ranked is not None:
+            return self._fetch_ranked(after, before)
+        if self.search:
+            rows = search_videos(
+                self.db, self.search, self.category, self.page_size, after=after, before=before
+            )
+            added = [row_to_video(row[:7], (row[7], row[0])) for row in rows]
+        else:
+            rows = fetch_videos(self.db, self.category, self.page_size, after=after, before=before)
+            added = [row_to_video(row, row[0]) for row in rows]
+        return added, len(added) < self.page_size
+
+    def _ranked_rows(self, start, end):
+        video_ids = self.ranked[start:end]
+        positions = {video_id: position for position, video_id in enumerate(video_ids, start)}
+        return [row_to_video(row, positions[row[0]]) for row in fetch_videos_by_id(self.db, video_ids)]
+
+    def _fetch_ranked(self, after, before):
+        # Keyed by position in the ranking. Videos deleted since it was built
+        # are skipped, so a short read doesn't mean the ranking is used up:
+        # keep reading until the page is full or the position hits the edge.
+        rows = []
+        if before is not None:
+            end = before
+            while len(rows) < self.page_size and end > 0:
+                start = max(0, end - (self.page_size - len(rows)))
+                rows[:0] = self._ranked_rows(start, end)
+                end = start
+            return rows, end == 0
+        start = 0 if after is None else after + 1
+        while len(rows) < self.page_size and start < len(self.ranked):
+            end = min(start + self.page_size - len(rows), len(self.ranked))
+            rows.extend(self._ranked_rows(start, end))
+            start = end
+        return rows, start >= len(self.ranked)
+
+    def _last_db_key(self):
+        db_rows = len(self.rows) - self._tail_shown
+        return self.rows[db_rows - 1]["key"] if db_rows > 0 else None
+
+    def load_next(self):
+        """Append the next page below the window.
+
+        Returns (added, dropped) where ``dropped`` rows were evicted from the top.
+        """
+        if self.at_end:
+            return [], 0
+        added = []
+        if not self._tail_shown:
+            added, exhausted = self._fetch(after=self._last_db_key())
+            if not exhausted:
+                self.rows.extend(added)
+                return added, self._trim_front()
+        # Database results exhausted: show whatever tail entries remain
+        extra = self.tail[self._tail_shown:]
+        self._tail_shown = len(self.tail)
+        self.at_end = True
+        added = added + extra
+        self.rows.extend(added)
+        return added, self._trim_front()
+
+    def load_previous(self):
+        """Prepend the page above the window.
+
+        Returns (added, dropped) where ``dropped`` rows were evicted from the bottom.
+        """
+        if self.at_start or not self.rows:
+            return [], 0
+        added, exhausted = self._fetch(before=self.rows[0]["key"])
+        if exhausted:
+            self.at_start = True
+        self.rows[:0] = added
+        return added, self._trim_back()
+
+    def _trim_front(self):
+        dropped = max(0, len(self.rows) - self.max_rows)
+        if dropped:
+            del self.rows[:dropped]
+            self.at_start = False
+        return dropped
+
+    def _trim_back(self):
+        dropped = max(0, len(self.rows) - self.max_rows)
+        for _ in range(dropped):
+            self.rows.pop()
+            if self._tail_shown:
+                self._tail_shown -= 1
+            self.at_end = False
+        return dropped
@@ -0,0 +1,132 @@
+"""Background, resumable, crash-safe file ingest.
+
+A copy streams the source in chunks into ``<dest>.part`` while hashing it,
+fsyncs, and only then renames the file into place, so ``dest`` either doesn't
+exist or is complete. If the copy is cancelled or the app dies, the
+``.part`` file is kept and the next attempt resumes from where it stopped.
+"""
+import hashlib
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+IngestResult = namedtuple("IngestResult", "path size sha256")
+
+
+class IngestCancelled(Exception):
+    pass
+
+
+def staging_name(source):
+    """Stable name for a copy of ``source``, so a retry finds the earlier ``.part``"""
+    stat = os.stat(source)
+    key = f"{os.path.abspath(source)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def _resume_offset(src, part_path, total, sha, chunk_size):
+    """Feed the already copied prefix into ``sha`` and return its length.
+
+    The tail of the partial file is compared with the source; on mismatch the
+    copy restarts from zero.
+    """
+    if not os.path.exists(part_path):
+        return 0
+    offset = os.path.getsize(part_path)
+    if offset > total:
+        return 0
+    with open(part_path, "rb") as part:
+        check = min(offset, chunk_size)
+        part.seek(offset - check)
+        src.seek(offset - check)
+        if part.read(check) != src.read(check):
+            return 0
+        part.seek(0)
+        while True:
+            chunk = part.read(chunk_size)
+            if not chunk:
+                break
+            sha.update(chunk)
+    return offset
+
+
+def copy_file(source, dest, chunk_size=CHUNK_SIZE, progress=None, cancel_event=None):
+    """Copy ``source`` to ``dest`` atomically, returning an IngestResult.
+
+    ``progress(copied, total)`` is called after every chunk. Setting
+    ``cancel_event`` stops the copy with IngestCancelled, keeping the partial
+    file for a later resume.
+    """
+    part_path = dest + ".part"
+    total = os.path.getsize(source)
+    sha = hashlib.sha256()
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+
+    with open(source, "rb") as src:
+        offset = _resume_offset(src, part_path, total, sha, chunk_size)
+        src.seek(offset)
+        with open(part_path, "r+b" if offset else "wb") as out:
+            out.seek(offset)
+            out.truncate()
+            copied = offset
+            if progress:
+                progress(copied, total)
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise IngestCancelled(source)
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                out.write(chunk)
+                sha.update(chunk)
+                copied += len(chunk)
+                if progress:
+                    progress(copied, total)
+            out.flush()
+            os.fsync(out.fileno())
+
+    if copied != total:
+        raise IOError(f"Source changed during copy: {source}")
+    os.replace(part_path, dest)
+    _fsync_dir(os.path.dirname(dest) or ".")
+    return IngestResult(dest, total, sha.hexdigest())
+
+
+def _fsync_dir(path):
+    # Make the rename itself durable; not supported on every platform
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class IngestJob:
+    """A copy_file call running on a worker thread, with cancellation"""
+
+    _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+
+    def __init__(self, source, dest, progress=None, chunk_size=CHUNK_SIZE):
+        self.source = source
+        self.dest = dest
+        self.progress = progress
+        self.chunk_size = chunk_size
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    def start(self):
+        self.future = self._executor.submit(
+            copy_file, self.source, self.dest, self.chunk_size, self.progress, self.cancel_event
+        )
+        return self.future
+
+    def cancel(self):
+        self.cancel_event.set()
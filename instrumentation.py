@@ -0,0 +1,303 @@
+"""Opt-in timing of SQL, UI entry points and frames.
+
+Enabled by setting ``AMAZSTREME_INSTRUMENT=1``; ``AMAZSTREME_SLOW_QUERY_MS``
+sets the slow query threshold (default 50). Measurements go into
+in-process histograms with fixed buckets, so recording costs a bisect and an
+increment and memory stays flat however long the app runs. A Registry can
+be exported as JSON (with estimated percentiles) or in the Prometheus text
+format, and statements slower than a threshold are kept in a slow query log.
+
+StartupTimeline is always on: it is a handful of clock reads, and the app
+logs it once the first frame is up.
+
+Nothing here imports Kivy: the frame sampler takes the clock to schedule on.
+"""
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+ENV_VAR = "AMAZSTREME_INSTRUMENT"
+SLOW_QUERY_ENV_VAR = "AMAZSTREME_SLOW_QUERY_MS"
+SLOW_QUERY_MS = 50
+PREFIX = "amazstreme_"
+
+# Upper bounds in seconds, fine-grained around the 16.7ms frame budget
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.0167, 0.025, 0.0333,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+PERCENTILES = (50, 90, 99)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+logger = logging.getLogger("amazstreme.instrumentation")
+
+
+def enabled():
+    return os.environ.get(ENV_VAR, "") not in ("", "0")
+
+
+def slow_query_threshold():
+    """The slow query threshold in seconds"""
+    try:
+        return float(os.environ.get(SLOW_QUERY_ENV_VAR, SLOW_QUERY_MS)) / 1000
+    except ValueError:
+        return SLOW_QUERY_MS / 1000
+
+
+def normalize_sql(sql, limit=160):
+    """One-line, bounded form of a statement for use as a label"""
+    sql = _WHITESPACE_RE.sub(" ", sql).strip()
+    return sql if len(sql) <= limit else sql[:limit - 3] + "..."
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)  # the last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Estimate by linear interpolation inside the bucket holding rank q"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+    def to_dict(self):
+        result = {"count": self.count, "sum": self.sum, "max": self.max}
+        for p in PERCENTILES:
+            result[f"p{p}"] = self.quantile(p / 100)
+        return result
+
+
+class Registry:
+    """Histograms and counters keyed by metric name and label values"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.help = {}
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def to_json(self):
+        with self._lock:
+            histograms = [
+                dict(name=name, labels=dict(labels), **histogram.to_dict())
+                for (name, labels), histogram in sorted(self.histograms.items())
+            ]
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+        return {"histograms": histograms, "counters": counters}
+
+    def to_prometheus(self):
+        lines = []
+        described = set()
+
+        def header(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in self.help:
+                    lines.append(f"# HELP {PREFIX}{name} {self.help[name]}")
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+        with self._lock:
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                header(name, "histogram")
+                cumulative = 0
+                bounds = [repr(bound) for bound in histogram.bounds] + ["+Inf"]
+                for bound, bucket_count in zip(bounds, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f"{PREFIX}{name}_bucket{_labels(labels, le=bound)} {cumulative}")
+                lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {histogram.sum}")
+                lines.append(f"{PREFIX}{name}_count{_labels(labels)} {histogram.count}")
+            for (name, labels), value in sorted(self.counters.items()):
+                header(name, "counter")
+                lines.append(f"{PREFIX}{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, directory, basename="metrics", slow_log=None):
+        """Write ``<basename>.json`` and ``<basename>.prom`` atomically"""
+        report = self.to_json()
+        if slow_log is not None:
+            report["slow_queries"] = slow_log.entries()
+        for extension, text in ((".json", json.dumps(report, indent=2)), (".prom", self.to_prometheus())):
+            path = os.path.join(directory, basename + extension)
+            with open(path + ".tmp", "w") as f:
+                f.write(text)
+            os.replace(path + ".tmp", path)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class SlowQueryLog:
+    """The most recent statements slower than ``threshold`` seconds"""
+
+    def __init__(self, threshold=SLOW_QUERY_MS / 1000, maxlen=200):
+        self.threshold = threshold
+        self._entries = deque(maxlen=maxlen)
+
+    def record(self, sql, seconds, rows):
+        if seconds < self.threshold:
+            return False
+        entry = {"time": time.time(), "ms": seconds * 1000, "rows": rows, "sql": normalize_sql(sql, 1000)}
+        self._entries.append(entry)
+        logger.warning("Slow query (%.1f ms, %s rows): %s", entry["ms"], rows, entry["sql"])
+        return True
+
+    def entries(self):
+        return list(self._entries)
+
+
+class SqlTracer:
+    """Database.trace hook feeding a Registry and a SlowQueryLog"""
+
+    def __init__(self, registry, slow_log=None):
+        self.registry = registry
+        self.slow_log = slow_log
+        registry.describe("sql_seconds", "Time spent executing each SQL statement")
+        registry.describe("sql_rows_total", "Rows returned or changed by each SQL statement")
+        registry.describe("slow_queries_total", "Statements over the slow query threshold")
+
+    def __call__(self, sql, seconds, rows):
+        statement = normalize_sql(sql)
+        self.registry.observe("sql_seconds", seconds, statement=statement)
+        if rows:
+            self.registry.increment("sql_rows_total", rows, statement=statement)
+        if self.slow_log is not None and self.slow_log.record(sql, seconds, rows):
+            self.registry.increment("slow_queries_total")
+
+
+def instrument_methods(obj, names, registry):
+    """Replace the named methods on ``obj`` with timed wrappers.
+
+    Do this before any callbacks are bound, so every later ``obj.name``
+    lookup finds the wrapper.
+    """
+    registry.describe("call_seconds", "Wall time of instrumented UI entry points")
+    for name in names:
+        method = getattr(obj, name)
+
+        @functools.wraps(method)
+        def timed(*args, _method=method, _name=name, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                registry.observe("call_seconds", time.perf_counter() - start, method=_name)
+
+        setattr(obj, name, timed)
+
+
+class FrameSampler:
+    """Records every frame interval of a Kivy-style clock and counts dropped frames"""
+
+    def __init__(self, registry, clock, fps=60):
+        self.registry = registry
+        self.clock = clock
+        self.budget = 1.0 / fps
+        self.event = None
+        registry.describe("frame_seconds", "Time between consecutive frames")
+        registry.describe("dropped_frames_total", "Frames missed because a frame overran its budget")
+
+    def start(self):
+        if self.event is None:
+            self.event = self.clock.schedule_interval(self.tick, 0)
+
+    def stop(self):
+        if self.event is not None:
+            self.event.cancel()
+            self.event = None
+
+    def tick(self, dt):
+        self.registry.observe("frame_seconds", dt)
+        # Allow half a frame of jitter before counting a miss
+        missed = int(dt / self.budget + 0.5) - 1
+        if missed > 0:
+            self.registry.increment("dropped_frames_total", missed)
+
+
+class StartupTimeline:
+    """Time spent in each named phase of startup.
+
+    Starts counting when created, so create it before the heavy imports.
+    Each ``mark(phase)`` closes the phase that ran since the previous mark.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.started = clock()
+        self.marks = []  # (phase, clock reading at its end)
+
+    def mark(self, phase):
+        self.marks.append((phase, self.clock()))
+
+    def phases(self):
+        """(phase, seconds in the phase, seconds since start) in order"""
+        result = []
+        previous = self.started
+        for phase, at in self.marks:
+            result.append((phase, at - previous, at - self.started))
+            previous = at
+        return result
+
+    def total(self):
+        return self.marks[-1][1] - self.started if self.marks else 0.0
+
+    def report(self):
+        phases = ", ".join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds, _ in self.phases())
+        return f"{phases} (total {self.total() * 1000:.0f}ms)"
+
+    def record(self, registry):
+        registry.describe("startup_phase_seconds", "Time spent in each phase of startup")
+        for phase, seconds, _ in self.phases():
+            registry.observe("startup_phase_seconds", seconds, phase=phase)
@@ -0,0 +1,143 @@
+"""Intent matching for the Raikun chat assistant.
+
+Intents are loaded from a JSON file::
+
+    {
+        "default": "Reply when nothing matches",
+        "intents": [
+            {"name": "download", "patterns": ["download", "save offline"],
+             "response": "...", "priority": 0},
+            ...
+        ]
+    }
+
+Messages and patterns are split into lowercase word tokens, and every
+pattern is compiled into one Aho-Corasick automaton over tokens. A message is
+matched in a single pass whatever the number of intents, and since patterns
+are token sequences they only ever match whole words.
+
+Matches may overlap ("how are you" and "you"). They are resolved longest
+first, then leftmost, and a match is dropped if a kept one already covers any
+of its tokens. Each intent scores the number of tokens its kept matches
+cover; the highest score wins, ties going to the higher priority, then the
+earlier match in the message, then the intent listed first in the file.
+"""
+import json
+import re
+from collections import namedtuple
+
+Intent = namedtuple("Intent", "name patterns response priority")
+Match = namedtuple("Match", "intent pattern start end")
+
+_TOKEN_RE = re.compile(r"\w+(?:'\w+)*")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def load_intents(path):
+    """(intents, default response) from a JSON intents file"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    intents = [
+        Intent(item["name"], tuple(item["patterns"]), item["response"], item.get("priority", 0))
+        for item in data["intents"]
+    ]
+    return intents, data.get("default", "")
+
+
+class IntentMatcher:
+    def __init__(self, intents, default=""):
+        self.intents = list(intents)
+        self.default = default
+        # Per automaton state: token transitions, failure link, the patterns
+        # ending there and the nearest state down the failure chain that ends any
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._output_link = [0]
+        self._patterns = []  # pattern id -> (intent index, token count)
+        for index, intent in enumerate(self.intents):
+            if not intent.patterns:
+                raise ValueError(f"Intent {intent.name!r} has no patterns")
+            for pattern in intent.patterns:
+                tokens = tokenize(pattern)
+                if not tokens:
+                    raise ValueError(f"Intent {intent.name!r} has a pattern without words: {pattern!r}")
+                self._add(tokens, len(self._patterns))
+                self._patterns.append((index, len(tokens)))
+        self._link()
+
+    @classmethod
+    def from_file(cls, path):
+        intents, default = load_intents(path)
+        return cls(intents, default)
+
+    def _add(self, tokens, pattern_id):
+        state = 0
+        for token in tokens:
+            following = self._goto[state].get(token)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][token] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._output_link.append(0)
+            state = following
+        self._output[state].append(pattern_id)
+
+    def _link(self):
+        """Fill in failure and output links breadth first"""
+        goto, fail, output, output_link = self._goto, self._fail, self._output, self._output_link
+        queue = list(goto[0].values())  # depth one fails to the root
+        for state in queue:
+            for token, child in goto[state].items():
+                queue.append(child)
+                suffix = fail[state]
+                while suffix and token not in goto[suffix]:
+                    suffix = fail[suffix]
+                suffix = goto[suffix].get(token, 0)
+                fail[child] = suffix
+                output_link[child] = suffix if output[suffix] else output_link[suffix]
+
+    def matches(self, message):
+        """Every pattern occurrence in ``message``, as token offsets [start, end)"""
+        goto, fail, output, output_link = self._goto, self._fail, self._output, self._output_link
+        found = []
+        state = 0
+        for position, token in enumerate(tokenize(message)):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            hit = state if output[state] else output_link[state]
+            while hit:
+                for pattern_id in output[hit]:
+                    intent, length = self._patterns[pattern_id]
+                    found.append(Match(intent, pattern_id, position + 1 - length, position + 1))
+                hit = output_link[hit]
+        return found
+
+    def match(self, message):
+        """The best matching Intent, or None"""
+        found = self.matches(message)
+        if not found:
+            return None
+        found.sort(key=lambda m: (m.start - m.end, m.start, m.intent, m.pattern))
+        covered = set()
+        scores = {}
+        first = {}
+        for m in found:
+            span = range(m.start, m.end)
+            if covered.intersection(span):
+                continue
+            covered.update(span)
+            scores[m.intent] = scores.get(m.intent, 0) + m.end - m.start
+            first[m.intent] = min(first.get(m.intent, m.start), m.start)
+        best = max(scores, key=lambda i: (scores[i], self.intents[i].priority, -first[i], -i))
+        return self.intents[best]
+
+    def respond(self, message):
+        intent = self.match(message)
+        return intent.response if intent is not None else self.default
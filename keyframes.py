@@ -0,0 +1,68 @@
+"""Per-video keyframe index.
+
+The keyframe times of a video (from the MP4 ``stss``/``stts`` tables, see
+mp4probe) are stored once as a packed little-endian uint32 array of
+milliseconds in ``video_keyframes``. Resume and seek snap to the nearest
+keyframe at or before the requested position, so the decoder never has to
+decode forward from an earlier keyframe.
+"""
+import sys
+from array import array
+from bisect import bisect_right
+
+
+def pack(times_ms):
+    index = array("I", times_ms)
+    if sys.byteorder == "big":
+        index.byteswap()
+    return index.tobytes()
+
+
+def unpack(blob):
+    index = array("I")
+    index.frombytes(blob)
+    if sys.byteorder == "big":
+        index.byteswap()
+    return index
+
+
+def store_keyframes(db, video_id, times_ms):
+    db.execute(
+        "INSERT OR REPLACE INTO video_keyframes (video_id, keyframes) VALUES (?, ?)",
+        (video_id, pack(times_ms))
+    )
+
+
+def load_keyframes(db, video_id):
+    """The keyframe index of a video, or None if every frame is a keyframe or it is unknown"""
+    row = db.fetchone("SELECT keyframes FROM video_keyframes WHERE video_id=?", (video_id,))
+    return unpack(row[0]) if row else None
+
+
+def snap(index, position_ms):
+    """Latest keyframe at or before ``position_ms``"""
+    if not index:
+        return position_ms
+    i = bisect_right(index, position_ms)
+    return index[i - 1] if i else 0
+
+
+def resume_position_ms(db, user_id, video_id):
+    """Where to resume a video: the saved position snapped back to a keyframe.
+
+    Rows written before positions were stored in milliseconds fall back to
+    the saved percentage of the probed duration.
+    """
+    row = db.fetchone('''
+        SELECT wh.position_ms, wh.progress, v.duration_ms, v.duration
+        FROM watch_history wh
+        JOIN videos v ON v.id = wh.video_id
+        WHERE wh.user_id=? AND wh.video_id=?
+    ''', (user_id, video_id))
+    if row is None:
+        return 0
+    position_ms, progress, duration_ms, duration = row
+    if position_ms is None:
+        duration_ms = duration_ms or (duration or 0) * 1000
+        position_ms = int((progress or 0) / 100 * duration_ms)
+    return snap(load_keyframes(db, video_id), position_ms)
@@ -0,0 +1,76 @@
+"""Per-user likes with buffered like counters.
+
+``user_likes`` records who liked what, one row per user and video, so a user
+can like a video once. Taps don't write to the database: a LikeBuffer keeps
+the latest like or unlike of each (user, video) in memory, and ``flush()``
+applies them all in one transaction. It inserts or deletes the user_likes
+rows that actually change, then updates ``videos.likes`` once per video
+with the net change. A burst of taps on a viral video becomes one write of
+its hot row per flush, and since the deltas come from user_likes changes,
+repeated or cancelled taps can't skew the count.
+"""
+import threading
+
+FLUSH_INTERVAL = 2.0
+# Flush early if this many likes are waiting, however recent the last flush
+MAX_PENDING = 1000
+
+
+def liked_video_ids(db, user_id):
+    return [row[0] for row in db.fetchall("SELECT video_id FROM user_likes WHERE user_id=?", (user_id,))]
+
+
+class LikeBuffer:
+    def __init__(self, db, max_pending=MAX_PENDING):
+        self.db = db
+        self.max_pending = max_pending
+        self._pending = {}  # (user id, video id) -> liked
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def set(self, user_id, video_id, liked):
+        """Buffer a like (or unlike); returns True once enough are waiting to flush"""
+        with self._lock:
+            self._pending[(user_id, video_id)] = bool(liked)
+            return len(self._pending) >= self.max_pending
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Write out the buffered likes; returns {video id: change in likes}"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return {}
+            deltas = {}
+            try:
+                with self.db.transaction():
+                    for (user_id, video_id), liked in pending.items():
+                        if liked:
+                            cur = self.db.execute(
+                                "INSERT OR IGNORE INTO user_likes (user_id, video_id) VALUES (?, ?)",
+                                (user_id, video_id)
+                            )
+                            change = cur.rowcount
+                        else:
+                            cur = self.db.execute(
+                                "DELETE FROM user_likes WHERE user_id=? AND video_id=?",
+                                (user_id, video_id)
+                            )
+                            change = -cur.rowcount
+                        if change:
+                            deltas[video_id] = deltas.get(video_id, 0) + change
+                    self.db.executemany(
+                        "UPDATE videos SET likes = likes + ? WHERE id = ?",
+                        [(delta, video_id) for video_id, delta in deltas.items() if delta]
+                    )
+            except BaseException:
+                # Put them back for the next flush, unless a newer tap replaced them
+                with self._lock:
+                    for key, liked in pending.items():
+                        self._pending.setdefault(key, liked)
+                raise
+            return deltas
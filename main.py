@@ -1,139 +1,334 @@
+# Started before anything heavy is imported; logged once the first frame is up
+from instrumentation import StartupTimeline
+startup = StartupTimeline()
+
 import os
-import sqlite3
 from functools import partial
-from datetime import datetime
-import shutil
+from datetime import datetime, timezone
 import random
 
+from database import Database
+from migrations import migrate
+from thumbnails import ThumbnailCache
+from comments import comment_cursor, PAGE_SIZE as COMMENTS_PAGE_SIZE
+from progress import ProgressTracker
+from ingest import IngestJob, IngestCancelled, staging_name
+from media_store import MediaStore
+from previews import PreviewJobs, preview_paths, sprite_tile
+from services import Services, ServiceError
+from intents import IntentMatcher
+from likes import FLUSH_INTERVAL as LIKE_FLUSH_INTERVAL
+import instrumentation
+from instrumentation import Registry, SlowQueryLog, SqlTracer, FrameSampler, instrument_methods
+
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.textinput import TextInput
 from kivy.uix.button import Button
-from kivy.uix.video import Video
 from kivy.uix.popup import Popup
 from kivy.uix.label import Label
 from kivy.uix.tabbedpanel import TabbedPanel, TabbedPanelItem
 from kivy.clock import Clock
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.gridlayout import GridLayout
-from kivy.uix.image import AsyncImage
-from kivy.uix.carousel import Carousel
+from kivy.uix.image import Image
+from kivy.core.image import ImageLoader
 from kivy.core.window import Window
 from kivy.properties import BooleanProperty, NumericProperty, StringProperty, ObjectProperty
 from kivy.uix.togglebutton import ToggleButton
 from kivy.uix.recycleview import RecycleView
 from kivy.uix.recycleview.views import RecycleDataViewBehavior
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
 from kivy.uix.behaviors import FocusBehavior
+from kivy.logger import Logger
+# kivy.uix.video (and with it the video provider), the carousel and the slider
+# are imported where they are first used, after the login screen is up
+
+startup.mark("imports")
 
-# Database Setup
 db_path = os.path.join(os.path.dirname(__file__), "amazstreme.db")
-conn = sqlite3.connect(db_path, check_same_thread=False)
-cursor = conn.cursor()
-
-# Create tables
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY,
-        username TEXT UNIQUE,
-        password TEXT,
-        avatar_path TEXT,
-        bio TEXT DEFAULT ''
-    )
-''')
-
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS videos (
-        id INTEGER PRIMARY KEY,
-        title TEXT,
-        file_path TEXT,
-        uploader_id INTEGER,
-        likes INTEGER DEFAULT 0,
-        category TEXT DEFAULT 'General',
-        tags TEXT DEFAULT '',
-        duration INTEGER DEFAULT 0,
-        FOREIGN KEY (uploader_id) REFERENCES users (id)
-    )
-''')
-
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS comments (
-        id INTEGER PRIMARY KEY,
-        video_id INTEGER,
-        user_id INTEGER,
-        text TEXT,
-        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (video_id) REFERENCES videos (id),
-        FOREIGN KEY (user_id) REFERENCES users (id)
+MEDIA_DIR = "media"
+# Opened by setup(), which only runs when main.py is started as the app;
+# importing this module opens no database and starts no pools
+db = metrics = slow_query_log = thumbnail_cache = media_store = preview_jobs = services = None
+INSTRUMENTED_METHODS = (
+    "create_main_screen", "create_home_tab", "create_shorts_tab", "create_subscriptions_tab",
+    "create_upload_tab", "create_chat_tab", "create_profile_tab",
+    "load_recommended_videos", "show_comments", "play_video",
+)
+METRICS_INTERVAL = 60
+
+def like_label(likes, liked):
+    return f"👍 {likes} ✓" if liked else f"👍 {likes}"
+
+def decode_thumbnail(path):
+    # Pixels are decoded here, on a cache worker; the GL texture is only
+    # created on first .texture access, which happens on the UI thread
+    return ImageLoader.load(path, keep_data=False, nocache=True)
+
+def setup():
+    """Open the database and start the caches and service pools"""
+    global db, metrics, slow_query_log, thumbnail_cache, media_store, preview_jobs, services
+    db = Database(db_path)
+
+    # Opt-in timing of every statement, UI entry point and frame (AMAZSTREME_INSTRUMENT=1)
+    if instrumentation.enabled():
+        metrics = Registry()
+        slow_query_log = SlowQueryLog(instrumentation.slow_query_threshold())
+        db.trace = SqlTracer(metrics, slow_query_log)
+
+    thumbnail_cache = ThumbnailCache(
+        os.path.join(os.path.dirname(__file__), "cache", "thumbnails"),
+        memory_budget=32 * 1024 * 1024,
+        disk_budget=128 * 1024 * 1024,
+        decode=decode_thumbnail,
+        sizeof=lambda image: image.width * image.height * 4,
+        dispatch=lambda callback, *args: Clock.schedule_once(lambda dt: callback(*args))
     )
-''')
-
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS subscriptions (
-        user_id INTEGER,
-        channel_name TEXT,
-        PRIMARY KEY (user_id, channel_name),
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )
-''')
-
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS watch_history (
-        user_id INTEGER,
-        video_id INTEGER,
-        progress INTEGER DEFAULT 0,
-        last_watched DATETIME DEFAULT CURRENT_TIMESTAMP,
-        PRIMARY KEY (user_id, video_id),
-        FOREIGN KEY (user_id) REFERENCES users (id),
-        FOREIGN KEY (video_id) REFERENCES videos (id)
-    )
-''')
-
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS downloads (
-        user_id INTEGER,
-        video_id INTEGER,
-        download_path TEXT,
-        downloaded_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-        PRIMARY KEY (user_id, video_id),
-        FOREIGN KEY (user_id) REFERENCES users (id),
-        FOREIGN KEY (video_id) REFERENCES videos (id)
-    )
-''')
 
-conn.commit()
+    media_store = MediaStore(db, os.path.join(MEDIA_DIR, "blobs"))
+    # Posters and scrub sprites are decoded in worker processes, never in the UI process
+    preview_jobs = PreviewJobs()
+    # Data operations run on service workers; callbacks come back on the UI thread
+    services = Services(
+        db, media_store,
+        dispatch=lambda callback, *args: Clock.schedule_once(lambda dt: callback(*args))
+    )
+    startup.mark("setup")
+
+# Raikun's intents, synonyms and replies
+INTENTS_PATH = os.path.join(os.path.dirname(__file__), "intents.json")
+FEED_ROW_HEIGHT = 150
+# Fraction of the feed's scroll range from either end that triggers a page load
+FEED_SCROLL_THRESHOLD = 0.1
+COMMENT_ROW_HEIGHT = 100
+COMMENTS_SCROLL_THRESHOLD = 0.1
+CHAT_ROW_HEIGHT = 80
+CHAT_SCROLL_THRESHOLD = 0.1
+# How many personalised picks Raikun names when asked for a recommendation
+RAIKUN_RECOMMENDATIONS = 3
+FOR_YOU = "For You"
+TRENDING = "Trending"
+RAIKUN_WELCOME = "Hello! I'm Raikun, your AI assistant. Ask me anything about the app!"
+# Tabs other than Home are built on first use, or earlier during idle frames:
+# prewarming starts this long after login and builds one tab per frame, but
+# only while frames are coming in under the budget
+PREWARM_TABS = True
+TAB_PREWARM_DELAY = 1.0
+TAB_PREWARM_FRAME_BUDGET = 1 / 30
+
+class ChatMessage(RecycleDataViewBehavior, BoxLayout):
+    """Reusable chat row; the user's messages are aligned right, Raikun's left"""
 
-class ChatMessage(BoxLayout):
-    text = StringProperty("")
-    sender = StringProperty("")
-    timestamp = StringProperty("")
-    is_user = BooleanProperty(False)
+    def __init__(self, **kwargs):
+        super(ChatMessage, self).__init__(orientation='vertical', padding=5, **kwargs)
+        header = BoxLayout(size_hint=(1, 0.3))
+        self.sender_label = Label(size_hint=(0.7, 1))
+        self.time_label = Label(size_hint=(0.3, 1))
+        header.add_widget(self.sender_label)
+        header.add_widget(self.time_label)
+        self.message_label = Label(
+            size_hint=(1, 0.7),
+            text_size=(Window.width * 0.8 - 20, None),
+            valign="top"
+        )
+        self.add_widget(header)
+        self.add_widget(self.message_label)
+
+    def refresh_view_attrs(self, rv, index, data):
+        color = (0, 0, 0, 1) if not App.get_running_app().dark_mode else (1, 1, 1, 1)
+        halign = "right" if data["is_user"] else "left"
+        self.sender_label.text = data["sender"]
+        self.time_label.text = data["time"]
+        self.message_label.text = data["text"]
+        for label in (self.sender_label, self.time_label, self.message_label):
+            label.color = color
+            label.halign = halign
 
 class ChatRecycleView(RecycleView):
     def __init__(self, **kwargs):
         super(ChatRecycleView, self).__init__(**kwargs)
+        self.viewclass = ChatMessage
+        layout = RecycleBoxLayout(
+            orientation='vertical',
+            spacing=5,
+            size_hint=(1, None),
+            default_size=(None, CHAT_ROW_HEIGHT),
+            default_size_hint=(1, None)
+        )
+        layout.bind(minimum_height=layout.setter('height'))
+        self.add_widget(layout)
+        self.data = []
+
+class CachedImage(Image):
+    """Image whose remote source is loaded through thumbnail_cache"""
+    url = StringProperty("")
+
+    def on_url(self, instance, url):
+        if url.startswith(("http://", "https://")):
+            self.source = ""
+            self.texture = None
+            thumbnail_cache.get(url, self.on_thumbnail)
+        else:
+            self.source = url
+
+    def on_thumbnail(self, url, image, error):
+        # A recycled row may have moved on to another URL in the meantime
+        if url == self.url and image is not None:
+            self.texture = image.texture
+
+class VideoRow(RecycleDataViewBehavior, BoxLayout):
+    """Reusable home feed row. RecycleView binds it to one plain video dict at
+    a time, so only the rows on screen ever have widgets."""
+
+    def __init__(self, **kwargs):
+        super(VideoRow, self).__init__(orientation="horizontal", **kwargs)
+        self.video = {}
+        self.is_ad = None
+        self.thumbnail = CachedImage(size_hint_x=0.3)
+        self.play_button = Button(size_hint_x=0.3)
+        self.play_button.bind(on_press=self.on_play)
+        self.like_button = Button(size_hint_x=0.15)
+        self.like_button.bind(on_press=self.on_like)
+        self.channel_label = Label(size_hint_x=0.15)
+        self.sub_button = Button(size_hint_x=0.1)
+        self.sub_button.bind(on_press=self.on_subscribe)
+        self.ad_label = Label(text="Sponsored Ad", size_hint_x=0.7)
+        self.ad_button = Button(text="Learn More", size_hint_x=0.3)
+        self.ad_button.bind(on_press=self.on_ad)
+
+    def refresh_view_attrs(self, rv, index, data):
+        app = App.get_running_app()
+        self.video = data
+        is_ad = not data["source"]
+        if is_ad != self.is_ad:
+            self.is_ad = is_ad
+            self.clear_widgets()
+            self.add_widget(self.thumbnail)
+            if is_ad:
+                self.add_widget(self.ad_label)
+                self.add_widget(self.ad_button)
+            else:
+                self.add_widget(self.play_button)
+                self.add_widget(self.like_button)
+                self.add_widget(self.channel_label)
+                self.add_widget(self.sub_button)
+
+        background = (1, 1, 1, 1) if not app.dark_mode else (0.2, 0.2, 0.2, 1)
+        color = (0, 0, 0, 1) if not app.dark_mode else (1, 1, 1, 1)
+        self.thumbnail.url = data["thumbnail"]
+        for label in (self.channel_label, self.ad_label):
+            label.color = color
+        for button in (self.play_button, self.like_button, self.sub_button, self.ad_button):
+            button.background_color = background
+            button.color = color
+        if not is_ad:
+            self.play_button.text = data["title"]
+            self.like_button.text = like_label(data.get('likes', 0), data.get('id') in app.liked_videos)
+            self.channel_label.text = f"Channel: {data['channel']}"
+            self.sub_button.text = "Subscribed ✓" if data["channel"] in app.user_data["subscriptions"] else "Subscribe"
+
+    def on_play(self, instance):
+        App.get_running_app().play_video(self.video)
+
+    def on_like(self, instance):
+        app = App.get_running_app()
+        if 'id' in self.video:
+            app.like_video_db(self.video, instance)
+        else:
+            self.video["likes"] = app.like_video_mem(self.video["title"], instance)
+
+    def on_subscribe(self, instance):
+        App.get_running_app().toggle_subscription(self.video["channel"], instance)
+
+    def on_ad(self, instance):
+        App.get_running_app().show_ad(instance)
+
+class VideoFeedView(RecycleView):
+    def __init__(self, **kwargs):
+        super(VideoFeedView, self).__init__(**kwargs)
+        self.viewclass = VideoRow
+        layout = RecycleBoxLayout(
+            orientation='vertical',
+            spacing=10,
+            size_hint=(1, None),
+            default_size=(None, FEED_ROW_HEIGHT),
+            default_size_hint=(1, None)
+        )
+        layout.bind(minimum_height=layout.setter('height'))
+        self.add_widget(layout)
+        self.data = []
+
+class CommentRow(RecycleDataViewBehavior, BoxLayout):
+    def __init__(self, **kwargs):
+        super(CommentRow, self).__init__(orientation='vertical', **kwargs)
+        header = BoxLayout(size_hint=(1, 0.3))
+        self.user_label = Label(size_hint=(0.7, 1), halign="left")
+        self.time_label = Label(size_hint=(0.3, 1), halign="right")
+        header.add_widget(self.user_label)
+        header.add_widget(self.time_label)
+        self.comment_text = Label(
+            size_hint=(1, 0.7),
+            text_size=(Window.width * 0.8 - 20, None),
+            halign="left",
+            valign="top"
+        )
+        self.add_widget(header)
+        self.add_widget(self.comment_text)
+
+    def refresh_view_attrs(self, rv, index, data):
+        color = (0, 0, 0, 1) if not App.get_running_app().dark_mode else (1, 1, 1, 1)
+        self.user_label.text = data["username"]
+        self.time_label.text = data["timestamp"]
+        self.comment_text.text = data["text"]
+        for label in (self.user_label, self.time_label, self.comment_text):
+            label.color = color
+
+class CommentsView(RecycleView):
+    def __init__(self, **kwargs):
+        super(CommentsView, self).__init__(**kwargs)
+        self.viewclass = CommentRow
+        layout = RecycleBoxLayout(
+            orientation='vertical',
+            spacing=10,
+            size_hint=(1, None),
+            default_size=(None, COMMENT_ROW_HEIGHT),
+            default_size_hint=(1, None)
+        )
+        layout.bind(minimum_height=layout.setter('height'))
+        self.add_widget(layout)
         self.data = []
 
+class LazyTab(TabbedPanelItem):
+    """Tab whose content is built by ``builder`` the first time it is needed
+    and kept afterwards"""
+
+    def __init__(self, builder, **kwargs):
+        super(LazyTab, self).__init__(**kwargs)
+        self.builder = builder
+        self.built = False
+
+    def build_content(self):
+        if not self.built:
+            self.built = True
+            self.add_widget(self.builder())
+
+    def on_press(self):
+        # Build before the release switches to this tab, so it opens with content
+        self.build_content()
+
+    def on_state(self, instance, state):
+        # Switched to from code (switch_to), without a press
+        if state == 'down' and not self.built:
+            Clock.schedule_once(lambda dt: self.build_content())
+
 class RaikunAI:
-    def __init__(self):
+    def __init__(self, intents_path=INTENTS_PATH):
         self.name = "Raikun"
-        self.responses = {
-            "hello": "Hello! I'm Raikun, your AI assistant. How can I help you today?",
-            "how are you": "I'm just a program, but thanks for asking! How can I assist you?",
-            "recommend": "Based on your watch history, I recommend checking out the Tech category videos!",
-            "help": "I can help with video recommendations, app navigation, and general questions about the app.",
-            "settings": "You can change app settings like dark mode, playback speed, and ads in the Settings tab.",
-            "subscribe": "To subscribe to a channel, go to the video and click the Subscribe button below it.",
-            "download": "You can download videos by clicking the download button when watching a video.",
-            "history": "Your watch history is available in your Profile tab under Watch History.",
-            "default": "I'm not sure I understand. Could you rephrase that or ask something else?"
-        }
+        self.intents = IntentMatcher.from_file(intents_path)
     
     def respond(self, message):
-        message = message.lower().strip()
-        for key in self.responses:
-            if key in message:
-                return self.responses[key]
-        return self.responses["default"]
+        return self.intents.respond(message)
 
 class AmazonVideoApp(App):
     dark_mode = BooleanProperty(False)
@@ -141,6 +336,7 @@ class AmazonVideoApp(App):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.current_user = None
+        self.liked_videos = set()
         self.user_data = {
             "ads_enabled": True,
             "earnings": 0,
@@ -153,36 +349,60 @@ class AmazonVideoApp(App):
             "notifications": []
         }
         
+        # Sample videos of the built-in channels; the channels themselves are in the database
         self.channels = {
             "TechReviews": {
-                "logo": "https://via.placeholder.com/100x100?text=Tech",
                 "videos": ["Tech Review", "New Gadgets Unboxing", "Smartphone Comparison"]
             },
             "NatureChannel": {
-                "logo": "https://via.placeholder.com/100x100?text=Nature",
                 "videos": ["Nature Documentary", "Wildlife Adventures", "Ocean Exploration"]
-            },
-            "UserUploads": {
-                "logo": "https://via.placeholder.com/100x100?text=User",
-                "videos": []
             }
         }
         self.selected_video_path = None
         self.current_playing_video = None
         self.video_progress = 0
-        self.downloads_dir = "downloads"
-        
-        # Create directories if they don't exist
-        os.makedirs(self.downloads_dir, exist_ok=True)
-        os.makedirs("videos", exist_ok=True)
+        self.progress_tracker = ProgressTracker(db, submit=services.submit)
+        self.upload_job = None
+        self.lazy_tabs = []
+        self.prewarm_event = None
+        self.subs_grid = None
+        self.subs_feed_grid = None
+        self.downloads_dir = "downloads"  # Created by the first download
 
     def build(self):
+        if metrics is not None:
+            instrument_methods(self, INSTRUMENTED_METHODS, metrics)
+            self.frame_sampler = FrameSampler(metrics, Clock)
+            self.frame_sampler.start()
+            Clock.schedule_interval(lambda dt: self.dump_metrics(), METRICS_INTERVAL)
+        Clock.schedule_interval(self.flush_buffers, LIKE_FLUSH_INTERVAL)
         Window.size = (800, 600)
         self.apply_theme()
         self.layout = BoxLayout(orientation='vertical')
         self.show_login_screen()
+        startup.mark("login screen")
+        # Everything else waits until the login screen has been drawn once
+        Window.bind(on_flip=self.on_first_frame)
         return self.layout
 
+    def on_first_frame(self, window):
+        window.unbind(on_flip=self.on_first_frame)
+        startup.mark("first frame")
+        Clock.schedule_once(self.finish_startup)
+
+    def finish_startup(self, dt):
+        # Runs before any input is handled, so migrations still precede login.
+        # With an up to date schema this only reads user_version.
+        migrate(db)
+        startup.mark("migrations")
+        Logger.info(f"Startup: {startup.report()}")
+        if metrics is not None:
+            startup.record(metrics)
+
+    def dump_metrics(self):
+        """Write metrics.json and metrics.prom next to the database"""
+        metrics.dump(os.path.dirname(db_path), slow_log=slow_query_log)
+
     def apply_theme(self):
         if self.dark_mode:
             Window.clearcolor = (0.1, 0.1, 0.1, 1)
@@ -268,145 +488,83 @@ class AmazonVideoApp(App):
         self.layout.add_widget(signup_layout)
 
     def login(self, instance):
-        username = self.login_username.text
-        password = self.login_password.text
-        
-        try:
-            cursor.execute("SELECT id, avatar_path, bio FROM users WHERE username=? AND password=?", (username, password))
-            user = cursor.fetchone()
-            
-            if user:
-                self.current_user = user[0]
-                self.user_data["avatar_path"] = user[1]
-                self.user_data["bio"] = user[2] if user[2] else ""
-                self.load_user_data()
-                self.create_main_screen()
-            else:
-                self.show_info_popup("Invalid username or password")
-        except Exception as e:
-            self.show_info_popup(f"Login error: {str(e)}")
+        services.call(
+            services.accounts.login, self.login_username.text, self.login_password.text,
+            callback=self.on_login,
+            error=partial(self.on_service_error, "Login error")
+        )
 
-    def load_user_data(self):
-        """Load user-specific data from database"""
-        try:
-            # Load subscriptions
-            cursor.execute("SELECT channel_name FROM subscriptions WHERE user_id=?", (self.current_user,))
-            self.user_data["subscriptions"] = [row[0] for row in cursor.fetchall()]
-            
-            # Add default subscription if none exists
-            if not self.user_data["subscriptions"]:
-                self.user_data["subscriptions"] = ["TechReviews"]
-                for channel in self.user_data["subscriptions"]:
-                    cursor.execute(
-                        "INSERT OR IGNORE INTO subscriptions (user_id, channel_name) VALUES (?, ?)",
-                        (self.current_user, channel)
-                    )
-                conn.commit()
-
-            # Load watch history
-            cursor.execute('''
-                SELECT v.id, v.title, wh.progress, v.duration 
-                FROM watch_history wh
-                JOIN videos v ON wh.video_id = v.id
-                WHERE wh.user_id = ?
-                ORDER BY wh.last_watched DESC
-            ''', (self.current_user,))
-            self.user_data["watch_history"] = [
-                {"id": row[0], "title": row[1], "progress": row[2], "duration": row[3]}
-                for row in cursor.fetchall()
-            ]
-
-            # Load downloads
-            cursor.execute('''
-                SELECT v.id, v.title, d.download_path
-                FROM downloads d
-                JOIN videos v ON d.video_id = v.id
-                WHERE d.user_id = ?
-            ''', (self.current_user,))
-            self.user_data["downloads"] = [
-                {"id": row[0], "title": row[1], "path": row[2]}
-                for row in cursor.fetchall()
-            ]
-        except Exception as e:
-            self.show_info_popup(f"Error loading user data: {str(e)}")
+    def on_login(self, profile):
+        # Profile, subscriptions, watch history and downloads, all read on a worker
+        self.current_user = profile.pop("id")
+        self.liked_videos = set(profile.pop("liked_videos"))
+        self.user_data.update(profile)
+        self.create_main_screen()
+        # Catch the recommender up with new watch history before For You is opened
+        services.submit(services.recommendations.for_user, self.current_user)
 
     def signup(self, instance):
-        username = self.signup_username.text
-        password = self.signup_password.text
-        
-        if not username or not password:
-            self.show_info_popup("Please enter both username and password")
-            return
-        
-        try:
-            # Default avatar path
-            avatar_path = "https://via.placeholder.com/100x100?text=User"
-            
-            cursor.execute(
-                "INSERT INTO users (username, password, avatar_path) VALUES (?, ?, ?)", 
-                (username, password, avatar_path)
-            )
-            user_id = cursor.lastrowid
-            conn.commit()
-            
-            # Add default subscriptions
-            for channel in ["TechReviews"]:
-                cursor.execute(
-                    "INSERT INTO subscriptions (user_id, channel_name) VALUES (?, ?)",
-                    (user_id, channel)
-                )
-            conn.commit()
-            
-            self.show_info_popup("Account created successfully!")
-            self.show_login_screen()
-        except sqlite3.IntegrityError:
-            self.show_info_popup("Username already exists")
-        except Exception as e:
-            self.show_info_popup(f"Signup error: {str(e)}")
+        services.call(
+            services.accounts.signup, self.signup_username.text, self.signup_password.text,
+            callback=self.on_signup,
+            error=partial(self.on_service_error, "Signup error")
+        )
+
+    def on_signup(self, user_id):
+        self.show_info_popup("Account created successfully!")
+        self.show_login_screen()
+
+    def on_service_error(self, prefix, error):
+        if isinstance(error, ServiceError):
+            self.show_info_popup(str(error))
+        else:
+            self.show_info_popup(f"{prefix}: {str(error)}")
 
     def create_main_screen(self):
         self.layout.clear_widgets()
         self.tab_panel = TabbedPanel(size_hint=(1, 1), do_default_tab=False)
+        self.subs_grid = None
+        self.subs_feed_grid = None
+        if self.prewarm_event is not None:
+            self.prewarm_event.cancel()
         
-        # Home Tab
+        # Home Tab, the only one the user sees right after login
         home_tab = TabbedPanelItem(text="🏠 Home")
         home_tab.add_widget(self.create_home_tab())
         self.tab_panel.add_widget(home_tab)
 
-        # Shorts Tab
-        shorts_tab = TabbedPanelItem(text="🎬 Shorts")
-        shorts_tab.add_widget(self.create_shorts_tab())
-        self.tab_panel.add_widget(shorts_tab)
-
-        # Subscriptions Tab
-        subs_tab = TabbedPanelItem(text="📌 Subscriptions")
-        subs_tab.add_widget(self.create_subscriptions_tab())
-        self.tab_panel.add_widget(subs_tab)
-
-        # Upload Tab
-        upload_tab = TabbedPanelItem(text="📤 Upload")
-        upload_tab.add_widget(self.create_upload_tab())
-        self.tab_panel.add_widget(upload_tab)
-
-        # Chat Tab
-        chat_tab = TabbedPanelItem(text="💬 Chat")
-        chat_tab.add_widget(self.create_chat_tab())
-        self.tab_panel.add_widget(chat_tab)
-
-        # Profile Tab
-        profile_tab = TabbedPanelItem(text="👤 Profile")
-        profile_tab.add_widget(self.create_profile_tab())
-        self.tab_panel.add_widget(profile_tab)
+        # The rest are built when first opened
+        self.lazy_tabs = [
+            LazyTab(self.create_shorts_tab, text="🎬 Shorts"),
+            LazyTab(self.create_subscriptions_tab, text="📌 Subscriptions"),
+            LazyTab(self.create_upload_tab, text="📤 Upload"),
+            LazyTab(self.create_chat_tab, text="💬 Chat"),
+            LazyTab(self.create_profile_tab, text="👤 Profile"),
+        ]
+        for tab in self.lazy_tabs:
+            self.tab_panel.add_widget(tab)
 
         self.layout.add_widget(self.tab_panel)
+        if PREWARM_TABS:
+            self.prewarm_event = Clock.schedule_once(self.prewarm_tab, TAB_PREWARM_DELAY)
+
+    def prewarm_tab(self, dt):
+        """Build the next unbuilt tab if the app is idle, then come back next frame"""
+        pending = [tab for tab in self.lazy_tabs if not tab.built]
+        if not pending:
+            self.prewarm_event = None
+            return
+        if Clock.frametime <= TAB_PREWARM_FRAME_BUDGET:
+            pending[0].build_content()
+        self.prewarm_event = Clock.schedule_once(self.prewarm_tab)
 
     def create_chat_tab(self):
         layout = BoxLayout(orientation='vertical')
         
         # Chat header
         header = BoxLayout(size_hint=(1, 0.1))
-        ai_avatar = AsyncImage(
-            source="https://via.placeholder.com/50x50?text=AI",
+        ai_avatar = CachedImage(
+            url="https://via.placeholder.com/50x50?text=AI",
             size_hint=(0.2, 1)
         )
         ai_name = Label(
@@ -422,8 +580,7 @@ class AmazonVideoApp(App):
         
         # Chat history
         self.chat_view = ChatRecycleView()
-        self.chat_view.viewclass = 'ChatMessage'
-        self.chat_view.data = []
+        self.chat_view.bind(scroll_y=self.on_chat_scroll)
         layout.add_widget(self.chat_view)
         
         # Send message area
@@ -451,39 +608,155 @@ class AmazonVideoApp(App):
         # Initialize AI
         self.raikun = RaikunAI()
         
-        # Add welcome message
-        self.add_chat_message("Hello! I'm Raikun, your AI assistant. Ask me anything about the app!", "Raikun", False)
+        # Only the newest page of the stored conversation is read up front
+        self.chat = services.chat.window(self.current_user)
+        self.chat_loading = True
+        services.call(
+            services.chat.load_latest, self.chat,
+            callback=partial(self.on_latest_chat_page, self.chat),
+            error=self.on_chat_error
+        )
         
         return layout
 
+    def on_latest_chat_page(self, chat, page):
+        if chat is not self.chat:
+            return  # Another login rebuilt the chat tab
+        added, dropped = page
+        self.show_latest_chat_messages(added, dropped)
+        if not added:
+            self.add_chat_message(RAIKUN_WELCOME, "Raikun", False)
+
     def send_chat_message(self, instance):
         message = self.chat_input.text.strip()
         if not message:
             return
             
-        # Add user message
-        self.add_chat_message(message, "You", True)
+        # Add user message; Raikun answers once it is stored, so the two never swap places
+        self.add_chat_message(message, "You", True, on_added=partial(self.schedule_ai_response, message))
         self.chat_input.text = ""
-        
+
+    def schedule_ai_response(self, message):
         # Get AI response after a short delay
         Clock.schedule_once(lambda dt: self.get_ai_response(message), 0.5)
 
     def get_ai_response(self, message):
+        intent = self.raikun.intents.match(message)
+        if intent is not None and intent.name == "recommend":
+            services.call(
+                services.recommendations.titles_for_user, self.current_user, RAIKUN_RECOMMENDATIONS,
+                callback=partial(self.on_ai_recommendations, intent.response),
+                error=lambda error: self.add_chat_message(intent.response, "Raikun", False)
+            )
+            return
         response = self.raikun.respond(message)
         self.add_chat_message(response, "Raikun", False)
 
-    def add_chat_message(self, text, sender, is_user):
-        timestamp = datetime.now().strftime("%H:%M")
-        self.chat_view.data.append({
-            "text": text,
-            "sender": sender,
-            "timestamp": timestamp,
-            "is_user": is_user
-        })
-        self.chat_view.refresh_from_data()
-        # Scroll to bottom
-        if len(self.chat_view.data) > 0:
-            Clock.schedule_once(lambda dt: self.chat_view.scroll_to(len(self.chat_view.data) - 1))
+    def on_ai_recommendations(self, fallback, titles):
+        if titles:
+            response = "Based on your watch history, you might like: " + ", ".join(titles)
+        else:
+            response = fallback
+        self.add_chat_message(response, "Raikun", False)
+
+    def add_chat_message(self, text, sender, is_user, on_added=None):
+        services.call(
+            services.chat.add, self.chat, sender, text, is_user,
+            callback=partial(self.on_chat_message_added, self.chat, on_added),
+            error=self.on_chat_error
+        )
+
+    def on_chat_message_added(self, chat, on_added, page):
+        if chat is not self.chat:
+            return
+        added, dropped = page
+        self.show_latest_chat_messages(added, dropped)
+        if on_added is not None:
+            on_added()
+
+    def chat_entry(self, message):
+        """Display fields of a stored message; timestamps are stored in UTC"""
+        try:
+            sent = datetime.strptime(message["timestamp"], "%Y-%m-%d %H:%M:%S")
+            message["time"] = sent.replace(tzinfo=timezone.utc).astimezone().strftime("%H:%M")
+        except (TypeError, ValueError):
+            message["time"] = ""
+        return message
+
+    def show_latest_chat_messages(self, added, dropped):
+        # Edited in place rather than reassigned, so the RecycleView only
+        # lays out the rows that changed
+        data = self.chat_view.data
+        if dropped:
+            del data[:dropped]
+        data.extend(self.chat_entry(message) for message in added)
+        self.scroll_chat_to_bottom()
+
+    def on_chat_scroll(self, view, scroll_y):
+        if self.chat_loading or view.height >= view.layout_manager.height:
+            return
+        if scroll_y >= 1 - CHAT_SCROLL_THRESHOLD and not self.chat.at_start:
+            self.chat_loading = True
+            services.call(
+                services.chat.load_previous, self.chat,
+                callback=partial(self.on_previous_chat_page, self.chat),
+                error=self.on_chat_error
+            )
+        elif scroll_y <= CHAT_SCROLL_THRESHOLD and not self.chat.at_end:
+            self.chat_loading = True
+            services.call(
+                services.chat.load_next, self.chat,
+                callback=partial(self.on_next_chat_page, self.chat),
+                error=self.on_chat_error
+            )
+
+    def on_previous_chat_page(self, chat, page):
+        if chat is not self.chat:
+            return
+        added, dropped = page
+        data = self.chat_view.data
+        if dropped:
+            del data[len(data) - dropped:]
+        data[0:0] = [self.chat_entry(message) for message in added]
+        self.keep_chat_scroll_anchor(len(added))
+
+    def on_next_chat_page(self, chat, page):
+        if chat is not self.chat:
+            return
+        added, dropped = page
+        data = self.chat_view.data
+        data.extend(self.chat_entry(message) for message in added)
+        if dropped:
+            del data[:dropped]
+        self.keep_chat_scroll_anchor(-dropped)
+
+    def on_chat_error(self, error):
+        self.chat_loading = False
+        self.show_info_popup(f"Chat error: {str(error)}")
+
+    def scroll_chat_to_bottom(self):
+        self.chat_loading = True
+
+        def scroll(dt):
+            self.chat_view.scroll_y = 0
+            self.chat_loading = False
+        # The new content height is only known after the next layout pass
+        Clock.schedule_once(scroll)
+
+    def keep_chat_scroll_anchor(self, rows_above):
+        """Keep the visible messages in place after rows_above rows were
+        inserted (or removed, if negative) above them"""
+        view = self.chat_view
+        offset = (1 - view.scroll_y) * max(view.layout_manager.height - view.height, 0)
+        offset += rows_above * (CHAT_ROW_HEIGHT + view.layout_manager.spacing)
+        self.chat_loading = True
+
+        def restore(dt):
+            scrollable = view.layout_manager.height - view.height
+            if scrollable > 0:
+                view.scroll_y = min(max(1 - offset / scrollable, 0), 1)
+            self.chat_loading = False
+        Clock.schedule_once(restore)
 
     def create_home_tab(self):
         layout = BoxLayout(orientation='vertical', size_hint=(1, 1))
@@ -503,7 +776,7 @@ class AmazonVideoApp(App):
         layout.add_widget(search_bar)
 
         # Categories filter
-        categories = ["All", "Tech", "Nature", "Gaming", "Music", "Education"]
+        categories = [FOR_YOU, TRENDING, "All", "Tech", "Nature", "Gaming", "Music", "Education"]
         categories_bar = ScrollView(size_hint=(1, 0.08))
         categories_layout = GridLayout(cols=len(categories), size_hint_x=None, spacing=5)
         categories_layout.bind(minimum_width=categories_layout.setter('width'))
@@ -522,18 +795,21 @@ class AmazonVideoApp(App):
         layout.add_widget(categories_bar)
 
         # Video Recommendations
-        scroll = ScrollView(size_hint=(1, 0.82))
-        self.grid = GridLayout(cols=1, spacing=10, size_hint_y=None)
-        self.grid.bind(minimum_height=self.grid.setter('height'))
+        self.feed_view = VideoFeedView(size_hint=(1, 0.82))
+        self.feed_loading = False
 
         self.load_recommended_videos()
 
-        scroll.add_widget(self.grid)
-        layout.add_widget(scroll)
+        self.feed_view.bind(scroll_y=self.on_feed_scroll)
+        layout.add_widget(self.feed_view)
         return layout
 
     def filter_by_category(self, category, instance):
-        if category == "All":
+        if category == FOR_YOU:
+            self.load_personalised_feed()
+        elif category == TRENDING:
+            services.call(services.trending.top, callback=self.on_ranked_feed, error=self.on_feed_error)
+        elif category == "All":
             self.load_recommended_videos()
         else:
             self.load_recommended_videos(category_filter=category)
@@ -542,6 +818,7 @@ class AmazonVideoApp(App):
         layout = BoxLayout(orientation='vertical')
         
         # Shorts Carousel
+        from kivy.uix.carousel import Carousel
         self.carousel = Carousel(direction='right')
         shorts_list = [
             {
@@ -566,7 +843,7 @@ class AmazonVideoApp(App):
 
         for short in shorts_list:
             video_layout = BoxLayout(orientation='vertical')
-            thumbnail = AsyncImage(source=short["thumbnail"], size_hint=(1, 0.8))
+            thumbnail = CachedImage(url=short["thumbnail"], size_hint=(1, 0.8))
             title_label = Label(
                 text=short["title"], 
                 size_hint=(1, 0.1),
@@ -594,7 +871,7 @@ class AmazonVideoApp(App):
         layout.add_widget(title)
         
         # Subscribed channels list
-        scroll = ScrollView()
+        scroll = ScrollView(size_hint=(1, 0.3))
         self.subs_grid = GridLayout(cols=1, size_hint_y=None)
         self.subs_grid.bind(minimum_height=self.subs_grid.setter('height'))
         
@@ -603,6 +880,19 @@ class AmazonVideoApp(App):
         
         scroll.add_widget(self.subs_grid)
         layout.add_widget(scroll)
+
+        # Newest videos across the subscribed channels
+        layout.add_widget(Label(
+            text="Latest from your subscriptions",
+            size_hint=(1, 0.1),
+            color=(0, 0, 0, 1) if not self.dark_mode else (1, 1, 1, 1)
+        ))
+        feed_scroll = ScrollView()
+        self.subs_feed_grid = GridLayout(cols=1, size_hint_y=None)
+        self.subs_feed_grid.bind(minimum_height=self.subs_feed_grid.setter('height'))
+        self.load_subscription_feed()
+        feed_scroll.add_widget(self.subs_feed_grid)
+        layout.add_widget(feed_scroll)
         return layout
 
     def create_upload_tab(self):
@@ -651,6 +941,10 @@ class AmazonVideoApp(App):
         upload_btn.bind(on_press=self.upload_video)
         layout.add_widget(upload_btn)
         
+        cancel_btn = Button(text="Cancel Upload", size_hint=(1, None), height=40)
+        cancel_btn.bind(on_press=self.cancel_upload)
+        layout.add_widget(cancel_btn)
+        
         return layout
 
     def create_profile_tab(self):
@@ -660,8 +954,8 @@ class AmazonVideoApp(App):
         header = BoxLayout(size_hint=(1, 0.3), orientation='horizontal')
         
         # Avatar
-        avatar = AsyncImage(
-            source=self.user_data.get("avatar_path", "https://via.placeholder.com/100x100?text=User"),
+        avatar = CachedImage(
+            url=self.user_data.get("avatar_path") or "https://via.placeholder.com/100x100?text=User",
             size_hint=(0.3, 1),
             keep_ratio=True
         )
@@ -769,21 +1063,18 @@ class AmazonVideoApp(App):
         popup.open()
 
     def save_profile(self, avatar_url, bio, popup):
-        try:
-            self.user_data["avatar_path"] = avatar_url
-            self.user_data["bio"] = bio
-            
-            cursor.execute(
-                "UPDATE users SET avatar_path=?, bio=? WHERE id=?",
-                (avatar_url, bio, self.current_user)
-            )
-            conn.commit()
-            
-            popup.dismiss()
-            self.show_info_popup("Profile updated successfully!")
-            self.tab_panel.switch_to(self.tab_panel.tab_list[-1])  # Switch to Profile tab
-        except Exception as e:
-            self.show_info_popup(f"Error updating profile: {str(e)}")
+        services.call(
+            services.accounts.update_profile, self.current_user, avatar_url, bio,
+            callback=partial(self.on_profile_saved, avatar_url, bio, popup),
+            error=partial(self.on_service_error, "Error updating profile")
+        )
+
+    def on_profile_saved(self, avatar_url, bio, popup, result):
+        self.user_data["avatar_path"] = avatar_url
+        self.user_data["bio"] = bio
+        popup.dismiss()
+        self.show_info_popup("Profile updated successfully!")
+        self.tab_panel.switch_to(self.tab_panel.tab_list[-1])  # Switch to Profile tab
 
     def select_video(self, instance):
         try:
@@ -816,48 +1107,92 @@ class AmazonVideoApp(App):
         category = self.upload_category.text.strip() or "General"
         tags = self.upload_tags.text.strip()
         
+        if self.upload_job is not None:
+            self.show_info_popup("An upload is already in progress")
+            return
+        
         try:
-            # Get video duration (simplified - in a real app you'd use a proper method)
-            duration = 300  # Default 5 minutes
-            
-            cursor.execute(
-                '''INSERT INTO videos 
-                (title, file_path, uploader_id, category, tags, duration) 
-                VALUES (?, ?, ?, ?, ?, ?)''',
-                (title, self.selected_video_path, self.current_user, category, tags, duration)
+            # Copy in the background; the DB row is only written once the file is complete
+            source = self.selected_video_path
+            extension = os.path.splitext(source)[1] or ".mp4"
+            dest_path = os.path.join(MEDIA_DIR, "staging", staging_name(source) + extension)
+            self.upload_progress = -1
+            self.upload_job = IngestJob(source, dest_path, progress=self.on_upload_progress)
+            future = self.upload_job.start()
+            future.add_done_callback(
+                lambda f: Clock.schedule_once(partial(self.finish_upload, f, title, category, tags))
             )
-            video_id = cursor.lastrowid
-            
-            # Copy video to app directory
-            os.makedirs("videos", exist_ok=True)
-            dest_path = os.path.join("videos", f"{video_id}.mp4")
-            shutil.copy(self.selected_video_path, dest_path)
-            
-            # Update the file path in DB to the copied location
-            cursor.execute(
-                "UPDATE videos SET file_path=? WHERE id=?",
-                (dest_path, video_id)
-            )
-            
-            conn.commit()
-            
-            # Add to UserUploads channel
-            self.channels["UserUploads"]["videos"].append(title)
-            
-            self.show_info_popup("Video uploaded successfully!")
-            self.load_recommended_videos()
-            self.tab_panel.switch_to(self.tab_panel.tab_list[0])  # Switch to Home tab
-            
-            # Reset form
-            self.upload_title.text = ""
-            self.upload_category.text = ""
-            self.upload_tags.text = ""
-            self.video_path_label.text = "No video selected"
-            self.selected_video_path = None
-            
+            self.video_path_label.text = "Uploading... 0%"
         except Exception as e:
+            self.upload_job = None
             self.show_info_popup(f"Error uploading video: {str(e)}")
 
+    def on_upload_progress(self, copied, total):
+        # Runs on the ingest worker; only bounce to the UI when the percentage changes
+        percent = int(copied * 100 / total) if total else 100
+        if percent != self.upload_progress:
+            self.upload_progress = percent
+            Clock.schedule_once(lambda dt: setattr(self.video_path_label, "text", f"Uploading... {percent}%"))
+
+    def cancel_upload(self, instance):
+        if self.upload_job is not None:
+            self.upload_job.cancel()
+
+    def finish_upload(self, future, title, category, tags, dt):
+        self.upload_job = None
+        error = future.exception()
+        if isinstance(error, IngestCancelled):
+            self.video_path_label.text = "Upload cancelled, select Upload again to resume"
+            return
+        if error is not None:
+            self.video_path_label.text = os.path.basename(self.selected_video_path or "") or "No video selected"
+            self.show_info_popup(f"Error uploading video: {str(error)}")
+            return
+
+        result = future.result()
+        self.video_path_label.text = "Processing..."
+        services.call(
+            services.uploads.store, self.current_user, result.path, result.sha256, title, category, tags,
+            callback=self.on_upload_stored,
+            error=self.on_upload_store_failed
+        )
+
+    def on_upload_stored(self, upload):
+        # Poster and scrub sprites, unless an earlier upload of the same content made them.
+        # Where no worker process can be started there are none; the upload is done either way
+        if not upload["has_previews"]:
+            blob_path = upload["path"]
+            previews = preview_jobs.submit(blob_path, upload["duration_ms"])
+            if previews is not None:
+                previews.add_done_callback(
+                    lambda f: Clock.schedule_once(partial(self.on_previews_ready, blob_path, f))
+                )
+
+        self.load_subscription_feed()
+        self.show_info_popup("Video uploaded successfully!")
+        self.load_recommended_videos()
+        self.tab_panel.switch_to(self.tab_panel.tab_list[0])  # Switch to Home tab
+
+        # Reset form
+        self.upload_title.text = ""
+        self.upload_category.text = ""
+        self.upload_tags.text = ""
+        self.video_path_label.text = "No video selected"
+        self.selected_video_path = None
+
+    def on_upload_store_failed(self, error):
+        self.video_path_label.text = os.path.basename(self.selected_video_path or "") or "No video selected"
+        self.on_service_error("Error uploading video", error)
+
+    def on_previews_ready(self, media_path, future, dt):
+        if future.exception() is not None:
+            return  # No decoder, or not a video; the placeholder thumbnail stays
+        poster = preview_paths(media_path).poster
+        for video in self.feed_view.data:
+            if video.get("file_path") == media_path:
+                video["thumbnail"] = poster
+        self.feed_view.refresh_from_data()
+
     def play_video(self, video, instance=None):
         if not video.get("source"):
             self.show_info_popup("Video source not available")
@@ -870,38 +1205,31 @@ class AmazonVideoApp(App):
         )
         layout = BoxLayout(orientation='vertical')
 
+        from kivy.uix.video import Video
         video_source = video.get("source", "https://sample-videos.com/video123/mp4/720/big_buck_bunny_720p_1mb.mp4")
         video_widget = Video(
             source=video_source, 
-            size_hint=(1, 0.8),
+            size_hint=(1, 0.7),
             options={'eos': 'loop'}
         )
         video_widget.state = 'play'
         self.current_playing_video = video_widget
         
-        # Store video progress when position changes
+        # The video id (for media opened by path), saved progress, the history
+        # entry and the view count are handled on a worker
+        self.video_progress = 0
+        services.call(
+            services.videos.start_playback, self.current_user, video.get("id"), video_source,
+            callback=partial(self.on_playback_started, video_widget),
+            error=partial(self.on_service_error, "Error loading video")
+        )
+
+        # Buffer progress in memory and write it out periodically and on pause, on a worker
+        self.progress_tracker.start(self.current_user, video.get("id"), self.video_progress)
         video_widget.bind(position=self.update_video_progress)
-        
-        # Check if we have saved progress for this video
-        if 'id' in video:
-            cursor.execute(
-                "SELECT progress FROM watch_history WHERE user_id=? AND video_id=?",
-                (self.current_user, video["id"])
-            )
-            progress = cursor.fetchone()
-            if progress:
-                video_widget.seek(progress[0] / 100)  # Convert percentage to position
+        video_widget.bind(state=self.on_video_state)
 
-        # Add to watch history
-        if 'id' in video:
-            cursor.execute(
-                '''INSERT OR REPLACE INTO watch_history 
-                (user_id, video_id, progress, last_watched) 
-                VALUES (?, ?, ?, CURRENT_TIMESTAMP)''',
-                (self.current_user, video["id"], self.video_progress)
-            )
-            conn.commit()
-        elif video["title"] not in [vh["title"] for vh in self.user_data["watch_history"]]:
+        if 'id' not in video and video["title"] not in [vh["title"] for vh in self.user_data["watch_history"]]:
             self.user_data["watch_history"].append({
                 "title": video["title"],
                 "progress": 0,
@@ -940,39 +1268,97 @@ class AmazonVideoApp(App):
         controls.add_widget(download_btn)
         controls.add_widget(comments_btn)
 
+        # Scrub bar; while dragging, the sprite sheet previews where the seek will land
+        from kivy.uix.slider import Slider
+        scrub_bar = BoxLayout(size_hint=(1, 0.1))
+        self.scrub_preview = Image(size_hint_x=0.2, opacity=0)
+        self.scrub_slider = Slider(min=0, max=1, value=0, size_hint_x=0.8)
+        self.scrub_slider.bind(
+            on_touch_down=self.on_scrub_touch_down,
+            on_touch_up=self.on_scrub_touch_up,
+            value=self.on_scrub_value
+        )
+        self.scrubbing = False
+        self.scrub_index = None  # Set by on_playback_started once the worker has read it
+        self.scrub_sprites = None
+        scrub_bar.add_widget(self.scrub_preview)
+        scrub_bar.add_widget(self.scrub_slider)
+
         # Update progress periodically
-        Clock.schedule_interval(partial(self.update_progress_label, video_widget), 1)
+        self.progress_label_event = Clock.schedule_interval(partial(self.update_progress_label, video_widget), 1)
 
         close_button = Button(text="Close", size_hint=(1, 0.1))
         close_button.bind(on_press=popup.dismiss)
 
         layout.add_widget(video_widget)
+        layout.add_widget(scrub_bar)
         layout.add_widget(controls)
         layout.add_widget(close_button)
 
         popup.content = layout
         popup.open()
         
-        # When popup closes, unschedule the progress updater
-        popup.bind(on_dismiss=lambda x: Clock.unschedule(self.update_progress_label))
+        # When popup closes, unschedule the progress updater and save the position
+        popup.bind(on_dismiss=self.on_video_popup_dismiss)
+
+    def on_playback_started(self, video_widget, playback):
+        if video_widget is not self.current_playing_video:
+            return  # Closed, or another video started, while loading
+        self.progress_tracker.video_id = playback["video_id"]
+        self.video_progress = playback["progress"]
+        self.scrub_index = playback["previews"]
+        # Resume on the keyframe at or before the saved position
+        self.seek_when_loaded(video_widget, playback["resume_ms"])
+
+    def on_video_popup_dismiss(self, popup):
+        self.progress_label_event.cancel()
+        self.progress_tracker.stop()
+
+    def seek_when_loaded(self, video_widget, position_ms):
+        """Seek to position_ms as soon as the player knows the duration.
+
+        Positions come from the keyframe index, so a fast (imprecise) seek
+        lands exactly on them without decoding forward."""
+        if position_ms <= 0:
+            return
+
+        def seek(instance, duration):
+            if duration > 0:
+                instance.unbind(duration=seek)
+                instance.seek(min(position_ms / 1000 / duration, 1), precise=False)
+        video_widget.bind(duration=seek)
+
+    def on_scrub_touch_down(self, slider, touch):
+        if slider.collide_point(*touch.pos):
+            self.scrubbing = True
+
+    def on_scrub_value(self, slider, value):
+        video_widget = self.current_playing_video
+        if not self.scrubbing or not self.scrub_index or video_widget.duration <= 0:
+            return
+        if self.scrub_sprites is None:
+            sprites = os.path.join(os.path.dirname(video_widget.source), self.scrub_index["sprites"])
+            self.scrub_sprites = ImageLoader.load(sprites, keep_data=False).texture
+        x, y, w, h = sprite_tile(self.scrub_index, value * video_widget.duration * 1000)
+        # The index counts rows from the top, Kivy textures from the bottom
+        self.scrub_preview.texture = self.scrub_sprites.get_region(x, self.scrub_sprites.height - y - h, w, h)
+        self.scrub_preview.opacity = 1
+
+    def on_scrub_touch_up(self, slider, touch):
+        if not self.scrubbing:
+            return
+        self.scrubbing = False
+        self.scrub_preview.opacity = 0
+        self.current_playing_video.seek(slider.value, precise=False)
 
     def update_video_progress(self, instance, position):
         if hasattr(instance, 'duration') and instance.duration > 0:
-            self.video_progress = (position / instance.duration) * 100
-            
-            # Update DB if this is a database video
-            if hasattr(self, 'current_playing_video') and hasattr(instance, 'source'):
-                cursor.execute('''
-                    SELECT id FROM videos WHERE file_path=?
-                ''', (instance.source,))
-                video_id = cursor.fetchone()
-                if video_id:
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO watch_history 
-                        (user_id, video_id, progress, last_watched) 
-                        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-                    ''', (self.current_user, video_id[0], self.video_progress))
-                    conn.commit()
+            self.progress_tracker.update(position, instance.duration)
+            self.video_progress = self.progress_tracker.progress
+
+    def on_video_state(self, instance, state):
+        if state != 'play':
+            self.progress_tracker.flush()
 
     def update_progress_label(self, video_widget, dt):
         if hasattr(video_widget, 'position') and hasattr(video_widget, 'duration'):
@@ -980,45 +1366,22 @@ class AmazonVideoApp(App):
                 current = int(video_widget.position)
                 total = int(video_widget.duration)
                 self.progress_label.text = f"{current//60}:{current%60:02d} / {total//60}:{total%60:02d}"
+                if not self.scrubbing:
+                    self.scrub_slider.value = video_widget.position / video_widget.duration
 
     def download_video(self, video, instance):
         if 'id' not in video:
             self.show_info_popup("Cannot download this video")
             return
-            
-        try:
-            cursor.execute("SELECT file_path FROM videos WHERE id=?", (video["id"],))
-            video_path = cursor.fetchone()[0]
-            
-            if not os.path.exists(video_path):
-                self.show_info_popup("Video file not found")
-                return
-                
-            # Create downloads directory if it doesn't exist
-            os.makedirs(self.downloads_dir, exist_ok=True)
-                
-            # Copy video to downloads directory
-            dest_path = os.path.join(self.downloads_dir, f"{video['id']}_{os.path.basename(video_path)}")
-            shutil.copy(video_path, dest_path)
-            
-            # Add to downloads in DB
-            cursor.execute('''
-                INSERT OR REPLACE INTO downloads 
-                (user_id, video_id, download_path) 
-                VALUES (?, ?, ?)
-            ''', (self.current_user, video["id"], dest_path))
-            conn.commit()
-            
-            # Update user data
-            self.user_data["downloads"].append({
-                "id": video["id"],
-                "title": video["title"],
-                "path": dest_path
-            })
-            
-            self.show_info_popup("Video downloaded successfully!")
-        except Exception as e:
-            self.show_info_popup(f"Error downloading video: {str(e)}")
+        services.call(
+            services.downloads.download, self.current_user, video["id"], self.downloads_dir,
+            callback=self.on_video_downloaded,
+            error=partial(self.on_service_error, "Error downloading video")
+        )
+
+    def on_video_downloaded(self, download):
+        self.user_data["downloads"].append(download)
+        self.show_info_popup("Video downloaded successfully!")
 
     def show_comments(self, video_id, instance):
         if not video_id:
@@ -1031,64 +1394,21 @@ class AmazonVideoApp(App):
             background_color=(0.9, 0.9, 0.9, 1) if not self.dark_mode else (0.2, 0.2, 0.2, 1)
         )
         layout = BoxLayout(orientation='vertical')
-        
-        # Fetch comments from DB
-        cursor.execute('''
-            SELECT u.username, c.text, c.timestamp 
-            FROM comments c
-            JOIN users u ON c.user_id = u.id
-            WHERE c.video_id = ?
-            ORDER BY c.timestamp DESC
-        ''', (video_id,))
-        comments = cursor.fetchall()
-        
-        # Comments list
-        scroll = ScrollView()
-        comments_layout = GridLayout(cols=1, size_hint_y=None, spacing=10)
-        comments_layout.bind(minimum_height=comments_layout.setter('height'))
-        
-        if not comments:
-            no_comments = Label(
-                text="No comments yet", 
-                size_hint_y=None,
-                height=40,
-                color=(0, 0, 0, 1) if not self.dark_mode else (1, 1, 1, 1)
-            )
-            comments_layout.add_widget(no_comments)
-        else:
-            for username, text, timestamp in comments:
-                comment_box = BoxLayout(orientation='vertical', size_hint_y=None, height=100)
-                
-                header = BoxLayout(size_hint=(1, 0.3))
-                user_label = Label(
-                    text=username,
-                    size_hint=(0.7, 1),
-                    halign="left",
-                    color=(0, 0, 0, 1) if not self.dark_mode else (1, 1, 1, 1)
-                )
-                time_label = Label(
-                    text=timestamp,
-                    size_hint=(0.3, 1),
-                    halign="right",
-                    color=(0, 0, 0, 1) if not self.dark_mode else (1, 1, 1, 1)
-                )
-                header.add_widget(user_label)
-                header.add_widget(time_label)
-                
-                comment_text = Label(
-                    text=text,
-                    size_hint=(1, 0.7),
-                    text_size=(Window.width * 0.8 - 20, None),
-                    halign="left",
-                    valign="top",
-                    color=(0, 0, 0, 1) if not self.dark_mode else (1, 1, 1, 1)
-                )
-                
-                comment_box.add_widget(header)
-                comment_box.add_widget(comment_text)
-                comments_layout.add_widget(comment_box)
-        
-        scroll.add_widget(comments_layout)
+        self.comments_layout = layout
+        
+        # Comments list, loaded a page at a time as the user scrolls down
+        self.comments_video_id = video_id
+        self.comments_exhausted = False
+        self.comments_loading = False
+        self.comments_view = CommentsView()
+        self.comments_view.bind(scroll_y=self.on_comments_scroll)
+        self.no_comments_label = Label(
+            text="No comments yet", 
+            size_hint_y=None,
+            height=40,
+            color=(0, 0, 0, 1) if not self.dark_mode else (1, 1, 1, 1)
+        )
+        self.load_more_comments()
         
         # Add comment section
         add_comment_layout = BoxLayout(size_hint=(1, 0.2), spacing=10)
@@ -1108,31 +1428,61 @@ class AmazonVideoApp(App):
         close_btn = Button(text="Close", size_hint=(1, 0.1))
         close_btn.bind(on_press=popup.dismiss)
         
-        layout.add_widget(scroll)
+        layout.add_widget(self.comments_view)
         layout.add_widget(add_comment_layout)
         layout.add_widget(close_btn)
         
         popup.content = layout
         popup.open()
 
+    def load_more_comments(self):
+        data = self.comments_view.data
+        before = comment_cursor(data[-1]) if data else None
+        self.comments_loading = True
+        services.call(
+            services.comments.page, self.comments_video_id, before,
+            callback=partial(self.on_comments_page, self.comments_view),
+            error=partial(self.on_comments_error, self.comments_view)
+        )
+
+    def on_comments_page(self, view, page):
+        if view is not self.comments_view:
+            return  # The popup was closed or reopened while the page loaded
+        self.comments_loading = False
+        if len(page) < COMMENTS_PAGE_SIZE:
+            self.comments_exhausted = True
+        if not page and not view.data:
+            # Above the list, like the list itself
+            self.comments_layout.add_widget(self.no_comments_label, index=len(self.comments_layout.children))
+        view.data.extend(page)
+
+    def on_comments_error(self, view, error):
+        if view is self.comments_view:
+            self.comments_loading = False
+            self.show_info_popup(f"Error loading comments: {str(error)}")
+
+    def on_comments_scroll(self, view, scroll_y):
+        if self.comments_exhausted or self.comments_loading:
+            return
+        if scroll_y <= COMMENTS_SCROLL_THRESHOLD and view.height < view.layout_manager.height:
+            self.load_more_comments()
+
     def post_comment(self, video_id, popup, instance):
-        comment_text = self.comment_input.text.strip()
-        if not comment_text:
-            self.show_info_popup("Comment cannot be empty")
+        services.call(
+            services.comments.post, video_id, self.current_user, self.comment_input.text,
+            callback=partial(self.on_comment_posted, self.comments_view),
+            error=partial(self.on_service_error, "Error posting comment")
+        )
+
+    def on_comment_posted(self, view, comment):
+        if view is not self.comments_view:
             return
-            
-        try:
-            cursor.execute('''
-                INSERT INTO comments (video_id, user_id, text)
-                VALUES (?, ?, ?)
-            ''', (video_id, self.current_user, comment_text))
-            conn.commit()
-            
-            self.comment_input.text = ""
-            popup.dismiss()
-            self.show_comments(video_id, instance)  # Refresh comments
-        except Exception as e:
-            self.show_info_popup(f"Error posting comment: {str(e)}")
+        self.comment_input.text = ""
+        if self.no_comments_label.parent:
+            self.no_comments_label.parent.remove_widget(self.no_comments_label)
+        # Newest first: show the new comment at the top without requerying
+        view.data.insert(0, comment)
+        view.scroll_y = 1
 
     def logout(self, instance):
         self.current_user = None
@@ -1214,13 +1564,8 @@ class AmazonVideoApp(App):
         if 'id' in video:
             video_dict["id"] = video["id"]
         
+        # play_video resumes from the saved position
         self.play_video(video_dict)
-        
-        # Seek to saved position
-        if hasattr(self, 'current_playing_video') and self.current_playing_video:
-            if 'duration' in video and video["duration"] > 0:
-                position = (video["progress"] / 100) * video["duration"]
-                self.current_playing_video.seek(position / video["duration"])
 
     def show_notifications(self, instance):
         popup = Popup(
@@ -1279,13 +1624,14 @@ class AmazonVideoApp(App):
             layout.add_widget(no_downloads)
         else:
             for download in self.user_data["downloads"]:
-                btn = Button(
-                    text=download["title"], 
-                    size_hint_y=None, 
-                    height=60
-                )
+                row = BoxLayout(size_hint_y=None, height=60)
+                btn = Button(text=download["title"], size_hint_x=0.8)
                 btn.bind(on_press=partial(self.play_downloaded_video, download))
-                layout.add_widget(btn)
+                remove_btn = Button(text="🗑 Remove", size_hint_x=0.2)
+                remove_btn.bind(on_press=partial(self.remove_download, download, layout, row))
+                row.add_widget(btn)
+                row.add_widget(remove_btn)
+                layout.add_widget(row)
             
         close_button = Button(text="Close", size_hint=(1, 0.1))
         close_button.bind(on_press=popup.dismiss)
@@ -1298,6 +1644,18 @@ class AmazonVideoApp(App):
         popup.content = main_layout
         popup.open()
 
+    def remove_download(self, download, layout, row, instance):
+        services.call(
+            services.downloads.remove, self.current_user, download["id"],
+            callback=partial(self.on_download_removed, download, layout, row),
+            error=partial(self.on_service_error, "Error removing download")
+        )
+
+    def on_download_removed(self, download, layout, row, video_id):
+        if download in self.user_data["downloads"]:
+            self.user_data["downloads"].remove(download)
+        layout.remove_widget(row)
+
     def play_downloaded_video(self, download, instance):
         if not os.path.exists(download["path"]):
             self.show_info_popup("Downloaded file not found")
@@ -1310,17 +1668,16 @@ class AmazonVideoApp(App):
         )
         layout = BoxLayout(orientation='vertical')
 
+        from kivy.uix.video import Video
         video_widget = Video(source=download["path"], size_hint=(1, 0.9))
         video_widget.state = 'play'
         
-        # Check for saved progress
-        cursor.execute(
-            "SELECT progress FROM watch_history WHERE user_id=? AND video_id=?",
-            (self.current_user, download["id"])
+        # Resume on the keyframe at or before the saved position
+        services.call(
+            services.videos.resume_position, self.current_user, download["id"],
+            callback=partial(self.seek_when_loaded, video_widget),
+            error=partial(self.on_service_error, "Error loading video")
         )
-        progress = cursor.fetchone()
-        if progress:
-            video_widget.seek(progress[0] / 100)
 
         close_button = Button(text="Close", size_hint=(1, 0.1))
         close_button.bind(on_press=popup.dismiss)
@@ -1384,55 +1741,33 @@ class AmazonVideoApp(App):
         status = "enabled" if self.user_data["ads_enabled"] else "disabled"
         self.show_info_popup(f"Ads have been {status}")
 
-    def load_recommended_videos(self, search_query="", category_filter=None):
-        self.grid.clear_widgets()
-        query = '''
-            SELECT id, title, likes, category, tags 
-            FROM videos 
-            WHERE 1=1
-        '''
-        params = []
-        
-        if search_query:
-            query += " AND title LIKE ?"
-            params.append(f"%{search_query}%")
-            
-        if category_filter:
-            query += " AND category = ?"
-            params.append(category_filter)
-            
-        cursor.execute(query, params)
-        db_videos = cursor.fetchall()
-        
-        video_list = []
-        for vid in db_videos:
-            video_list.append({
-                "id": vid[0],
-                "title": vid[1],
-                "thumbnail": "https://via.placeholder.com/300x200?text=" + vid[1].replace(" ", "+"),
-                "source": "local_video.mp4",  # In a real app, use actual path
-                "channel": "UserUploads",
-                "likes": vid[2],
-                "category": vid[3],
-                "tags": vid[4]
-            })
-        
-        # Add channel videos
+    def load_personalised_feed(self):
+        services.call(
+            services.recommendations.for_user, self.current_user,
+            callback=self.on_ranked_feed,
+            error=self.on_feed_error
+        )
+
+    def on_ranked_feed(self, video_ids):
+        self.load_recommended_videos(ranked=video_ids)
+
+    def load_recommended_videos(self, search_query="", category_filter=None, ranked=None):
+        # Hard-coded channel videos and the ad follow the database results
+        tail = []
         for channel in self.channels:
-            if channel != "UserUploads":
-                for video in self.channels[channel]["videos"]:
-                    video_list.append({
-                        "title": video,
-                        "thumbnail": "https://via.placeholder.com/300x200?text=" + video.replace(" ", "+"),
-                        "source": "https://sample-videos.com/video123/mp4/720/big_buck_bunny_720p_1mb.mp4",
-                        "channel": channel,
-                        "likes": 0,
-                        "category": "General"
-                    })
+            for video in self.channels[channel]["videos"]:
+                tail.append({
+                    "title": video,
+                    "thumbnail": "https://via.placeholder.com/300x200?text=" + video.replace(" ", "+"),
+                    "source": "https://sample-videos.com/video123/mp4/720/big_buck_bunny_720p_1mb.mp4",
+                    "channel": channel,
+                    "likes": 0,
+                    "category": "General"
+                })
         
         # Add an ad if enabled
         if self.user_data["ads_enabled"]:
-            video_list.append({
+            tail.append({
                 "title": "Ad", 
                 "thumbnail": "https://via.placeholder.com/300x200?text=Sponsored+Ad", 
                 "source": None, 
@@ -1440,76 +1775,116 @@ class AmazonVideoApp(App):
                 "category": "Ad"
             })
 
-        for video in video_list:
-            video_layout = BoxLayout(orientation="horizontal", size_hint_y=None, height=150)
+        self.feed = services.feed.window(
+            category=category_filter, search=search_query, tail=tail, ranked=ranked
+        )
+        self.feed_view.data = []
+        self.feed_view.scroll_y = 1
+        self.load_next_feed_page()
+
+    def feed_entry(self, video):
+        """Fill in the display fields of a database row from the feed window"""
+        if "id" in video and "thumbnail" not in video:
+            # The locally generated poster, when the worker found one, saves a network round trip per row
+            video.update({
+                "thumbnail": video.get("poster") or
+                "https://via.placeholder.com/300x200?text=" + video["title"].replace(" ", "+"),
+                "source": video["file_path"]
+            })
+        return video
 
-            thumbnail = AsyncImage(source=video["thumbnail"], size_hint_x=0.3)
+    def on_feed_scroll(self, view, scroll_y):
+        if self.feed_loading or view.height >= view.layout_manager.height:
+            return
+        if scroll_y <= FEED_SCROLL_THRESHOLD and not self.feed.at_end:
+            self.load_next_feed_page()
+        elif scroll_y >= 1 - FEED_SCROLL_THRESHOLD and not self.feed.at_start:
+            self.load_previous_feed_page()
+
+    def load_next_feed_page(self):
+        self.feed_loading = True
+        services.call(
+            services.feed.load_next, self.feed,
+            callback=partial(self.on_next_feed_page, self.feed),
+            error=self.on_feed_error
+        )
 
-            if video["source"]:
-                play_button = Button(
-                    text=video["title"], 
-                    size_hint_x=0.3,
-                    background_color=(1, 1, 1, 1) if not self.dark_mode else (0.2, 0.2, 0.2, 1),
-                    color=(0, 0, 0, 1) if not self.dark_mode else (1, 1, 1, 1)
-                )
-                play_button.bind(on_press=partial(self.play_video, video))
+    def on_next_feed_page(self, feed, page):
+        if feed is not self.feed:
+            return  # A new search or filter replaced this window
+        added, dropped = page
+        data = self.feed_view.data
+        data.extend(self.feed_entry(video) for video in added)
+        if dropped:
+            del data[:dropped]
+        self.keep_feed_scroll_anchor(-dropped)
+
+    def load_previous_feed_page(self):
+        self.feed_loading = True
+        services.call(
+            services.feed.load_previous, self.feed,
+            callback=partial(self.on_previous_feed_page, self.feed),
+            error=self.on_feed_error
+        )
 
-                like_count = video.get("likes", 0)
-                like_button = Button(
-                    text=f"👍 {like_count}", 
-                    size_hint_x=0.15,
-                    background_color=(1, 1, 1, 1) if not self.dark_mode else (0.2, 0.2, 0.2, 1),
-                    color=(0, 0, 0, 1) if not self.dark_mode else (1, 1, 1, 1)
-                )
-                if 'id' in video:
-                    like_button.bind(on_press=partial(self.like_video_db, video["id"]))
-                else:
-                    like_button.bind(on_press=partial(self.like_video_mem, video["title"]))
-                
-                channel_label = Label(
-                    text=f"Channel: {video['channel']}", 
-                    size_hint_x=0.15,
-                    color=(0, 0, 0, 1) if not self.dark_mode else (1, 1, 1, 1)
-                )
-                sub_button = Button(
-                    text="Subscribed ✓" if video['channel'] in self.user_data["subscriptions"] else "Subscribe",
-                    size_hint_x=0.1,
-                    background_color=(1, 1, 1, 1) if not self.dark_mode else (0.2, 0.2, 0.2, 1),
-                    color=(0, 0, 0, 1) if not self.dark_mode else (1, 1, 1, 1)
-                )
-                sub_button.bind(on_press=partial(self.toggle_subscription, video['channel']))
+    def on_previous_feed_page(self, feed, page):
+        if feed is not self.feed:
+            return
+        added, dropped = page
+        data = self.feed_view.data
+        if dropped:
+            del data[len(data) - dropped:]
+        data[0:0] = [self.feed_entry(video) for video in added]
+        self.keep_feed_scroll_anchor(len(added))
+
+    def on_feed_error(self, error):
+        self.feed_loading = False
+        self.show_info_popup(f"Error loading videos: {str(error)}")
+
+    def keep_feed_scroll_anchor(self, rows_above):
+        """Keep the visible rows in place after rows_above rows were inserted
+        (or removed, if negative) above them. The new content height is only
+        known after the next layout pass."""
+        view = self.feed_view
+        offset = (1 - view.scroll_y) * max(view.layout_manager.height - view.height, 0)
+        offset += rows_above * (FEED_ROW_HEIGHT + view.layout_manager.spacing)
+        self.feed_loading = True
+
+        def restore(dt):
+            scrollable = view.layout_manager.height - view.height
+            if scrollable > 0:
+                view.scroll_y = min(max(1 - offset / scrollable, 0), 1)
+            self.feed_loading = False
+        Clock.schedule_once(restore)
+
+    def like_video_db(self, video, instance):
+        # A tap likes or unlikes. The row updates right away; the like is
+        # buffered and reaches the database with the next flush_buffers.
+        liked = video["id"] not in self.liked_videos
+        self.show_like(video, liked, instance)
+        services.call(
+            services.videos.set_like, self.current_user, video["id"], liked,
+            error=partial(self.on_like_failed, video, liked)
+        )
 
-                video_layout.add_widget(thumbnail)
-                video_layout.add_widget(play_button)
-                video_layout.add_widget(like_button)
-                video_layout.add_widget(channel_label)
-                video_layout.add_widget(sub_button)
-            else:
-                ad_label = Label(
-                    text="Sponsored Ad", 
-                    size_hint_x=0.7,
-                    color=(0, 0, 0, 1) if not self.dark_mode else (1, 1, 1, 1)
-                )
-                ad_button = Button(
-                    text="Learn More", 
-                    size_hint_x=0.3,
-                    background_color=(1, 1, 1, 1) if not self.dark_mode else (0.2, 0.2, 0.2, 1),
-                    color=(0, 0, 0, 1) if not self.dark_mode else (1, 1, 1, 1)
-                )
-                ad_button.bind(on_press=self.show_ad)
-                video_layout.add_widget(thumbnail)
-                video_layout.add_widget(ad_label)
-                video_layout.add_widget(ad_button)
+    def show_like(self, video, liked, instance=None):
+        if liked:
+            self.liked_videos.add(video["id"])
+        else:
+            self.liked_videos.discard(video["id"])
+        video["likes"] = max(video.get("likes", 0) + (1 if liked else -1), 0)
+        # The row that was tapped may have been recycled for another video by now
+        if instance is not None and instance.parent is not None and instance.parent.video is video:
+            instance.text = like_label(video["likes"], liked)
 
-            self.grid.add_widget(video_layout)
+    def on_like_failed(self, video, liked, error):
+        self.show_like(video, not liked)
+        self.feed_view.refresh_from_data()
+        self.on_service_error("Error liking video", error)
 
-    def like_video_db(self, video_id, instance):
-        cursor.execute("UPDATE videos SET likes = likes + 1 WHERE id = ?", (video_id,))
-        conn.commit()
-        cursor.execute("SELECT likes FROM videos WHERE id = ?", (video_id,))
-        new_count = cursor.fetchone()[0]
-        instance.text = f"👍 {new_count}"
-        self.show_info_popup("Video liked!")
+    def flush_buffers(self, dt=None):
+        # Likes and the trending scores they feed
+        services.call(services.flush, error=partial(self.on_service_error, "Error saving likes"))
 
     def like_video_mem(self, video_title, instance):
         if video_title in self.user_data["likes"]:
@@ -1518,8 +1893,11 @@ class AmazonVideoApp(App):
             self.user_data["likes"][video_title] = 1
         instance.text = f"👍 {self.user_data['likes'][video_title]}"
         self.show_info_popup(f"You liked {video_title}")
+        return self.user_data['likes'][video_title]
 
     def load_subscriptions(self):
+        if self.subs_grid is None:
+            return  # Subscriptions tab not built yet; it loads them when it is
         self.subs_grid.clear_widgets()
         if not self.user_data["subscriptions"]:
             no_subs = Label(
@@ -1541,11 +1919,51 @@ class AmazonVideoApp(App):
                 btn.bind(on_press=lambda x, c=channel: self.show_channel(c))
                 self.subs_grid.add_widget(btn)
 
+    def load_subscription_feed(self):
+        if self.subs_feed_grid is None:
+            return  # Subscriptions tab not built yet; it loads the feed when it is
+        services.call(
+            services.channels.latest, self.current_user,
+            callback=self.show_subscription_feed,
+            error=partial(self.on_service_error, "Error loading subscriptions")
+        )
+
+    def show_subscription_feed(self, videos):
+        if self.subs_feed_grid is None:
+            return  # Logged out while loading
+        self.subs_feed_grid.clear_widgets()
+        if not videos:
+            self.subs_feed_grid.add_widget(Label(
+                text="No videos from your subscriptions yet",
+                size_hint_y=None,
+                height=40,
+                color=(0, 0, 0, 1) if not self.dark_mode else (1, 1, 1, 1)
+            ))
+        for video in videos:
+            self.subs_feed_grid.add_widget(self.video_button(video))
+
+    def video_button(self, video):
+        """A button playing a video from the database"""
+        btn = Button(
+            text=video["title"],
+            size_hint_y=None,
+            height=40,
+            background_color=(1, 1, 1, 1) if not self.dark_mode else (0.2, 0.2, 0.2, 1),
+            color=(0, 0, 0, 1) if not self.dark_mode else (1, 1, 1, 1)
+        )
+        btn.bind(on_press=partial(self.play_video, self.feed_entry(video)))
+        return btn
+
     def show_channel(self, channel_name):
-        if channel_name not in self.channels:
-            self.show_info_popup("Channel not found")
-            return
-            
+        services.call(
+            services.channels.profile, channel_name,
+            callback=self.on_channel_loaded,
+            error=partial(self.on_service_error, "Error loading channel")
+        )
+
+    def on_channel_loaded(self, result):
+        channel, videos = result
+        channel_name = channel["name"]
         popup = Popup(
             title=channel_name, 
             size_hint=(0.9, 0.8),
@@ -1555,7 +1973,9 @@ class AmazonVideoApp(App):
         
         # Channel header
         header = BoxLayout(size_hint=(1, 0.2))
-        header.add_widget(AsyncImage(source=self.channels[channel_name]["logo"]))
+        header.add_widget(CachedImage(
+            url=channel["logo"] or "https://via.placeholder.com/100x100?text=" + channel_name.replace(" ", "+")
+        ))
         
         channel_info = BoxLayout(orientation='vertical')
         channel_label = Label(
@@ -1563,7 +1983,7 @@ class AmazonVideoApp(App):
             color=(0, 0, 0, 1) if not self.dark_mode else (1, 1, 1, 1)
         )
         subs_count = Label(
-            text=f"{len(self.user_data['subscriptions'])} subscribers",
+            text=f"{channel['subscriber_count']} subscribers · {channel['video_count']} videos",
             color=(0, 0, 0, 1) if not self.dark_mode else (1, 1, 1, 1)
         )
         channel_info.add_widget(channel_label)
@@ -1579,12 +1999,13 @@ class AmazonVideoApp(App):
         )
         sub_button.bind(on_press=partial(self.toggle_subscription, channel_name))
         
-        # Channel videos
+        # Channel videos, newest first, then the built-in sample videos
         scroll = ScrollView()
         grid = GridLayout(cols=1, size_hint_y=None)
         grid.bind(minimum_height=grid.setter('height'))
         
-        if not self.channels[channel_name]["videos"]:
+        samples = self.channels.get(channel_name, {}).get("videos", [])
+        if not videos and not samples:
             no_videos = Label(
                 text="No videos in this channel yet", 
                 size_hint_y=None, 
@@ -1592,20 +2013,21 @@ class AmazonVideoApp(App):
                 color=(0, 0, 0, 1) if not self.dark_mode else (1, 1, 1, 1)
             )
             grid.add_widget(no_videos)
-        else:
-            for video in self.channels[channel_name]["videos"]:
-                btn = Button(
-                    text=video, 
-                    size_hint_y=None, 
-                    height=40,
-                    background_color=(1, 1, 1, 1) if not self.dark_mode else (0.2, 0.2, 0.2, 1),
-                    color=(0, 0, 0, 1) if not self.dark_mode else (1, 1, 1, 1)
-                )
-                btn.bind(on_press=partial(self.play_video, {
-                    "title": video, 
-                    "source": "https://sample-videos.com/video123/mp4/720/big_buck_bunny_720p_1mb.mp4"
-                }))
-                grid.add_widget(btn)
+        for video in videos:
+            grid.add_widget(self.video_button(video))
+        for video in samples:
+            btn = Button(
+                text=video, 
+                size_hint_y=None, 
+                height=40,
+                background_color=(1, 1, 1, 1) if not self.dark_mode else (0.2, 0.2, 0.2, 1),
+                color=(0, 0, 0, 1) if not self.dark_mode else (1, 1, 1, 1)
+            )
+            btn.bind(on_press=partial(self.play_video, {
+                "title": video, 
+                "source": "https://sample-videos.com/video123/mp4/720/big_buck_bunny_720p_1mb.mp4"
+            }))
+            grid.add_widget(btn)
         
         layout.add_widget(header)
         layout.add_widget(sub_button)
@@ -1615,26 +2037,25 @@ class AmazonVideoApp(App):
         popup.open()
 
     def toggle_subscription(self, channel_name, instance):
-        if channel_name not in self.channels:
-            self.show_info_popup("Channel not found")
-            return
-            
-        if channel_name in self.user_data["subscriptions"]:
-            self.user_data["subscriptions"].remove(channel_name)
-            cursor.execute(
-                "DELETE FROM subscriptions WHERE user_id=? AND channel_name=?",
-                (self.current_user, channel_name)
-            )
-            instance.text = "Subscribe"
-        else:
-            self.user_data["subscriptions"].append(channel_name)
-            cursor.execute(
-                "INSERT INTO subscriptions (user_id, channel_name) VALUES (?, ?)",
-                (self.current_user, channel_name)
-            )
+        services.call(
+            services.accounts.toggle_subscription, self.current_user, channel_name,
+            callback=partial(self.on_subscription_toggled, channel_name, instance),
+            error=partial(self.on_service_error, "Error updating subscription")
+        )
+
+    def on_subscription_toggled(self, channel_name, instance, subscribed):
+        if subscribed:
+            if channel_name not in self.user_data["subscriptions"]:
+                self.user_data["subscriptions"].append(channel_name)
             instance.text = "Subscribed ✓"
-        conn.commit()
+        else:
+            if channel_name in self.user_data["subscriptions"]:
+                self.user_data["subscriptions"].remove(channel_name)
+            instance.text = "Subscribe"
         self.load_subscriptions()
+        self.load_subscription_feed()
+        # Other visible feed rows may belong to the same channel
+        self.feed_view.refresh_from_data()
 
     def show_ad(self, instance):
         if self.user_data["ads_enabled"]:
@@ -1657,7 +2078,19 @@ class AmazonVideoApp(App):
 
     def on_stop(self):
         """Called when the application is closing"""
-        conn.close()
+        # Submits the final position; services.shutdown() below waits for it
+        self.progress_tracker.stop()
+        if self.upload_job is not None:
+            self.upload_job.cancel()  # Keeps the partial copy for the next launch
+        thumbnail_cache.shutdown()
+        preview_jobs.shutdown()
+        services.shutdown()
+        services.flush()
+        if metrics is not None:
+            self.frame_sampler.stop()
+            self.dump_metrics()
+        db.close()
 
 if __name__ == "__main__":
+    setup()
     AmazonVideoApp().run()
\ No newline at end of file
@@ -0,0 +1,153 @@
+"""Content-addressed media store.
+
+Every media file is stored once under its SHA-256, at
+``<root>/<first two hex digits>/<sha256><ext>``, with a reference count in
+the ``blobs`` table. Uploading the same content twice just bumps the count,
+and a download is a hardlink (or reflink) of the stored blob instead of a
+second copy, falling back to a plain copy where the filesystem can't share
+data between files. Every videos row and every downloads row of a stored
+video holds one reference; the blob is deleted when the last one goes.
+"""
+import hashlib
+import os
+import shutil
+import sys
+
+CHUNK_SIZE = 1024 * 1024
+
+# ioctl request to clone a file's extents (Btrfs, XFS, bcachefs, ...)
+FICLONE = 0x40049409
+
+
+def file_sha256(path, chunk_size=CHUNK_SIZE):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _reflink(src, dst):
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+
+
+def clone_file(src, dst):
+    """Make ``dst`` a copy of ``src`` as cheaply as the filesystem allows.
+
+    Returns the method used: "hardlink", "reflink" or "copy".
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        pass
+    if _reflink(src, dst):
+        return "reflink"
+    shutil.copyfile(src, dst)
+    return "copy"
+
+
+class MediaStore:
+    def __init__(self, db, root):
+        self.db = db
+        self.root = root
+
+    def blob_path(self, sha256, extension=None):
+        if extension is None:
+            row = self.db.fetchone("SELECT extension FROM blobs WHERE sha256=?", (sha256,))
+            extension = row[0] if row else ""
+        return os.path.join(self.root, sha256[:2], sha256 + extension)
+
+    def put(self, path, sha256):
+        """Move the finished file at ``path`` into the store and take a reference.
+
+        If the content is already stored, ``path`` is deleted instead.
+        Returns the blob's path.
+        """
+        extension = os.path.splitext(path)[1].lower()
+        row = self.db.fetchone("SELECT extension FROM blobs WHERE sha256=?", (sha256,))
+        if row is not None:
+            blob = self.blob_path(sha256, row[0])
+            if os.path.exists(blob):
+                os.remove(path)
+            else:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                os.replace(path, blob)
+            with self.db.transaction():
+                self.db.execute("UPDATE blobs SET refcount = refcount + 1 WHERE sha256=?", (sha256,))
+            return blob
+
+        blob = self.blob_path(sha256, extension)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        os.replace(path, blob)
+        with self.db.transaction():
+            self.db.execute(
+                "INSERT INTO blobs (sha256, size, extension, refcount) VALUES (?, ?, ?, 1)",
+                (sha256, os.path.getsize(blob), extension)
+            )
+        return blob
+
+    def link(self, sha256, dest, reference=True):
+        """Materialise the blob at ``dest`` and take a reference for it.
+
+        Pass ``reference=False`` to re-make a file whose record already holds one.
+        """
+        method = clone_file(self.blob_path(sha256), dest)
+        if reference:
+            with self.db.transaction():
+                self.db.execute("UPDATE blobs SET refcount = refcount + 1 WHERE sha256=?", (sha256,))
+        return method
+
+    def release(self, sha256):
+        """Drop a reference; returns the blob's path if that was the last one and it was deleted"""
+        with self.db.transaction():
+            self.db.execute("UPDATE blobs SET refcount = refcount - 1 WHERE sha256=?", (sha256,))
+            row = self.db.fetchone("SELECT refcount, extension FROM blobs WHERE sha256=?", (sha256,))
+            if row is None or row[0] > 0:
+                return None
+            self.db.execute("DELETE FROM blobs WHERE sha256=?", (sha256,))
+        blob = self.blob_path(sha256, row[1])
+        try:
+            os.remove(blob)
+        except OSError:
+            pass
+        return blob
+
+    def verify(self, sha256):
+        """True if the stored blob exists and still hashes to its name"""
+        path = self.blob_path(sha256)
+        return os.path.exists(path) and file_sha256(path) == sha256
+
+    def verify_all(self):
+        """Hashes of every blob that is missing or corrupt"""
+        rows = self.db.fetchall("SELECT sha256 FROM blobs")
+        return [sha256 for (sha256,) in rows if not self.verify(sha256)]
+
+
+if __name__ == "__main__":
+    from database import Database
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "amazstreme.db")
+    # Relative to the working directory, like the app's MEDIA_DIR
+    root = sys.argv[2] if len(sys.argv) > 2 else os.path.join("media", "blobs")
+    bad = MediaStore(Database(db_path), root).verify_all()
+    for sha256 in bad:
+        print(f"Missing or corrupt: {sha256}")
+    print(f"{len(bad)} bad blobs")
+    sys.exit(1 if bad else 0)
@@ -0,0 +1,337 @@
+"""Versioned schema migrations keyed on ``PRAGMA user_version``.
+
+Each migration is a function that receives a connection and evolves the
+schema by one version. Migrations are append-only: never edit or reorder a
+step that has shipped, add a new one instead.
+"""
+import sqlite3
+
+MIGRATIONS = []
+
+
+def migration(func):
+    MIGRATIONS.append(func)
+    return func
+
+
+@migration
+def create_base_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            username TEXT UNIQUE,
+            password TEXT,
+            avatar_path TEXT,
+            bio TEXT DEFAULT ''
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS videos (
+            id INTEGER PRIMARY KEY,
+            title TEXT,
+            file_path TEXT,
+            uploader_id INTEGER,
+            likes INTEGER DEFAULT 0,
+            category TEXT DEFAULT 'General',
+            tags TEXT DEFAULT '',
+            duration INTEGER DEFAULT 0,
+            FOREIGN KEY (uploader_id) REFERENCES users (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS comments (
+            id INTEGER PRIMARY KEY,
+            video_id INTEGER,
+            user_id INTEGER,
+            text TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (video_id) REFERENCES videos (id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS subscriptions (
+            user_id INTEGER,
+            channel_name TEXT,
+            PRIMARY KEY (user_id, channel_name),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS watch_history (
+            user_id INTEGER,
+            video_id INTEGER,
+            progress INTEGER DEFAULT 0,
+            last_watched DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, video_id),
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (video_id) REFERENCES videos (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS downloads (
+            user_id INTEGER,
+            video_id INTEGER,
+            download_path TEXT,
+            downloaded_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, video_id),
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (video_id) REFERENCES videos (id)
+        )
+    ''')
+
+
+@migration
+def add_secondary_indexes(conn):
+    # downloads is already served by its (user_id, video_id) primary key
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_videos_file_path ON videos (file_path)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_videos_category ON videos (category)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_comments_video_time ON comments (video_id, timestamp)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_watch_history_user_time ON watch_history (user_id, last_watched)"
+    )
+
+
+@migration
+def create_video_search_index(conn):
+    # External-content FTS5 table: the text lives in videos, the index is
+    # kept in sync by triggers. Builds without FTS5 fall back to LIKE search.
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5(
+                title, tags, category,
+                content='videos',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        return
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS videos_fts_insert AFTER INSERT ON videos BEGIN
+            INSERT INTO videos_fts (rowid, title, tags, category)
+            VALUES (new.id, new.title, new.tags, new.category);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS videos_fts_delete AFTER DELETE ON videos BEGIN
+            INSERT INTO videos_fts (videos_fts, rowid, title, tags, category)
+            VALUES ('delete', old.id, old.title, old.tags, old.category);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS videos_fts_update AFTER UPDATE OF title, tags, category ON videos BEGIN
+            INSERT INTO videos_fts (videos_fts, rowid, title, tags, category)
+            VALUES ('delete', old.id, old.title, old.tags, old.category);
+            INSERT INTO videos_fts (rowid, title, tags, category)
+            VALUES (new.id, new.title, new.tags, new.category);
+        END
+    ''')
+    conn.execute("INSERT INTO videos_fts (videos_fts) VALUES ('rebuild')")
+
+
+@migration
+def add_media_blobs(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            extension TEXT NOT NULL DEFAULT '',
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("ALTER TABLE videos ADD COLUMN content_hash TEXT REFERENCES blobs (sha256)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_videos_content_hash ON videos (content_hash)")
+
+
+@migration
+def add_video_media_info(conn):
+    # Filled in by mp4probe at ingest; NULL duration_ms means "not probed yet"
+    conn.execute("ALTER TABLE videos ADD COLUMN duration_ms INTEGER")
+    conn.execute("ALTER TABLE videos ADD COLUMN width INTEGER")
+    conn.execute("ALTER TABLE videos ADD COLUMN height INTEGER")
+    conn.execute("ALTER TABLE videos ADD COLUMN video_codec TEXT")
+    conn.execute("ALTER TABLE videos ADD COLUMN audio_codec TEXT")
+    conn.execute("ALTER TABLE videos ADD COLUMN bitrate INTEGER")
+
+
+@migration
+def add_keyframe_index(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS video_keyframes (
+            video_id INTEGER PRIMARY KEY,
+            keyframes BLOB NOT NULL,
+            FOREIGN KEY (video_id) REFERENCES videos (id)
+        )
+    ''')
+    conn.execute("ALTER TABLE watch_history ADD COLUMN position_ms INTEGER")
+
+
+@migration
+def add_chat_messages(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            sender TEXT NOT NULL,
+            text TEXT NOT NULL,
+            is_user INTEGER NOT NULL DEFAULT 0,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    # Every page is read by user, walking ids in either direction
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_user ON chat_messages (user_id, id)")
+
+
+@migration
+def add_video_uploader_index(conn):
+    # Recommendations read the newest uploads of each subscribed channel
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_videos_uploader ON videos (uploader_id, id)")
+
+
+@migration
+def add_user_likes(conn):
+    # videos.likes stays the displayed total; likes.LikeBuffer keeps it in step
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_likes (
+            user_id INTEGER NOT NULL,
+            video_id INTEGER NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, video_id),
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (video_id) REFERENCES videos (id)
+        ) WITHOUT ROWID
+    ''')
+
+
+@migration
+def add_trending(conn):
+    # Maintained by trending.TrendingIndex; scores are relative to the stored epoch
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS trending (
+            video_id INTEGER PRIMARY KEY,
+            score REAL NOT NULL DEFAULT 0,
+            FOREIGN KEY (video_id) REFERENCES videos (id)
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_trending_score ON trending (score, video_id)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS trending_state (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            epoch REAL NOT NULL
+        )
+    ''')
+
+
+@migration
+def add_channels(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS channels (
+            id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL,
+            logo TEXT,
+            subscriber_count INTEGER NOT NULL DEFAULT 0,
+            video_count INTEGER NOT NULL DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.executemany("INSERT OR IGNORE INTO channels (name, logo) VALUES (?, ?)", [
+        ("TechReviews", "https://via.placeholder.com/100x100?text=Tech"),
+        ("NatureChannel", "https://via.placeholder.com/100x100?text=Nature"),
+        ("UserUploads", "https://via.placeholder.com/100x100?text=User"),
+    ])
+    conn.execute("INSERT OR IGNORE INTO channels (name) SELECT DISTINCT channel_name FROM subscriptions")
+
+    # ALTER TABLE can't add a CURRENT_TIMESTAMP default; videos_created_at fills it in
+    conn.execute("ALTER TABLE videos ADD COLUMN channel_id INTEGER REFERENCES channels (id)")
+    conn.execute("ALTER TABLE videos ADD COLUMN created_at DATETIME")
+    # Every video so far was an upload from the app
+    conn.execute('''
+        UPDATE videos SET
+            channel_id = (SELECT id FROM channels WHERE name = 'UserUploads'),
+            created_at = CURRENT_TIMESTAMP
+    ''')
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_videos_channel_created ON videos (channel_id, created_at, id)"
+    )
+
+    # The counts are only ever counted here; from now on the triggers keep them
+    for name, count in conn.execute(
+        "SELECT channel_name, COUNT(*) FROM subscriptions GROUP BY channel_name"
+    ).fetchall():
+        conn.execute("UPDATE channels SET subscriber_count = ? WHERE name = ?", (count, name))
+    for channel_id, count in conn.execute(
+        "SELECT channel_id, COUNT(*) FROM videos WHERE channel_id IS NOT NULL GROUP BY channel_id"
+    ).fetchall():
+        conn.execute("UPDATE channels SET video_count = ? WHERE id = ?", (count, channel_id))
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS videos_created_at AFTER INSERT ON videos
+        WHEN new.created_at IS NULL BEGIN
+            UPDATE videos SET created_at = CURRENT_TIMESTAMP WHERE id = new.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS channel_counts_subscribe AFTER INSERT ON subscriptions BEGIN
+            UPDATE channels SET subscriber_count = subscriber_count + 1 WHERE name = new.channel_name;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS channel_counts_unsubscribe AFTER DELETE ON subscriptions BEGIN
+            UPDATE channels SET subscriber_count = subscriber_count - 1 WHERE name = old.channel_name;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS channel_counts_video_insert AFTER INSERT ON videos
+        WHEN new.channel_id IS NOT NULL BEGIN
+            UPDATE channels SET video_count = video_count + 1 WHERE id = new.channel_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS channel_counts_video_delete AFTER DELETE ON videos
+        WHEN old.channel_id IS NOT NULL BEGIN
+            UPDATE channels SET video_count = video_count - 1 WHERE id = old.channel_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS channel_counts_video_move AFTER UPDATE OF channel_id ON videos
+        WHEN old.channel_id IS NOT new.channel_id BEGIN
+            UPDATE channels SET video_count = video_count - 1 WHERE id = old.channel_id;
+            UPDATE channels SET video_count = video_count + 1 WHERE id = new.channel_id;
+        END
+    ''')
+
+
+@migration
+def add_video_likes_index(conn):
+    # Serves the most-liked fallback of the recommender without sorting the table
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_videos_likes ON videos (likes, id)")
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db):
+    """Bring the database up to the latest schema version.
+
+    Every step runs in its own transaction together with the version bump, so
+    an interrupted upgrade resumes from the last completed step.
+    """
+    conn = db.connection
+    current = schema_version(conn)
+    for version, step in enumerate(MIGRATIONS[current:], current + 1):
+        conn.execute("BEGIN")
+        try:
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+    if current < len(MIGRATIONS):
+        conn.execute("PRAGMA optimize")
+    return schema_version(conn)
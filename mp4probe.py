@@ -0,0 +1,265 @@
+"""Header-only MP4/MOV probe.
+
+Reads the ``moov`` box of an ISO base media file and reports duration,
+resolution, codecs, bitrate and the video keyframe table without decoding
+any frames. Only box headers are read while looking for ``moov``, so probing
+costs a few small reads no matter how large the file is.
+"""
+import os
+import struct
+import sys
+from collections import namedtuple
+
+from keyframes import store_keyframes
+
+MediaInfo = namedtuple(
+    "MediaInfo",
+    "duration_ms timescale width height video_codec audio_codec bitrate keyframes_ms",
+)
+
+
+class ProbeError(Exception):
+    pass
+
+
+def iter_boxes(data, start=0, end=None):
+    """Yield (type, payload_start, box_end) for the boxes in data[start:end]"""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise ProbeError(f"Malformed {box_type!r} box at offset {offset}")
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def find_box(data, path, start=0, end=None):
+    """Payload bounds of the first box matching ``path`` (e.g. [b"mdia", b"mdhd"])"""
+    for box_type, payload, box_end in iter_boxes(data, start, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return payload, box_end
+            return find_box(data, path[1:], payload, box_end)
+    return None
+
+
+def read_moov(f):
+    """Seek from box header to box header until ``moov``, then read just that box"""
+    file_size = os.fstat(f.fileno()).st_size
+    offset = 0
+    while offset + 8 <= file_size:
+        f.seek(offset)
+        header = f.read(16)
+        size, box_type = struct.unpack_from(">I4s", header)
+        if size == 1:
+            size = struct.unpack_from(">Q", header, 8)[0]
+        elif size == 0:
+            size = file_size - offset
+        if size < 8:
+            raise ProbeError(f"Malformed {box_type!r} box at offset {offset}")
+        if box_type == b"moov":
+            f.seek(offset)
+            return f.read(size)
+        offset += size
+    raise ProbeError("No moov box found")
+
+
+def _parse_duration_header(data, payload):
+    """(timescale, duration) from an mvhd or mdhd payload"""
+    version = data[payload]
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", data, payload + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", data, payload + 12)
+    return timescale, duration
+
+
+def _parse_tkhd_size(data, payload):
+    version = data[payload]
+    offset = payload + (88 if version == 1 else 76)
+    width, height = struct.unpack_from(">II", data, offset)
+    return width >> 16, height >> 16
+
+
+def _composition_offsets(data, ctts, samples):
+    """The ctts offset of each of the sorted sample numbers in ``samples``"""
+    run_count = struct.unpack_from(">I", data, ctts[0] + 4)[0]
+    offsets = []
+    run = 0
+    run_end = 0  # number of the last sample covered by the runs read so far
+    offset = 0
+    for sample in samples:
+        while sample > run_end and run < run_count:
+            # Version 0 offsets are unsigned by the spec, but muxers write negative ones there too
+            run_length, offset = struct.unpack_from(">Ii", data, ctts[0] + 8 + run * 8)
+            run_end += run_length
+            run += 1
+        offsets.append(offset if sample <= run_end else 0)
+    return offsets
+
+
+def _edit_start(data, trak, movie_timescale):
+    """(media time playback starts at, ms of empty lead-in) from the track's edit list.
+
+    Handles the shapes encoders write: optional empty edits delaying the
+    track, then one edit that skips the composition delay B-frames add.
+    Later edits are ignored.
+    """
+    elst = find_box(data, [b"edts", b"elst"], *trak)
+    if elst is None:
+        return 0, 0
+    version = data[elst[0]]
+    entry_count = struct.unpack_from(">I", data, elst[0] + 4)[0]
+    entry_format, entry_size = (">Qq", 20) if version == 1 else (">Ii", 12)
+    lead_in = 0
+    for entry in range(entry_count):
+        segment_duration, media_time = struct.unpack_from(entry_format, data, elst[0] + 8 + entry * entry_size)
+        if media_time != -1:
+            return media_time, lead_in * 1000 // movie_timescale if movie_timescale else 0
+        lead_in += segment_duration
+    return 0, 0
+
+
+def _keyframes_ms(data, stbl, timescale, media_start=0, lead_in_ms=0):
+    """Presentation times of the sync samples, or None if every sample is a keyframe.
+
+    Walks the stts runs and the sorted stss sample numbers together, so the
+    cost is proportional to the table sizes, not the number of frames. The
+    ctts offsets move decode times to composition times, and ``media_start``
+    / ``lead_in_ms`` from the edit list place those on the movie timeline.
+    """
+    stss = find_box(data, [b"stss"], *stbl)
+    stts = find_box(data, [b"stts"], *stbl)
+    if stss is None or stts is None or not timescale:
+        return None
+    sync_count = struct.unpack_from(">I", data, stss[0] + 4)[0]
+    sync_samples = struct.unpack_from(f">{sync_count}I", data, stss[0] + 8)
+    run_count = struct.unpack_from(">I", data, stts[0] + 4)[0]
+    ctts = find_box(data, [b"ctts"], *stbl)
+    offsets = _composition_offsets(data, ctts, sync_samples) if ctts else [0] * sync_count
+
+    keyframes = []
+    run = 0
+    run_first = 1  # number of the first sample in the current run
+    run_start = 0  # its decode time
+    run_length = run_delta = 0
+    if run_count:
+        run_length, run_delta = struct.unpack_from(">II", data, stts[0] + 8)
+    for sample, offset in zip(sync_samples, offsets):
+        while run < run_count and sample >= run_first + run_length:
+            run_first += run_length
+            run_start += run_length * run_delta
+            run += 1
+            if run < run_count:
+                run_length, run_delta = struct.unpack_from(">II", data, stts[0] + 8 + run * 8)
+        if run >= run_count:
+            break
+        t = run_start + (sample - run_first) * run_delta + offset - media_start
+        keyframes.append(max(0, lead_in_ms + t * 1000 // timescale))
+    return keyframes
+
+
+def parse_moov(moov, file_size=0):
+    """MediaInfo from the bytes of a ``moov`` box"""
+    data = memoryview(moov)
+    body = find_box(data, [b"moov"])
+    if body is None:
+        raise ProbeError("Not a moov box")
+    mvhd = find_box(data, [b"mvhd"], *body)
+    if mvhd is None:
+        raise ProbeError("No mvhd box")
+    timescale, duration = _parse_duration_header(data, mvhd[0])
+    duration_ms = duration * 1000 // timescale if timescale else 0
+
+    width = height = 0
+    video_codec = audio_codec = None
+    keyframes = None
+    for box_type, payload, box_end in iter_boxes(data, *body):
+        if box_type != b"trak":
+            continue
+        mdia = find_box(data, [b"mdia"], payload, box_end)
+        hdlr = find_box(data, [b"hdlr"], *mdia) if mdia else None
+        stbl = find_box(data, [b"minf", b"stbl"], *mdia) if mdia else None
+        if hdlr is None or stbl is None:
+            continue
+        handler = bytes(data[hdlr[0] + 8:hdlr[0] + 12])
+        stsd = find_box(data, [b"stsd"], *stbl)
+        codec = None
+        if stsd is not None and struct.unpack_from(">I", data, stsd[0] + 4)[0] > 0:
+            codec = bytes(data[stsd[0] + 12:stsd[0] + 16]).decode("latin-1")
+
+        if handler == b"vide" and video_codec is None:
+            video_codec = codec
+            tkhd = find_box(data, [b"tkhd"], payload, box_end)
+            if tkhd is not None:
+                width, height = _parse_tkhd_size(data, tkhd[0])
+            mdhd = find_box(data, [b"mdhd"], *mdia)
+            media_timescale = _parse_duration_header(data, mdhd[0])[0] if mdhd else 0
+            media_start, lead_in_ms = _edit_start(data, (payload, box_end), timescale)
+            keyframes = _keyframes_ms(data, stbl, media_timescale, media_start, lead_in_ms)
+        elif handler == b"soun" and audio_codec is None:
+            audio_codec = codec
+
+    bitrate = file_size * 8000 // duration_ms if duration_ms and file_size else 0
+    return MediaInfo(duration_ms, timescale, width, height, video_codec, audio_codec, bitrate, keyframes)
+
+
+def probe(path):
+    """MediaInfo for the MP4/MOV file at ``path``; raises ProbeError for anything else"""
+    with open(path, "rb") as f:
+        try:
+            moov = read_moov(f)
+        except struct.error:
+            raise ProbeError(f"Not an MP4 file: {path}")
+        file_size = os.fstat(f.fileno()).st_size
+    try:
+        return parse_moov(moov, file_size)
+    except struct.error:
+        raise ProbeError(f"Truncated moov box in {path}")
+
+
+def store_media_info(db, video_id, info):
+    db.execute('''
+        UPDATE videos
+        SET duration=?, duration_ms=?, width=?, height=?, video_codec=?, audio_codec=?, bitrate=?
+        WHERE id=?
+    ''', (
+        info.duration_ms // 1000, info.duration_ms, info.width, info.height,
+        info.video_codec, info.audio_codec, info.bitrate, video_id
+    ))
+
+
+def probe_library(db, progress=None):
+    """Probe every stored video that has no media metadata yet.
+
+    Returns the number of videos updated.
+    """
+    rows = db.fetchall("SELECT id, file_path FROM videos WHERE duration_ms IS NULL")
+    updated = 0
+    with db.transaction():
+        for i, (video_id, path) in enumerate(rows, 1):
+            try:
+                info = probe(path)
+            except (OSError, ProbeError):
+                continue
+            store_media_info(db, video_id, info)
+            if info.keyframes_ms:
+                store_keyframes(db, video_id, info.keyframes_ms)
+            updated += 1
+            if progress:
+                progress(i, len(rows))
+    return updated
+
+
+if __name__ == "__main__":
+    from database import Database
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "amazstreme.db")
+    print(f"Probed {probe_library(Database(db_path))} videos")
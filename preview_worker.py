@@ -0,0 +1,18 @@
+"""Entry point of a preview worker process.
+
+Run as ``python preview_worker.py <media path> <duration ms>``. It imports
+previews and nothing else of the app, so a worker never loads main.py, Kivy
+or a database connection; ffpyplayer is imported by previews.grab_frame.
+"""
+import sys
+
+from previews import generate_previews
+
+
+def main(argv):
+    media_path, duration_ms = argv
+    generate_previews(media_path, int(duration_ms))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
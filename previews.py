@@ -0,0 +1,242 @@
+"""Poster frames and scrub-preview sprite sheets.
+
+For every uploaded video a worker process decodes a poster frame and a grid
+of small, evenly spaced frames (a sprite sheet), and writes them as PNG next
+to the stored media together with a JSON index describing the grid::
+
+    <media>.poster.png
+    <media>.sprites.png
+    <media>.previews.json
+
+Media is content-addressed (see media_store), so the previews are shared by
+every upload of the same file. Decoding runs in separate worker processes
+(preview_worker.py) so it never competes with the UI for the GIL; ffpyplayer,
+the FFmpeg binding behind Kivy's video provider, is only imported inside the
+workers. Without it, or where no worker process can be started (Android),
+no previews are written and the app keeps its placeholder thumbnails.
+"""
+import json
+import os
+import struct
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+POSTER_WIDTH = 480
+TILE_WIDTH = 160
+SPRITE_COUNT = 20
+SPRITE_COLUMNS = 5
+# Where the poster is taken from, as a fraction of the duration; the very
+# first frame is often black or a fade-in
+POSTER_AT = 0.1
+FRAME_TIMEOUT = 5.0
+WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "preview_worker.py")
+
+PreviewPaths = namedtuple("PreviewPaths", "poster sprites index")
+
+
+class PreviewError(Exception):
+    pass
+
+
+def preview_paths(media_path):
+    return PreviewPaths(
+        media_path + ".poster.png",
+        media_path + ".sprites.png",
+        media_path + ".previews.json",
+    )
+
+
+def remove_previews(media_path):
+    """Delete the poster, sprite sheet and index generated for a media file"""
+    for path in preview_paths(media_path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _png_chunk(kind, data):
+    chunk = kind + data
+    return struct.pack(">I", len(data)) + chunk + struct.pack(">I", zlib.crc32(chunk) & 0xFFFFFFFF)
+
+
+def write_png(path, width, height, rgb):
+    """Write 8-bit RGB pixel rows (top to bottom, no padding) as a PNG, atomically"""
+    stride = width * 3
+    raw = b"".join(b"\x00" + rgb[y * stride:(y + 1) * stride] for y in range(height))
+    png = b"".join((
+        b"\x89PNG\r\n\x1a\n",
+        _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)),
+        _png_chunk(b"IDAT", zlib.compress(raw, 6)),
+        _png_chunk(b"IEND", b""),
+    ))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(png)
+    os.replace(tmp_path, path)
+
+
+def grab_frame(path, position_ms, width, timeout=FRAME_TIMEOUT):
+    """(width, height, rgb) of the frame at ``position_ms`` scaled to ``width``, or None past the end"""
+    from ffpyplayer.pic import SWScale
+    from ffpyplayer.player import MediaPlayer
+
+    player = MediaPlayer(path, ff_opts={
+        "ss": position_ms / 1000.0, "an": True, "sn": True, "out_fmt": "rgb24", "sync": "video",
+    })
+    try:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            frame, value = player.get_frame()
+            if value == "eof":
+                return None
+            if frame is None:
+                time.sleep(0.005)
+                continue
+            image = frame[0]
+            source_width, source_height = image.get_size()
+            # Even heights keep the scaler happy with subsampled formats
+            height = max(2, round(source_height * width / source_width / 2) * 2)
+            scaled = SWScale(
+                source_width, source_height, image.get_pixel_format(),
+                ow=width, oh=height, ofmt="rgb24"
+            ).scale(image)
+            return width, height, bytes(scaled.to_bytearray()[0])
+        raise PreviewError(f"Timed out decoding {path} at {position_ms}ms")
+    finally:
+        player.close_player()
+
+
+def generate_previews(media_path, duration_ms, poster_width=POSTER_WIDTH, tile_width=TILE_WIDTH,
+                      count=SPRITE_COUNT, columns=SPRITE_COLUMNS):
+    """Decode and write the poster, sprite sheet and index for ``media_path``.
+
+    Runs in a worker process. Returns the index dict.
+    """
+    paths = preview_paths(media_path)
+    poster = grab_frame(media_path, int(duration_ms * POSTER_AT), poster_width)
+    if poster is None:
+        poster = grab_frame(media_path, 0, poster_width)
+    if poster is None:
+        raise PreviewError(f"No video frames in {media_path}")
+    write_png(paths.poster, *poster)
+
+    interval_ms = max(1, duration_ms // count) if duration_ms else 0
+    tiles = []
+    for i in range(count if interval_ms else 1):
+        tile = grab_frame(media_path, i * interval_ms, tile_width)
+        if tile is None:
+            break
+        tiles.append(tile)
+    # Every tile has the height of the first; short frames are padded black
+    tile_height = tiles[0][1]
+    stride = tile_width * 3
+    columns = min(columns, len(tiles))
+    rows = (len(tiles) + columns - 1) // columns
+    blank = bytes(tile_height * stride)
+    sheet = []
+    for row in range(rows):
+        band = [t[2] for t in tiles[row * columns:(row + 1) * columns]]
+        band = [(t + blank)[:len(blank)] for t in band]
+        band += [blank] * (columns - len(band))
+        for y in range(tile_height):
+            sheet.extend(t[y * stride:(y + 1) * stride] for t in band)
+    write_png(paths.sprites, tile_width * columns, tile_height * rows, b"".join(sheet))
+
+    index = {
+        "poster": os.path.basename(paths.poster),
+        "sprites": os.path.basename(paths.sprites),
+        "tile_width": tile_width,
+        "tile_height": tile_height,
+        "columns": columns,
+        "rows": rows,
+        "count": len(tiles),
+        "interval_ms": interval_ms,
+    }
+    tmp_path = paths.index + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, paths.index)
+    return index
+
+
+def load_index(media_path):
+    """The preview index written for ``media_path``, or None if there isn't one yet"""
+    try:
+        with open(preview_paths(media_path).index) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def sprite_tile(index, position_ms):
+    """(x, y, width, height) of the tile nearest ``position_ms``, top-left origin"""
+    if index["interval_ms"]:
+        i = min(int(position_ms // index["interval_ms"]), index["count"] - 1)
+    else:
+        i = 0
+    row, column = divmod(max(i, 0), index["columns"])
+    return (
+        column * index["tile_width"], row * index["tile_height"],
+        index["tile_width"], index["tile_height"],
+    )
+
+
+class PreviewJobs:
+    """generate_previews runs, each in its own preview_worker process.
+
+    The worker is started as a program rather than through multiprocessing:
+    spawn and forkserver children re-run the parent's main module, which
+    here is main.py and with it Kivy. A few threads, started on first use,
+    wait on the processes.
+    """
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self.available = bool(sys.executable)
+        self._executor = None
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    def submit(self, media_path, duration_ms):
+        """Future of the preview index, or None if worker processes can't be started here"""
+        if not self.available:
+            return None
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="previews")
+        return self._executor.submit(self._run, media_path, duration_ms)
+
+    def _run(self, media_path, duration_ms):
+        try:
+            process = subprocess.Popen(
+                [sys.executable, WORKER, media_path, str(duration_ms or 0)],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+            )
+        except OSError as e:
+            # No interpreter to run it with; later uploads skip previews
+            self.available = False
+            raise PreviewError(f"Can't start a preview worker: {e}") from e
+        with self._lock:
+            self._processes.add(process)
+        try:
+            _, stderr = process.communicate()
+        finally:
+            with self._lock:
+                self._processes.discard(process)
+        if process.returncode:
+            lines = stderr.decode(errors="replace").strip().splitlines()
+            raise PreviewError(lines[-1] if lines else f"Preview worker exited with {process.returncode}")
+        return load_index(media_path)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        with self._lock:
+            for process in self._processes:
+                process.kill()
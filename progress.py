@@ -0,0 +1,91 @@
+import sqlite3
+import threading
+import time
+
+
+def _call_now(func, *args):
+    func(*args)
+
+
+class ProgressTracker:
+    """Write-behind buffer for playback progress.
+
+    The Video widget reports its position many times per second. The tracker
+    keeps only the latest value in memory and writes it to ``watch_history`` at
+    most once per ``flush_interval`` seconds, plus whenever ``flush`` is called
+    explicitly (pause, popup dismiss, app stop).
+
+    Writes are handed to ``submit(func, *args)`` as a snapshot of the session,
+    so the app can run them on its service workers; by default they run in
+    the calling thread.
+    """
+
+    def __init__(self, db, flush_interval=5.0, clock=time.monotonic, submit=_call_now):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.submit = submit
+        self.user_id = None
+        self.video_id = None
+        self.progress = 0
+        self.position_ms = None
+        self._dirty = False
+        self._last_flush = 0.0
+        self._sequence = 0
+        self._written = 0
+        self._write_lock = threading.Lock()
+
+    def start(self, user_id, video_id=None, progress=0):
+        """Begin a playback session; ``video_id`` may be set later, once it is known"""
+        self.flush()
+        self.user_id = user_id
+        self.video_id = video_id
+        self.progress = progress
+        self.position_ms = None
+        self._dirty = False
+        self._last_flush = self.clock()
+
+    def update(self, position, duration):
+        if duration <= 0:
+            return
+        self.progress = (position / duration) * 100
+        self.position_ms = int(position * 1000)
+        self._dirty = True
+        if self.clock() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Submit the buffered position for writing, if anything changed since the last flush"""
+        if not self._dirty or self.video_id is None or self.user_id is None:
+            return False
+        self._sequence += 1
+        snapshot = (self._sequence, self.user_id, self.video_id, self.progress, self.position_ms)
+        self._dirty = False
+        self._last_flush = self.clock()
+        self.submit(self._write, *snapshot)
+        return True
+
+    def _write(self, sequence, user_id, video_id, progress, position_ms):
+        with self._write_lock:
+            # Workers can pick snapshots up out of order; never overwrite a newer one
+            if sequence < self._written:
+                return
+            try:
+                with self.db.transaction():
+                    self.db.execute('''
+                        INSERT OR REPLACE INTO watch_history
+                        (user_id, video_id, progress, position_ms, last_watched)
+                        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    ''', (user_id, video_id, progress, position_ms))
+            except sqlite3.OperationalError:
+                # Locked past the busy timeout; the session's next flush retries
+                if (self.user_id, self.video_id) == (user_id, video_id):
+                    self._dirty = True
+                return
+            self._written = sequence
+
+    def stop(self):
+        """End the session, submitting the final position"""
+        self.flush()
+        self.user_id = None
+        self.video_id = None
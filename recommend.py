@@ -0,0 +1,207 @@
+"""Item-to-item recommendations from watch history, likes and subscriptions.
+
+Two videos are related when the same users watched both. The model keeps a
+sparse co-watch count for every pair of videos that appear within
+``PAIR_WINDOW`` entries of each other in some user's history, and turns
+counts into cosine similarities, count / sqrt(viewers(a) * viewers(b)).
+Per-video data (ids, viewer counts) lives in ``array`` columns indexed by a
+dense item number; each video's top ``NEIGHBOURS`` related videos are
+compiled into a pair of arrays on first use and recompiled only after its
+counts change.
+
+The model is never retrained. ``refresh()`` folds in just the watch_history
+rows written since the last call, found with a rowid watermark. A first
+view is a plain INSERT, which gets a rowid above every existing row, and
+the progress tracker's INSERT OR REPLACE re-inserts its row with a new one.
+The upsert at play start keeps the old rowid, but it only refreshes
+last_watched on a view the model has already counted.
+
+A user's recommendations score the unwatched neighbours of their most
+recent videos, weighted by recency, and of the videos they liked most
+recently, plus recent uploads from channels they subscribe to. The most
+liked videos fill up short lists. Results are cached per user until their
+history changes or ``CACHE_TTL`` passes, so a new like shows up within the
+TTL.
+"""
+import heapq
+import math
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from channels import subscription_feed
+
+TOP_N = 100
+NEIGHBOURS = 50
+PAIR_WINDOW = 10
+RECENT_ITEMS = 20
+RECENCY_DECAY = 0.9
+RECENT_LIKES = 20
+LIKE_WEIGHT = 1.5
+SUBSCRIPTION_WEIGHT = 0.25
+SUBSCRIPTION_CANDIDATES = 50
+POPULAR_COUNT = 200
+CACHE_TTL = 300.0
+CACHE_USERS = 1000
+
+
+class Recommender:
+    def __init__(self, db, top_n=TOP_N, ttl=CACHE_TTL, clock=time.monotonic):
+        self.db = db
+        self.top_n = top_n
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._watermark = 0
+        self._index = {}                 # video id -> dense item number
+        self._video_ids = array("i")     # item -> video id
+        self._viewers = array("i")       # item -> distinct users who watched it
+        self._co_counts = []             # item -> {item: users who watched both}
+        self._neighbours = []            # item -> (items, similarities) or None when stale
+        self._history = {}               # user id -> {item: None}, oldest first
+        self._popular = []
+        self._popular_expires = 0.0
+        self._cache = OrderedDict()      # user id -> (expires, video ids)
+
+    def refresh(self):
+        """Fold in watch history written since the last refresh; returns the number of new views"""
+        with self._lock:
+            rows = self.db.fetchall(
+                "SELECT rowid, user_id, video_id FROM watch_history WHERE rowid > ? ORDER BY rowid",
+                (self._watermark,)
+            )
+            added = 0
+            for rowid, user_id, video_id in rows:
+                self._watermark = rowid
+                if self._add_view(user_id, video_id):
+                    added += 1
+            return added
+
+    def _item(self, video_id):
+        item = self._index.get(video_id)
+        if item is None:
+            item = self._index[video_id] = len(self._video_ids)
+            self._video_ids.append(video_id)
+            self._viewers.append(0)
+            self._co_counts.append({})
+            self._neighbours.append(None)
+        return item
+
+    def _add_view(self, user_id, video_id):
+        item = self._item(video_id)
+        history = self._history.setdefault(user_id, {})
+        if item in history:
+            return False  # A progress update of a video the model already counted
+        counts = self._co_counts[item]
+        for other, _ in zip(reversed(history), range(PAIR_WINDOW)):
+            counts[other] = counts.get(other, 0) + 1
+            other_counts = self._co_counts[other]
+            other_counts[item] = other_counts.get(item, 0) + 1
+            self._neighbours[other] = None
+        history[item] = None
+        self._viewers[item] += 1
+        self._neighbours[item] = None
+        self._cache.pop(user_id, None)
+        return True
+
+    def _related_items(self, item):
+        compiled = self._neighbours[item]
+        if compiled is None:
+            viewers = self._viewers
+            scale = viewers[item]
+            best = heapq.nlargest(
+                NEIGHBOURS,
+                ((count / math.sqrt(scale * viewers[other]), other)
+                 for other, count in self._co_counts[item].items())
+            )
+            compiled = self._neighbours[item] = (
+                array("i", [other for _, other in best]),
+                array("f", [similarity for similarity, _ in best]),
+            )
+        return compiled
+
+    def related(self, video_id, limit=NEIGHBOURS):
+        """[(video id, similarity)] of the videos most often watched together with ``video_id``"""
+        with self._lock:
+            item = self._index.get(video_id)
+            if item is None:
+                return []
+            items, similarities = self._related_items(item)
+            return [(self._video_ids[other], similarity)
+                    for other, similarity in zip(items[:limit], similarities[:limit])]
+
+    def recommend(self, user_id, limit=None):
+        """Ranked video ids for ``user_id``, best first"""
+        limit = limit or self.top_n
+        now = self.clock()
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached is None or cached[0] < now:
+                cached = (now + self.ttl, self._rank(user_id, now))
+                self._cache[user_id] = cached
+                if len(self._cache) > CACHE_USERS:
+                    self._cache.popitem(last=False)
+            else:
+                self._cache.move_to_end(user_id)
+            return cached[1][:limit]
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._cache.pop(user_id, None)
+
+    def _rank(self, user_id, now):
+        history = self._history.get(user_id, {})
+        video_ids = self._video_ids
+        scores = {}
+        weight = 1.0
+        for item, _ in zip(reversed(history), range(RECENT_ITEMS)):
+            items, similarities = self._related_items(item)
+            for other, similarity in zip(items, similarities):
+                if other not in history:
+                    video_id = video_ids[other]
+                    scores[video_id] = scores.get(video_id, 0.0) + weight * similarity
+            weight *= RECENCY_DECAY
+
+        liked = [row[0] for row in self.db.fetchall(
+            "SELECT video_id FROM user_likes WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
+            (user_id, RECENT_LIKES)
+        )]
+        for liked_id in liked:
+            item = self._index.get(liked_id)
+            if item is None:
+                continue  # Nobody's watch history has it yet, so it has no neighbours
+            items, similarities = self._related_items(item)
+            for other, similarity in zip(items, similarities):
+                if other not in history:
+                    video_id = video_ids[other]
+                    scores[video_id] = scores.get(video_id, 0.0) + LIKE_WEIGHT * similarity
+
+        # Neighbours of one liked video can include another one the user liked
+        for liked_id in liked:
+            scores.pop(liked_id, None)
+        watched = {video_ids[item] for item in history}
+        watched.update(liked)
+        for _, video_id in subscription_feed(self.db, user_id, SUBSCRIPTION_CANDIDATES):
+            if video_id not in watched:
+                scores[video_id] = scores.get(video_id, 0.0) + SUBSCRIPTION_WEIGHT
+
+        ranked = [video_id for video_id, _ in heapq.nlargest(
+            self.top_n, scores.items(), key=lambda entry: (entry[1], entry[0])
+        )]
+        if len(ranked) < self.top_n:
+            chosen = set(ranked)
+            for video_id in self._most_liked(now):
+                if video_id not in watched and video_id not in chosen:
+                    ranked.append(video_id)
+                    if len(ranked) == self.top_n:
+                        break
+        return ranked
+
+    def _most_liked(self, now):
+        if self._popular_expires < now:
+            self._popular = [row[0] for row in self.db.fetchall(
+                "SELECT id FROM videos ORDER BY likes DESC, id DESC LIMIT ?", (POPULAR_COUNT,)
+            )]
+            self._popular_expires = now + self.ttl
+        return self._popular
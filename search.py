@@ -0,0 +1,87 @@
+"""Full-text video search backed by the ``videos_fts`` FTS5 index.
+
+The index covers title, tags and category and is kept in sync with the
+``videos`` table by triggers (see migrations.py). Every query term is matched
+as a prefix, so "gad rev" finds "Gadget Review", and results are ranked with
+BM25, weighting title hits above tags and tags above category.
+"""
+import re
+
+# bm25() column weights for title, tags and category
+TITLE_WEIGHT = 10.0
+TAGS_WEIGHT = 5.0
+CATEGORY_WEIGHT = 1.0
+
+PAGE_SIZE = 20
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def build_match_query(text):
+    """Turn free text into an FTS5 query where every token is a prefix term.
+
+    Tokens are quoted so user input can never inject FTS5 operators.
+    """
+    tokens = _TOKEN_RE.findall(text.lower())
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def has_search_index(db):
+    row = db.fetchone(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='videos_fts'"
+    )
+    return row is not None
+
+
+def search_videos(db, text, category=None, limit=PAGE_SIZE, after=None, before=None):
+    """Return one page of (id, title, likes, category, tags, file_path, channel, score) rows, best match first.
+
+    Pages are keyset-paginated on (score, id): pass the (score, id) of the last
+    row of a page as ``after`` to get the next page, or of the first row as
+    ``before`` to get the previous one (still returned best match first).
+    """
+    match = build_match_query(text)
+    if not match:
+        return []
+    if has_search_index(db):
+        score = f"bm25(videos_fts, {TITLE_WEIGHT}, {TAGS_WEIGHT}, {CATEGORY_WEIGHT})"
+        query = f'''
+            SELECT v.id, v.title, v.likes, v.category, v.tags, v.file_path, c.name, {score} AS score
+            FROM videos_fts
+            JOIN videos v ON v.id = videos_fts.rowid
+            LEFT JOIN channels c ON c.id = v.channel_id
+            WHERE videos_fts MATCH ?
+        '''
+        params = [match]
+    else:
+        # Unranked substring search for SQLite builds without FTS5
+        score = "0.0"
+        query = '''
+            SELECT v.id, v.title, v.likes, v.category, v.tags, v.file_path, c.name, 0.0 AS score
+            FROM videos v
+            LEFT JOIN channels c ON c.id = v.channel_id
+            WHERE (v.title LIKE ? OR v.tags LIKE ?)
+        '''
+        pattern = f"%{text}%"
+        params = [pattern, pattern]
+
+    if category:
+        query += " AND v.category = ?"
+        params.append(category)
+    if after is not None:
+        query += f" AND ({score}, v.id) > (?, ?)"
+        params += list(after)
+        query += " ORDER BY score, v.id"
+    elif before is not None:
+        query += f" AND ({score}, v.id) < (?, ?)"
+        params += list(before)
+        query += " ORDER BY score DESC, v.id DESC"
+    else:
+        query += " ORDER BY score, v.id"
+    query += " LIMIT ?"
+    params.append(limit)
+
+    rows = db.fetchall(query, params)
+    if before is not None:
+        rows.reverse()
+    return rows
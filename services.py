@@ -0,0 +1,440 @@
+"""Kivy-free service layer for the app's data operations.
+
+Each service is a plain class whose methods run synchronously, so CLI tools,
+benchmarks and tests can call them directly. ``Services`` bundles them with
+a worker pool for the UI:
+
+    services.submit(func, *args)                 -> concurrent.futures.Future
+    services.call(func, *args, callback, error)  -> Future; callbacks go through dispatch
+    await services.run(func, *args)              -> asyncio
+
+The app passes a ``dispatch`` that schedules the callback with
+``Clock.schedule_once``, so results always land on the UI thread. Problems a
+user can fix are raised as ServiceError with a message fit to show as is.
+"""
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import accounts
+from channels import UPLOADS_CHANNEL, SubscriptionFeedCache, channel_videos, get_channel
+from chat import ChatWindow
+from comments import PAGE_SIZE as COMMENTS_PAGE_SIZE, add_comment, fetch_comments
+from feed import FeedWindow, fetch_videos_by_id, row_to_video
+from keyframes import resume_position_ms, store_keyframes
+from likes import LikeBuffer
+from media_store import clone_file
+from mp4probe import ProbeError, probe, store_media_info
+from previews import load_index, preview_paths, remove_previews
+from recommend import Recommender
+from trending import TOP_K as TRENDING_TOP_K, TrendingIndex
+
+WORKERS = 4
+CHANNEL_PAGE_SIZE = 50
+# Duration given to uploads that aren't MP4/MOV, whose headers can't be probed
+DEFAULT_DURATION = 300
+
+
+class ServiceError(Exception):
+    pass
+
+
+def _with_posters(videos):
+    """Set each database video's ``poster`` to its generated poster frame, or None.
+
+    Checked on the worker so the UI thread never stats files while filling a list.
+    """
+    for video in videos:
+        if "id" in video:
+            poster = preview_paths(video["file_path"]).poster
+            video["poster"] = poster if os.path.exists(poster) else None
+    return videos
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _release_blob(media_store, sha256):
+    """Drop one reference to a stored blob, and its previews with the blob itself"""
+    blob = media_store.release(sha256)
+    if blob is not None:
+        remove_previews(blob)
+
+
+class AccountService:
+    def __init__(self, db, channels):
+        self.db = db
+        self.channels = channels
+
+    def login(self, username, password):
+        """The user's id, avatar_path and bio, plus their subscriptions, history and downloads"""
+        user = accounts.authenticate(self.db, username, password)
+        if user is None:
+            raise ServiceError("Invalid username or password")
+        profile = {"id": user[0], "avatar_path": user[1], "bio": user[2] or ""}
+        profile.update(accounts.load_user_data(self.db, user[0]))
+        return profile
+
+    def signup(self, username, password):
+        if not username or not password:
+            raise ServiceError("Please enter both username and password")
+        try:
+            return accounts.create_user(self.db, username, password)
+        except sqlite3.IntegrityError:
+            raise ServiceError("Username already exists")
+
+    def user_data(self, user_id):
+        return accounts.load_user_data(self.db, user_id)
+
+    def update_profile(self, user_id, avatar_path, bio):
+        accounts.update_profile(self.db, user_id, avatar_path, bio)
+
+    def toggle_subscription(self, user_id, channel_name):
+        if self.channels.get(channel_name) is None:
+            raise ServiceError("Channel not found")
+        subscribed = accounts.toggle_subscription(self.db, user_id, channel_name)
+        self.channels.invalidate(user_id)
+        return subscribed
+
+
+class ChannelService:
+    def __init__(self, db):
+        self.db = db
+        self.feed = SubscriptionFeedCache(db)
+
+    def get(self, name):
+        return get_channel(self.db, name)
+
+    def profile(self, name, limit=CHANNEL_PAGE_SIZE):
+        """The channel with its counts, and its newest videos"""
+        channel = get_channel(self.db, name)
+        if channel is None:
+            raise ServiceError("Channel not found")
+        video_ids = [video_id for _, video_id in channel_videos(self.db, channel["id"], limit)]
+        return channel, self._videos(video_ids)
+
+    def latest(self, user_id, limit=None):
+        """The newest videos of the channels the user subscribes to"""
+        return self._videos(self.feed.latest(user_id, limit))
+
+    def _videos(self, video_ids):
+        return _with_posters([row_to_video(row) for row in fetch_videos_by_id(self.db, video_ids)])
+
+    def invalidate(self, user_id=None):
+        self.feed.invalidate(user_id)
+
+
+class FeedService:
+    def __init__(self, db):
+        self.db = db
+
+    def window(self, category=None, search=None, tail=(), ranked=None):
+        return FeedWindow(self.db, category=category, search=search, tail=tail, ranked=ranked)
+
+    def load_next(self, window):
+        added, dropped = window.load_next()
+        return _with_posters(added), dropped
+
+    def load_previous(self, window):
+        added, dropped = window.load_previous()
+        return _with_posters(added), dropped
+
+
+class TrendingService:
+    def __init__(self, db):
+        self.db = db
+        self.index = TrendingIndex(db)
+
+    def record_view(self, video_id):
+        self.index.record(video_id, "view")
+
+    def record_like(self, video_id, count=1):
+        self.index.record(video_id, "like", count)
+
+    def record_comment(self, video_id):
+        self.index.record(video_id, "comment")
+
+    def top(self, limit=TRENDING_TOP_K):
+        return self.index.top(limit)
+
+    def flush(self):
+        return self.index.flush()
+
+
+class VideoService:
+    def __init__(self, db, trending, media_store):
+        self.db = db
+        self.trending = trending
+        self.media_store = media_store
+        self.likes = LikeBuffer(db)
+
+    def start_playback(self, user_id, video_id, media_path):
+        """Count a view and move the video to the top of the user's history.
+
+        ``video_id`` may be None, in which case it is looked up by
+        ``media_path``. Returns the video id (None for media that isn't in
+        the database), the saved progress percentage, the position to resume
+        at in ms and the scrub preview index (None until previews are
+        generated).
+        """
+        if video_id is None:
+            row = self.db.fetchone("SELECT id FROM videos WHERE file_path=?", (media_path,))
+            if row is None:
+                return {"video_id": None, "progress": 0, "resume_ms": 0, "previews": None}
+            video_id = row[0]
+        row = self.db.fetchone(
+            "SELECT progress FROM watch_history WHERE user_id=? AND video_id=?", (user_id, video_id)
+        )
+        progress = row[0] if row else 0
+        resume_ms = resume_position_ms(self.db, user_id, video_id) if row else 0
+        with self.db.transaction():
+            # Keeps any saved position
+            self.db.execute('''
+                INSERT INTO watch_history (user_id, video_id, progress, last_watched)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (user_id, video_id) DO UPDATE SET last_watched = CURRENT_TIMESTAMP
+            ''', (user_id, video_id, progress))
+        self.trending.record_view(video_id)
+        return {
+            "video_id": video_id, "progress": progress, "resume_ms": resume_ms,
+            "previews": load_index(media_path),
+        }
+
+    def resume_position(self, user_id, video_id):
+        return resume_position_ms(self.db, user_id, video_id)
+
+    def set_like(self, user_id, video_id, liked):
+        """Record a like or unlike; counts are written by the next flush_likes"""
+        if self.likes.set(user_id, video_id, liked):
+            self.flush_likes()
+
+    def flush_likes(self):
+        deltas = self.likes.flush()
+        # Only new likes count towards trending; an unlike doesn't take one back
+        for video_id, delta in deltas.items():
+            if delta > 0:
+                self.trending.record_like(video_id, delta)
+        return deltas
+
+
+class UploadService:
+    def __init__(self, db, media_store, channels):
+        self.db = db
+        self.media_store = media_store
+        self.channels = channels
+
+    def store(self, user_id, path, sha256, title, category, tags):
+        """Move a finished ingest into the media store and add its video to the uploads channel.
+
+        Returns the video's id, stored path and duration, and whether
+        previews of the same content already exist.
+        """
+        # Identical content is stored once, whoever uploads it
+        blob_path = self.media_store.put(path, sha256)
+
+        # Read duration and stream info from the MP4/MOV headers
+        try:
+            info = probe(blob_path)
+        except (OSError, ProbeError):
+            info = None  # Not an MP4/MOV container
+        duration = info.duration_ms // 1000 if info else DEFAULT_DURATION
+
+        try:
+            with self.db.transaction():
+                cur = self.db.execute('''
+                    INSERT INTO videos
+                    (title, file_path, uploader_id, category, tags, duration, content_hash, channel_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, (SELECT id FROM channels WHERE name = ?))
+                ''', (title, blob_path, user_id, category, tags, duration, sha256, UPLOADS_CHANNEL))
+                if info:
+                    store_media_info(self.db, cur.lastrowid, info)
+                    if info.keyframes_ms:
+                        store_keyframes(self.db, cur.lastrowid, info.keyframes_ms)
+        except BaseException:
+            # No videos row holds the reference put took
+            _release_blob(self.media_store, sha256)
+            raise
+
+        # Subscribers of the uploads channel have a new latest video
+        self.channels.invalidate()
+        return {
+            "id": cur.lastrowid,
+            "path": blob_path,
+            "duration_ms": info.duration_ms if info else duration * 1000,
+            "has_previews": load_index(blob_path) is not None,
+        }
+
+
+class CommentService:
+    def __init__(self, db, trending):
+        self.db = db
+        self.trending = trending
+
+    def page(self, video_id, before=None, limit=COMMENTS_PAGE_SIZE):
+        return fetch_comments(self.db, video_id, limit, before=before)
+
+    def post(self, video_id, user_id, text):
+        text = text.strip()
+        if not text:
+            raise ServiceError("Comment cannot be empty")
+        comment = add_comment(self.db, video_id, user_id, text)
+        self.trending.record_comment(video_id)
+        return comment
+
+
+class ChatService:
+    def __init__(self, db):
+        self.db = db
+
+    def window(self, user_id):
+        return ChatWindow(self.db, user_id)
+
+    def load_latest(self, window):
+        return window.load_latest()
+
+    def load_previous(self, window):
+        return window.load_previous()
+
+    def load_next(self, window):
+        return window.load_next()
+
+    def add(self, window, sender, text, is_user):
+        text = text.strip()
+        if not text:
+            raise ServiceError("Message cannot be empty")
+        return window.add(sender, text, is_user)
+
+
+class RecommendationService:
+    def __init__(self, db):
+        self.db = db
+        self.recommender = Recommender(db)
+
+    def for_user(self, user_id, limit=None):
+        """Ranked video ids, after folding in any watch history written since the last call"""
+        self.recommender.refresh()
+        return self.recommender.recommend(user_id, limit)
+
+    def titles_for_user(self, user_id, limit):
+        video_ids = self.for_user(user_id, limit)
+        if not video_ids:
+            return []
+        titles = dict(self.db.fetchall(
+            f"SELECT id, title FROM videos WHERE id IN ({', '.join('?' * len(video_ids))})", video_ids
+        ))
+        return [titles[video_id] for video_id in video_ids if video_id in titles]
+
+
+class DownloadService:
+    def __init__(self, db, media_store):
+        self.db = db
+        self.media_store = media_store
+
+    def download(self, user_id, video_id, downloads_dir):
+        """Materialise a video in ``downloads_dir`` and record it; returns the download entry"""
+        row = self.db.fetchone("SELECT title, file_path, content_hash FROM videos WHERE id=?", (video_id,))
+        if row is None or not os.path.exists(row[1]):
+            raise ServiceError("Video file not found")
+        title, video_path, content_hash = row
+
+        existing = self.db.fetchone(
+            "SELECT download_path FROM downloads WHERE user_id=? AND video_id=?",
+            (user_id, video_id)
+        )
+        if existing and os.path.exists(existing[0]):
+            raise ServiceError("Video already downloaded")
+
+        os.makedirs(downloads_dir, exist_ok=True)
+        # Share the stored blob (hardlink/reflink) instead of copying it when possible
+        dest_path = os.path.join(downloads_dir, f"{video_id}_{os.path.basename(video_path)}")
+        # Re-making a deleted file: the existing downloads row already holds its reference
+        referenced = content_hash and existing is None
+        if content_hash:
+            self.media_store.link(content_hash, dest_path, reference=referenced)
+        else:
+            clone_file(video_path, dest_path)
+        try:
+            with self.db.transaction():
+                self.db.execute('''
+                    INSERT OR REPLACE INTO downloads
+                    (user_id, video_id, download_path)
+                    VALUES (?, ?, ?)
+                ''', (user_id, video_id, dest_path))
+        except BaseException:
+            if referenced:
+                _release_blob(self.media_store, content_hash)
+            raise
+        return {"id": video_id, "title": title, "path": dest_path}
+
+    def remove(self, user_id, video_id):
+        """Delete a download and its file, dropping its reference to the stored blob"""
+        row = self.db.fetchone('''
+            SELECT d.download_path, v.content_hash
+            FROM downloads d
+            JOIN videos v ON v.id = d.video_id
+            WHERE d.user_id=? AND d.video_id=?
+        ''', (user_id, video_id))
+        if row is None:
+            raise ServiceError("Download not found")
+        download_path, content_hash = row
+        with self.db.transaction():
+            self.db.execute("DELETE FROM downloads WHERE user_id=? AND video_id=?", (user_id, video_id))
+        _remove_file(download_path)
+        if content_hash:
+            _release_blob(self.media_store, content_hash)
+        return video_id
+
+
+def _call_now(callback, *args):
+    callback(*args)
+
+
+class Services:
+    """All services over one database, with a worker pool to run them on"""
+
+    def __init__(self, db, media_store, workers=WORKERS, dispatch=_call_now):
+        self.channels = ChannelService(db)
+        self.accounts = AccountService(db, self.channels)
+        self.feed = FeedService(db)
+        self.trending = TrendingService(db)
+        self.videos = VideoService(db, self.trending, media_store)
+        self.comments = CommentService(db, self.trending)
+        self.uploads = UploadService(db, media_store, self.channels)
+        self.chat = ChatService(db)
+        self.recommendations = RecommendationService(db)
+        self.downloads = DownloadService(db, media_store)
+        self.dispatch = dispatch
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="service")
+
+    def submit(self, func, *args, **kwargs):
+        return self._executor.submit(func, *args, **kwargs)
+
+    def call(self, func, *args, callback=None, error=None, **kwargs):
+        """Run ``func`` on the pool; ``callback(result)`` or ``error(exception)`` is dispatched after"""
+        future = self.submit(func, *args, **kwargs)
+
+        def done(future):
+            exception = future.exception()
+            if exception is None:
+                if callback is not None:
+                    self.dispatch(callback, future.result())
+            elif error is not None:
+                self.dispatch(error, exception)
+        future.add_done_callback(done)
+        return future
+
+    async def run(self, func, *args, **kwargs):
+        import asyncio  # Only needed by async callers; slow to import at app startup
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def flush(self):
+        """Write out buffered likes, then the trending scores they feed"""
+        self.videos.flush_likes()
+        self.trending.flush()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
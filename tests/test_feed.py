@@ -0,0 +1,137 @@
+"""FeedWindow paging over a real (temporary) database.
+
+Run with ``python -m unittest discover tests`` from the repository root.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+from feed import FeedWindow  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+VIDEOS = 50
+
+
+class FeedCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.directory, "test.db"))
+        migrate(self.db)
+        with self.db.transaction():
+            self.db.executemany(
+                "INSERT INTO videos (id, title, file_path, category) VALUES (?, ?, ?, ?)",
+                [(i, f"Video {i}", f"/media/{i}.mp4", "Tech" if i % 2 else "Music")
+                 for i in range(1, VIDEOS + 1)]
+            )
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def delete(self, *video_ids):
+        with self.db.transaction():
+            self.db.executemany("DELETE FROM videos WHERE id=?", [(i,) for i in video_ids])
+
+    @staticmethod
+    def ids(rows):
+        return [row["id"] for row in rows]
+
+
+class BrowseFeedTest(FeedCase):
+    def test_pages_newest_first_then_the_tail(self):
+        window = FeedWindow(self.db, page_size=20, tail=[{"title": "Ad"}])
+        pages = [window.load_next()[0] for _ in range(3)]
+        self.assertEqual(self.ids(pages[0]), list(range(50, 30, -1)))
+        self.assertEqual(self.ids(pages[1]), list(range(30, 10, -1)))
+        self.assertEqual(self.ids(pages[2][:-1]), list(range(10, 0, -1)))
+        self.assertEqual(pages[2][-1], {"title": "Ad"})
+        self.assertTrue(window.at_end)
+        self.assertEqual(window.load_next(), ([], 0))
+
+    def test_category_filter(self):
+        window = FeedWindow(self.db, category="Music", page_size=10)
+        self.assertEqual(self.ids(window.load_next()[0]), list(range(50, 30, -2)))
+
+    def test_new_videos_do_not_shift_later_pages(self):
+        window = FeedWindow(self.db, page_size=10)
+        window.load_next()
+        with self.db.transaction():
+            self.db.execute("INSERT INTO videos (id, title, file_path) VALUES (100, 'New', '/media/100.mp4')")
+        self.assertEqual(self.ids(window.load_next()[0]), list(range(40, 30, -1)))
+
+    def test_window_evicts_and_reloads_by_key(self):
+        window = FeedWindow(self.db, page_size=10, max_rows=20)
+        window.load_next()
+        window.load_next()
+        added, dropped = window.load_next()
+        self.assertEqual(dropped, 10)
+        self.assertEqual(self.ids(window.rows), list(range(40, 20, -1)))
+        self.assertFalse(window.at_start)
+
+        added, dropped = window.load_previous()
+        self.assertEqual(self.ids(added), list(range(50, 40, -1)))
+        self.assertEqual(dropped, 10)
+        self.assertEqual(self.ids(window.rows), list(range(50, 30, -1)))
+        # A full page can't tell it was the first; the next read finds nothing above
+        self.assertEqual(window.load_previous(), ([], 0))
+        self.assertTrue(window.at_start)
+
+        # The evicted bottom page comes back from its key
+        added, _ = window.load_next()
+        self.assertEqual(self.ids(added), list(range(30, 20, -1)))
+
+
+class RankedFeedTest(FeedCase):
+    def test_pages_through_the_ranking_in_order(self):
+        ranked = list(range(VIDEOS, 0, -2))  # 25 ids
+        window = FeedWindow(self.db, ranked=ranked, page_size=10)
+        pages = [self.ids(window.load_next()[0]) for _ in range(3)]
+        self.assertEqual(pages, [ranked[:10], ranked[10:20], ranked[20:]])
+        self.assertTrue(window.at_end)
+
+    def test_deleted_videos_do_not_end_the_feed(self):
+        ranked = list(range(1, 31))
+        self.delete(3, 25)
+        window = FeedWindow(self.db, ranked=ranked, page_size=10)
+
+        added, _ = window.load_next()
+        self.assertEqual(self.ids(added), [1, 2] + list(range(4, 12)))
+        self.assertFalse(window.at_end)
+        added, _ = window.load_next()
+        self.assertEqual(self.ids(added), list(range(12, 22)))
+        added, _ = window.load_next()
+        self.assertEqual(self.ids(added), [22, 23, 24] + list(range(26, 31)))
+        self.assertTrue(window.at_end)
+
+    def test_a_fully_deleted_page_is_skipped(self):
+        ranked = list(range(1, 31))
+        self.delete(*range(11, 21))
+        window = FeedWindow(self.db, ranked=ranked, page_size=10)
+        window.load_next()
+        added, _ = window.load_next()
+        self.assertEqual(self.ids(added), list(range(21, 31)))
+
+    def test_scrolling_back_past_deleted_videos_reaches_the_start(self):
+        ranked = list(range(1, 41))
+        window = FeedWindow(self.db, ranked=ranked, page_size=10, max_rows=10)
+        for _ in range(3):
+            window.load_next()
+        self.assertEqual(self.ids(window.rows), list(range(21, 31)))
+        self.delete(15, 5)
+
+        added, dropped = window.load_previous()
+        self.assertEqual(self.ids(added), list(range(10, 15)) + list(range(16, 21)))
+        self.assertEqual(dropped, 10)
+        self.assertFalse(window.at_start)
+        added, _ = window.load_previous()
+        self.assertEqual(self.ids(added), [1, 2, 3, 4] + list(range(6, 10)))
+        self.assertTrue(window.at_start)
+
+
+if __name__ == "__main__":
+    unittest.main()
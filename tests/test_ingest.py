@@ -0,0 +1,101 @@
+"""copy_file atomicity, cancellation and resume.
+
+Run with ``python -m unittest discover tests`` from the repository root.
+"""
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest import IngestCancelled, IngestJob, copy_file, staging_name  # noqa: E402
+
+CHUNK = 1024
+DATA = bytes(range(256)) * 40  # 10 chunks
+
+
+class CopyFileTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, "source.mp4")
+        with open(self.source, "wb") as f:
+            f.write(DATA)
+        self.dest = os.path.join(self.directory, "staging", "copy.mp4")
+        self.part = self.dest + ".part"
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def cancel_after(self, chunks):
+        """(progress, cancel_event) that cancel the copy once ``chunks`` chunks are written"""
+        cancel_event = threading.Event()
+
+        def progress(copied, total):
+            if copied >= chunks * CHUNK:
+                cancel_event.set()
+        return progress, cancel_event
+
+    def test_copies_and_hashes(self):
+        result = copy_file(self.source, self.dest, chunk_size=CHUNK)
+        self.assertEqual(result, (self.dest, len(DATA), hashlib.sha256(DATA).hexdigest()))
+        self.assertEqual(self.read(self.dest), DATA)
+        self.assertFalse(os.path.exists(self.part))
+
+    def test_cancel_keeps_the_partial_file_only(self):
+        progress, cancel_event = self.cancel_after(3)
+        with self.assertRaises(IngestCancelled):
+            copy_file(self.source, self.dest, CHUNK, progress, cancel_event)
+        self.assertFalse(os.path.exists(self.dest))
+        self.assertEqual(self.read(self.part), DATA[:3 * CHUNK])
+
+    def test_resumes_from_the_partial_file(self):
+        progress, cancel_event = self.cancel_after(4)
+        with self.assertRaises(IngestCancelled):
+            copy_file(self.source, self.dest, CHUNK, progress, cancel_event)
+
+        reported = []
+        result = copy_file(self.source, self.dest, CHUNK, lambda copied, total: reported.append(copied))
+        self.assertEqual(reported[0], 4 * CHUNK)
+        self.assertEqual(reported[-1], len(DATA))
+        self.assertEqual(self.read(self.dest), DATA)
+        self.assertEqual(result.sha256, hashlib.sha256(DATA).hexdigest())
+
+    def test_restarts_when_the_partial_file_does_not_match(self):
+        os.makedirs(os.path.dirname(self.part))
+        with open(self.part, "wb") as f:
+            f.write(b"\xff" * (2 * CHUNK))
+
+        reported = []
+        result = copy_file(self.source, self.dest, CHUNK, lambda copied, total: reported.append(copied))
+        self.assertEqual(reported[0], 0)
+        self.assertEqual(self.read(self.dest), DATA)
+        self.assertEqual(result.sha256, hashlib.sha256(DATA).hexdigest())
+
+    def test_restarts_when_the_partial_file_is_too_long(self):
+        os.makedirs(os.path.dirname(self.part))
+        with open(self.part, "wb") as f:
+            f.write(DATA + b"extra")
+        self.assertEqual(self.read(copy_file(self.source, self.dest, CHUNK).path), DATA)
+
+    def test_staging_name_is_stable_until_the_source_changes(self):
+        name = staging_name(self.source)
+        self.assertEqual(staging_name(self.source), name)
+        with open(self.source, "ab") as f:
+            f.write(b"more")
+        self.assertNotEqual(staging_name(self.source), name)
+
+    def test_job_runs_on_a_worker(self):
+        result = IngestJob(self.source, self.dest, chunk_size=CHUNK).start().result(timeout=10)
+        self.assertEqual(result.size, len(DATA))
+
+
+if __name__ == "__main__":
+    unittest.main()
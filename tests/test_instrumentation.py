@@ -0,0 +1,160 @@
+"""Histograms, exports, the SQL tracer, the frame sampler and the startup timeline.
+
+Run with ``python -m unittest discover tests`` from the repository root.
+"""
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+from instrumentation import (  # noqa: E402
+    FrameSampler, Histogram, Registry, SlowQueryLog, SqlTracer, StartupTimeline, instrument_methods,
+    normalize_sql,
+)
+
+logging.getLogger("amazstreme.instrumentation").disabled = True
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class HistogramTest(unittest.TestCase):
+    def test_counts_values_into_buckets(self):
+        histogram = Histogram((1.0, 2.0, 4.0))
+        for value in (0.5, 1.0, 1.5, 3.0, 9.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1, 1, 1])
+        self.assertEqual((histogram.count, histogram.sum, histogram.max), (5, 15.0, 9.0))
+
+    def test_quantiles_interpolate_inside_a_bucket(self):
+        histogram = Histogram((1.0, 2.0))
+        for _ in range(4):
+            histogram.observe(1.5)
+        self.assertEqual(histogram.quantile(0.5), 1.5)
+        self.assertEqual(histogram.quantile(1.0), 2.0)
+        self.assertEqual(Histogram().quantile(0.9), 0.0)
+
+    def test_overflow_bucket_is_bounded_by_the_max(self):
+        histogram = Histogram((1.0,))
+        histogram.observe(3.0)
+        self.assertEqual(histogram.quantile(1.0), 3.0)
+
+
+class RegistryTest(unittest.TestCase):
+    def test_json_and_prometheus_exports(self):
+        registry = Registry()
+        registry.describe("sql_seconds", "Statement time")
+        registry.observe("sql_seconds", 0.002, buckets=(0.001, 0.01), statement='SELECT "x"')
+        registry.increment("dropped_frames_total", 3)
+
+        report = registry.to_json()
+        self.assertEqual(report["counters"], [{"name": "dropped_frames_total", "labels": {}, "value": 3}])
+        self.assertEqual(report["histograms"][0]["labels"], {"statement": 'SELECT "x"'})
+        self.assertEqual(report["histograms"][0]["count"], 1)
+
+        text = registry.to_prometheus()
+        self.assertIn("# HELP amazstreme_sql_seconds Statement time\n", text)
+        self.assertIn('amazstreme_sql_seconds_bucket{statement="SELECT \\"x\\"",le="0.001"} 0\n', text)
+        self.assertIn('amazstreme_sql_seconds_bucket{statement="SELECT \\"x\\"",le="+Inf"} 1\n', text)
+        self.assertIn("# TYPE amazstreme_dropped_frames_total counter\namazstreme_dropped_frames_total 3\n", text)
+
+    def test_dump_writes_both_files(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        registry = Registry()
+        registry.increment("calls")
+        slow_log = SlowQueryLog(threshold=0)
+        slow_log.record("SELECT 1", 0.5, 1)
+        registry.dump(directory, slow_log=slow_log)
+        with open(os.path.join(directory, "metrics.json")) as f:
+            self.assertEqual(json.load(f)["slow_queries"][0]["sql"], "SELECT 1")
+        self.assertEqual(sorted(os.listdir(directory)), ["metrics.json", "metrics.prom"])
+
+
+class SqlTracerTest(unittest.TestCase):
+    def test_normalize_sql(self):
+        self.assertEqual(normalize_sql("  SELECT *\n  FROM videos\n"), "SELECT * FROM videos")
+        self.assertEqual(len(normalize_sql("SELECT " + "x, " * 100, limit=20)), 20)
+
+    def test_traces_statements_through_the_database(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        db = Database(os.path.join(directory, "test.db"))
+        self.addCleanup(db.close)
+        registry = Registry()
+        slow_log = SlowQueryLog(threshold=0)
+        db.trace = SqlTracer(registry, slow_log)
+
+        db.execute("CREATE TABLE t (x)")
+        db.executemany("INSERT INTO t VALUES (?)", [(1,), (2,)])
+        db.commit()
+        self.assertEqual(db.fetchall("SELECT x FROM t"), [(1,), (2,)])
+
+        statements = {dict(labels)["statement"] for name, labels in registry.histograms if name == "sql_seconds"}
+        self.assertEqual(statements, {"CREATE TABLE t (x)", "INSERT INTO t VALUES (?)", "COMMIT", "SELECT x FROM t"})
+        self.assertEqual(registry.counters[("sql_rows_total", (("statement", "SELECT x FROM t"),))], 2)
+        self.assertEqual(registry.counters[("slow_queries_total", ())], 4)
+        self.assertEqual(len(slow_log.entries()), 4)
+
+    def test_slow_log_keeps_only_slow_statements(self):
+        slow_log = SlowQueryLog(threshold=0.05, maxlen=2)
+        self.assertFalse(slow_log.record("SELECT 1", 0.01, 1))
+        for i in range(3):
+            self.assertTrue(slow_log.record(f"SELECT {i}", 0.1, 1))
+        self.assertEqual([entry["sql"] for entry in slow_log.entries()], ["SELECT 1", "SELECT 2"])
+
+
+class TimedThing:
+    def work(self, value):
+        return value * 2
+
+
+class InstrumentMethodsTest(unittest.TestCase):
+    def test_wrapped_methods_are_timed(self):
+        registry = Registry()
+        thing = TimedThing()
+        instrument_methods(thing, ["work"], registry)
+        self.assertEqual(thing.work(21), 42)
+        self.assertEqual(thing.work.__name__, "work")
+        self.assertEqual(registry.histograms[("call_seconds", (("method", "work"),))].count, 1)
+
+
+class FrameSamplerTest(unittest.TestCase):
+    def test_counts_dropped_frames(self):
+        registry = Registry()
+        sampler = FrameSampler(registry, clock=None, fps=60)
+        for dt in (1 / 60, 1 / 60 * 1.4, 1 / 60 * 2, 1 / 60 * 3.2):
+            sampler.tick(dt)
+        self.assertEqual(registry.histograms[("frame_seconds", ())].count, 4)
+        self.assertEqual(registry.counters[("dropped_frames_total", ())], 1 + 2)
+
+
+class StartupTimelineTest(unittest.TestCase):
+    def test_phases_and_report(self):
+        clock = FakeClock()
+        timeline = StartupTimeline(clock)
+        clock.now = 0.25
+        timeline.mark("imports")
+        clock.now = 0.3
+        timeline.mark("setup")
+        self.assertEqual(timeline.phases(), [("imports", 0.25, 0.25), ("setup", 0.3 - 0.25, 0.3)])
+        self.assertEqual(timeline.report(), "imports 250ms, setup 50ms (total 300ms)")
+
+        registry = Registry()
+        timeline.record(registry)
+        self.assertEqual(registry.histograms[("startup_phase_seconds", (("phase", "setup"),))].count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
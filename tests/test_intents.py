@@ -0,0 +1,78 @@
+"""IntentMatcher tokenization, overlap resolution and tie-breaking.
+
+Run with ``python -m unittest discover tests`` from the repository root.
+"""
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from intents import Intent, IntentMatcher, tokenize  # noqa: E402
+
+
+def intent(name, *patterns, priority=0):
+    return Intent(name, patterns, f"{name} reply", priority)
+
+
+class IntentMatcherTest(unittest.TestCase):
+    def name(self, matcher, message):
+        found = matcher.match(message)
+        return found.name if found else None
+
+    def test_tokenize_keeps_apostrophes_inside_words(self):
+        self.assertEqual(tokenize("How's it GOING, Raikun?"), ["how's", "it", "going", "raikun"])
+
+    def test_matches_whole_words_only(self):
+        matcher = IntentMatcher([intent("greeting", "hi")])
+        self.assertEqual(self.name(matcher, "Hi there"), "greeting")
+        self.assertIsNone(matcher.match("this is it"))
+
+    def test_finds_every_occurrence_including_overlaps(self):
+        matcher = IntentMatcher([intent("how", "how are you"), intent("you", "you"), intent("are", "are you")])
+        found = sorted((m.start, m.end, m.intent) for m in matcher.matches("so how are you"))
+        self.assertEqual(found, [(1, 4, 0), (2, 4, 2), (3, 4, 1)])
+
+    def test_longest_match_wins_an_overlap(self):
+        matcher = IntentMatcher([intent("you", "you"), intent("how", "how are you")])
+        self.assertEqual(self.name(matcher, "how are you"), "how")
+
+    def test_intent_covering_more_tokens_wins(self):
+        matcher = IntentMatcher([
+            intent("download", "download"),
+            intent("upload", "upload", "my video"),
+        ])
+        self.assertEqual(self.name(matcher, "download my video and upload it"), "upload")
+
+    def test_ties_go_to_priority_then_position_then_file_order(self):
+        matcher = IntentMatcher([intent("a", "alpha"), intent("b", "beta", priority=1)])
+        self.assertEqual(self.name(matcher, "alpha beta"), "b")
+        matcher = IntentMatcher([intent("a", "alpha"), intent("b", "beta")])
+        self.assertEqual(self.name(matcher, "beta alpha"), "b")
+        matcher = IntentMatcher([intent("a", "same"), intent("b", "same")])
+        self.assertEqual(self.name(matcher, "same"), "a")
+
+    def test_failure_links_find_patterns_after_a_partial_match(self):
+        matcher = IntentMatcher([intent("long", "a b c d"), intent("short", "b c")])
+        self.assertEqual(self.name(matcher, "a b c x"), "short")
+
+    def test_default_reply_when_nothing_matches(self):
+        matcher = IntentMatcher([intent("greeting", "hello")], default="Pardon?")
+        self.assertEqual(matcher.respond("hello"), "greeting reply")
+        self.assertEqual(matcher.respond("???"), "Pardon?")
+
+    def test_rejects_patterns_without_words(self):
+        with self.assertRaises(ValueError):
+            IntentMatcher([intent("empty", "?!")])
+        with self.assertRaises(ValueError):
+            IntentMatcher([intent("none")])
+
+    def test_shipped_intents_load(self):
+        matcher = IntentMatcher.from_file(os.path.join(ROOT, "intents.json"))
+        self.assertEqual(self.name(matcher, "Hello there"), "greeting")
+        self.assertEqual(self.name(matcher, "hey, how are you doing?"), "how_are_you")
+
+
+if __name__ == "__main__":
+    unittest.main()
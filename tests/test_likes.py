@@ -0,0 +1,103 @@
+"""LikeBuffer collapsing, counting and failed flushes.
+
+Run with ``python -m unittest discover tests`` from the repository root.
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+from likes import LikeBuffer, liked_video_ids  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+
+class LikeBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.directory, "test.db")
+        self.db = Database(self.db_path)
+        migrate(self.db)
+        with self.db.transaction():
+            self.db.executemany(
+                "INSERT INTO videos (id, title, file_path, likes) VALUES (?, ?, ?, 0)",
+                [(i, f"Video {i}", f"/media/{i}.mp4") for i in (1, 2)]
+            )
+        self.likes = LikeBuffer(self.db)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def count(self, video_id):
+        return self.db.fetchone("SELECT likes FROM videos WHERE id=?", (video_id,))[0]
+
+    def test_nothing_is_written_until_flush(self):
+        self.likes.set(10, 1, True)
+        self.assertEqual(self.count(1), 0)
+        self.assertEqual(self.likes.pending(), 1)
+        self.assertEqual(self.likes.flush(), {1: 1})
+        self.assertEqual(self.count(1), 1)
+        self.assertEqual(liked_video_ids(self.db, 10), [1])
+        self.assertEqual(self.likes.flush(), {})
+
+    def test_only_the_last_tap_counts(self):
+        for liked in (True, False, True, False, True):
+            self.likes.set(10, 1, liked)
+        self.likes.set(11, 1, True)
+        self.likes.set(12, 1, False)
+        self.assertEqual(self.likes.flush(), {1: 2})
+        self.assertEqual(self.count(1), 2)
+
+    def test_a_user_likes_a_video_once(self):
+        self.likes.set(10, 1, True)
+        self.likes.flush()
+        self.likes.set(10, 1, True)
+        self.assertEqual(self.likes.flush(), {})
+        self.assertEqual(self.count(1), 1)
+
+    def test_unlike_takes_the_like_back(self):
+        self.likes.set(10, 1, True)
+        self.likes.set(11, 1, True)
+        self.likes.flush()
+        self.likes.set(10, 1, False)
+        self.likes.set(13, 2, False)  # Never liked: no change
+        self.assertEqual(self.likes.flush(), {1: -1})
+        self.assertEqual(self.count(1), 1)
+        self.assertEqual(self.count(2), 0)
+
+    def test_set_asks_for_a_flush_when_full(self):
+        likes = LikeBuffer(self.db, max_pending=2)
+        self.assertFalse(likes.set(10, 1, True))
+        self.assertFalse(likes.set(10, 1, False))
+        self.assertTrue(likes.set(10, 2, True))
+
+    def test_failed_flush_keeps_the_taps_unless_replaced(self):
+        db = Database(self.db_path, timeout=0.05)
+        self.addCleanup(db.close)
+        likes = LikeBuffer(db)
+        likes.set(10, 1, True)
+        likes.set(11, 1, True)
+
+        blocker = sqlite3.connect(self.db_path)
+        blocker.execute("BEGIN IMMEDIATE")
+        try:
+            with self.assertRaises(sqlite3.OperationalError):
+                likes.flush()
+            likes.set(11, 1, False)  # Newer than the tap that failed to write
+        finally:
+            blocker.rollback()
+            blocker.close()
+
+        self.assertEqual(likes.pending(), 2)
+        self.assertEqual(likes.flush(), {1: 1})
+        self.assertEqual(liked_video_ids(db, 10), [1])
+        self.assertEqual(liked_video_ids(db, 11), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
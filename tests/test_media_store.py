@@ -0,0 +1,126 @@
+"""MediaStore reference counting and integrity checks, alone and through the services.
+
+Run with ``python -m unittest discover tests`` from the repository root.
+"""
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from database import Database  # noqa: E402
+from media_store import MediaStore  # noqa: E402
+from migrations import migrate  # noqa: E402
+from services import Services  # noqa: E402
+
+
+class MediaStoreCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.directory, "test.db")
+        self.db = Database(self.db_path)
+        migrate(self.db)
+        self.root = os.path.join(self.directory, "blobs")
+        self.store = MediaStore(self.db, self.root)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def staged(self, data, name="upload.mp4"):
+        """(path, sha256) of a finished ingest holding ``data``"""
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path, hashlib.sha256(data).hexdigest()
+
+    def refcount(self, sha256):
+        row = self.db.fetchone("SELECT refcount FROM blobs WHERE sha256=?", (sha256,))
+        return row[0] if row else None
+
+
+class MediaStoreTest(MediaStoreCase):
+    def test_same_content_is_stored_once(self):
+        first = self.store.put(*self.staged(b"video"))
+        path, sha256 = self.staged(b"video", "again.mp4")
+        self.assertEqual(self.store.put(path, sha256), first)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.refcount(sha256), 2)
+
+    def test_last_release_deletes_the_blob(self):
+        path, sha256 = self.staged(b"video")
+        blob = self.store.put(path, sha256)
+        self.store.link(sha256, os.path.join(self.directory, "download.mp4"))
+
+        self.assertIsNone(self.store.release(sha256))
+        self.assertTrue(os.path.exists(blob))
+        self.assertEqual(self.store.release(sha256), blob)
+        self.assertFalse(os.path.exists(blob))
+        self.assertIsNone(self.refcount(sha256))
+
+    def test_verify_all_reports_corrupt_and_missing_blobs(self):
+        blobs = {}
+        for data in (b"intact", b"corrupt", b"missing"):
+            path, sha256 = self.staged(data, data.decode() + ".mp4")
+            blobs[data] = (sha256, self.store.put(path, sha256))
+        self.assertEqual(self.store.verify_all(), [])
+
+        with open(blobs[b"corrupt"][1], "r+b") as f:
+            f.write(b"X")
+        os.remove(blobs[b"missing"][1])
+        self.assertEqual(
+            sorted(self.store.verify_all()), sorted([blobs[b"corrupt"][0], blobs[b"missing"][0]])
+        )
+
+    def test_command_line_check_fails_on_a_corrupt_blob(self):
+        path, sha256 = self.staged(b"video")
+        with open(self.store.put(path, sha256), "ab") as f:
+            f.write(b"trailing garbage")
+        result = subprocess.run(
+            [sys.executable, os.path.join(ROOT, "media_store.py"), self.db_path, self.root],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        self.assertEqual(result.returncode, 1)
+        self.assertIn(sha256, result.stdout.decode())
+
+
+class DownloadReferencesTest(MediaStoreCase):
+    def setUp(self):
+        super().setUp()
+        self.services = Services(self.db, self.store, workers=1)
+        self.db.execute("INSERT INTO users (id, username, password) VALUES (1, 'viewer', 'x')")
+        self.db.commit()
+        path, self.sha256 = self.staged(b"video")
+        upload = self.services.uploads.store(1, path, self.sha256, "Title", "General", "")
+        self.video_id = upload["id"]
+        self.blob = upload["path"]
+        self.downloads_dir = os.path.join(self.directory, "downloads")
+
+    def tearDown(self):
+        self.services.shutdown()
+        super().tearDown()
+
+    def test_download_and_remove_take_and_drop_a_reference(self):
+        download = self.services.downloads.download(1, self.video_id, self.downloads_dir)
+        self.assertTrue(os.path.exists(download["path"]))
+        self.assertEqual(self.refcount(self.sha256), 2)
+
+        self.services.downloads.remove(1, self.video_id)
+        self.assertFalse(os.path.exists(download["path"]))
+        self.assertEqual(self.refcount(self.sha256), 1)
+        self.assertTrue(os.path.exists(self.blob))
+
+    def test_redownloading_a_deleted_file_keeps_one_reference(self):
+        download = self.services.downloads.download(1, self.video_id, self.downloads_dir)
+        os.remove(download["path"])
+        self.services.downloads.download(1, self.video_id, self.downloads_dir)
+        self.assertEqual(self.refcount(self.sha256), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+"""Keyframe times from synthetic MP4 sample tables and edit lists.
+
+Run with ``python -m unittest discover tests`` from the repository root.
+"""
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keyframes import snap  # noqa: E402
+from mp4probe import ProbeError, find_box, parse_moov, probe, _keyframes_ms  # noqa: E402
+
+MOVIE_TIMESCALE = 1000
+MEDIA_TIMESCALE = 1200
+FRAME = 50  # ticks per frame: 24 fps at 1200
+SAMPLES = 10
+SYNC_SAMPLES = (1, 5, 9)
+
+
+def box(box_type, *payload):
+    data = b"".join(payload)
+    return struct.pack(">I4s", 8 + len(data), box_type) + data
+
+
+def full_box(box_type, fmt, *values, version=0):
+    return box(box_type, struct.pack(">I", version << 24), struct.pack(fmt, *values))
+
+
+def stts(*runs):
+    return full_box(b"stts", ">I" + "II" * len(runs), len(runs), *[v for run in runs for v in run])
+
+
+def stss(*samples):
+    return full_box(b"stss", f">I{len(samples)}I", len(samples), *samples)
+
+
+def ctts(*runs):
+    return full_box(b"ctts", ">I" + "Ii" * len(runs), len(runs), *[v for run in runs for v in run])
+
+
+def elst(*entries):
+    """An edit list of (segment duration, media time) entries at normal rate"""
+    return box(b"edts", full_box(b"elst", ">I" + "Iihh" * len(entries), len(entries),
+                                 *[v for entry in entries for v in (*entry, 1, 0)]))
+
+
+def stbl(*children):
+    stsd = full_box(b"stsd", ">II4s", 1, 8, b"avc1")  # One sample entry, just its header
+    return box(b"stbl", stsd, *children)
+
+
+def duration_header(box_type, timescale, duration):
+    return full_box(box_type, ">IIII80x", 0, 0, timescale, duration)
+
+
+def moov(table, edits=b""):
+    tkhd = full_box(b"tkhd", ">72xII", 1280 << 16, 720 << 16)
+    hdlr = full_box(b"hdlr", ">I4s12x", 0, b"vide")
+    mdia = box(b"mdia", duration_header(b"mdhd", MEDIA_TIMESCALE, SAMPLES * FRAME), hdlr,
+               box(b"minf", table))
+    return box(b"moov", duration_header(b"mvhd", MOVIE_TIMESCALE, 417), box(b"trak", tkhd, edits, mdia))
+
+
+def keyframes(table, media_start=0, lead_in_ms=0):
+    data = memoryview(table)
+    return _keyframes_ms(data, find_box(data, [b"stbl"]), MEDIA_TIMESCALE, media_start, lead_in_ms)
+
+
+class KeyframesTest(unittest.TestCase):
+    def test_decode_times_without_reordering(self):
+        table = stbl(stts((SAMPLES, FRAME)), stss(*SYNC_SAMPLES))
+        self.assertEqual(keyframes(table), [0, 166, 333])
+
+    def test_every_sample_a_keyframe(self):
+        self.assertIsNone(keyframes(stbl(stts((SAMPLES, FRAME)))))
+
+    def test_several_stts_runs(self):
+        table = stbl(stts((4, FRAME), (6, 2 * FRAME)), stss(*SYNC_SAMPLES))
+        self.assertEqual(keyframes(table), [0, 166, 500])
+
+    def test_composition_offsets_move_keyframes(self):
+        table = stbl(
+            stts((SAMPLES, FRAME)), stss(*SYNC_SAMPLES),
+            ctts((1, 100), (3, 0), (1, 150), (5, 50)),
+        )
+        self.assertEqual(keyframes(table), [83, 291, 375])
+
+    def test_edit_list_cancels_the_composition_delay(self):
+        table = stbl(stts((SAMPLES, FRAME)), stss(*SYNC_SAMPLES), ctts((SAMPLES, 2 * FRAME)))
+        self.assertEqual(keyframes(table), [83, 250, 416])
+        self.assertEqual(keyframes(table, media_start=2 * FRAME), [0, 166, 333])
+
+    def test_negative_offsets_never_go_below_zero(self):
+        table = stbl(stts((SAMPLES, FRAME)), stss(*SYNC_SAMPLES), ctts((SAMPLES, -FRAME)))
+        self.assertEqual(keyframes(table), [0, 125, 291])
+
+    def test_sync_samples_past_the_table_are_dropped(self):
+        table = stbl(stts((6, FRAME)), stss(*SYNC_SAMPLES))
+        self.assertEqual(keyframes(table), [0, 166])
+
+
+class ParseMoovTest(unittest.TestCase):
+    def table(self):
+        return stbl(stts((SAMPLES, FRAME)), stss(*SYNC_SAMPLES), ctts((SAMPLES, 2 * FRAME)))
+
+    def test_reads_the_track(self):
+        info = parse_moov(moov(self.table()), file_size=417 * 125)
+        self.assertEqual(info.duration_ms, 417)
+        self.assertEqual((info.width, info.height), (1280, 720))
+        self.assertEqual(info.video_codec, "avc1")
+        self.assertEqual(info.bitrate, 1000000)
+        self.assertEqual(info.keyframes_ms, [83, 250, 416])
+
+    def test_applies_the_edit_list(self):
+        info = parse_moov(moov(self.table(), elst((417, 2 * FRAME))))
+        self.assertEqual(info.keyframes_ms, [0, 166, 333])
+
+    def test_empty_edit_adds_a_lead_in(self):
+        info = parse_moov(moov(self.table(), elst((500, -1), (417, 2 * FRAME))))
+        self.assertEqual(info.keyframes_ms, [500, 666, 833])
+
+    def test_probe_skips_to_moov(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        path = os.path.join(directory, "clip.mp4")
+        with open(path, "wb") as f:
+            f.write(box(b"ftyp", b"isom\x00\x00\x02\x00") + box(b"mdat", bytes(4096)) + moov(self.table()))
+        self.assertEqual(probe(path).keyframes_ms, [83, 250, 416])
+
+        with open(path, "wb") as f:
+            f.write(b"not an mp4 file at all")
+        with self.assertRaises(ProbeError):
+            probe(path)
+
+
+class SnapTest(unittest.TestCase):
+    def test_snaps_back_to_the_previous_keyframe(self):
+        index = [0, 2000, 4000]
+        self.assertEqual([snap(index, t) for t in (0, 1999, 2000, 3500, 9000)], [0, 0, 2000, 2000, 4000])
+        self.assertEqual(snap(None, 1234), 1234)
+
+
+if __name__ == "__main__":
+    unittest.main()
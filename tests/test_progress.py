@@ -0,0 +1,136 @@
+"""ProgressTracker buffering, flushing and retries.
+
+Run with ``python -m unittest discover tests`` from the repository root.
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+from migrations import migrate  # noqa: E402
+from progress import ProgressTracker  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class ProgressTrackerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.directory, "test.db")
+        self.db = Database(self.db_path)
+        migrate(self.db)
+        self.clock = FakeClock()
+        self.submitted = []
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def tracker(self, **kwargs):
+        return ProgressTracker(self.db, flush_interval=5.0, clock=self.clock, **kwargs)
+
+    def history(self):
+        return self.db.fetchall("SELECT user_id, video_id, progress, position_ms FROM watch_history")
+
+    def queue(self, func, *args):
+        self.submitted.append((func, args))
+
+    def run_submitted(self, order=None):
+        jobs, self.submitted = self.submitted, []
+        for i in (order or range(len(jobs))):
+            func, args = jobs[i]
+            func(*args)
+
+    def test_writes_at_most_once_per_interval(self):
+        tracker = self.tracker()
+        tracker.start(1, 7)
+        tracker.update(10, 100)
+        tracker.update(20, 100)
+        self.assertEqual(self.history(), [])
+
+        self.clock.now += 5
+        tracker.update(30, 100)
+        self.assertEqual(self.history(), [(1, 7, 30, 30000)])
+        tracker.update(40, 100)
+        self.assertEqual(self.history(), [(1, 7, 30, 30000)])
+
+    def test_flush_writes_only_when_dirty(self):
+        tracker = self.tracker()
+        tracker.start(1, 7)
+        self.assertFalse(tracker.flush())
+        tracker.update(50, 100)
+        self.assertTrue(tracker.flush())
+        self.assertFalse(tracker.flush())
+        self.assertEqual(self.history(), [(1, 7, 50, 50000)])
+
+    def test_stop_writes_the_final_position(self):
+        tracker = self.tracker()
+        tracker.start(1, 7)
+        tracker.update(60, 100)
+        tracker.stop()
+        self.assertEqual(self.history(), [(1, 7, 60, 60000)])
+        tracker.update(70, 100)
+        self.assertFalse(tracker.flush())
+
+    def test_waits_for_the_video_id(self):
+        tracker = self.tracker()
+        tracker.start(1)
+        tracker.update(10, 100)
+        self.assertFalse(tracker.flush())
+        tracker.video_id = 7
+        self.assertTrue(tracker.flush())
+        self.assertEqual(self.history(), [(1, 7, 10, 10000)])
+
+    def test_writes_go_through_submit(self):
+        tracker = self.tracker(submit=self.queue)
+        tracker.start(1, 7)
+        tracker.update(10, 100)
+        tracker.flush()
+        self.assertEqual(self.history(), [])
+        self.run_submitted()
+        self.assertEqual(self.history(), [(1, 7, 10, 10000)])
+
+    def test_a_late_snapshot_never_overwrites_a_newer_one(self):
+        tracker = self.tracker(submit=self.queue)
+        tracker.start(1, 7)
+        tracker.update(10, 100)
+        tracker.flush()
+        tracker.update(20, 100)
+        tracker.flush()
+        self.run_submitted(order=[1, 0])
+        self.assertEqual(self.history(), [(1, 7, 20, 20000)])
+
+    def test_locked_database_is_retried_by_the_next_flush(self):
+        db = Database(self.db_path, timeout=0.05)
+        self.addCleanup(db.close)
+        tracker = ProgressTracker(db, clock=self.clock)
+        tracker.start(1, 7)
+        tracker.update(10, 100)
+
+        # Another connection holds the write lock past the busy timeout
+        blocker = sqlite3.connect(self.db_path)
+        blocker.execute("BEGIN IMMEDIATE")
+        try:
+            tracker.flush()
+        finally:
+            blocker.rollback()
+            blocker.close()
+        self.assertEqual(self.history(), [])
+
+        self.assertTrue(tracker.flush())
+        self.assertEqual(self.history(), [(1, 7, 10, 10000)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+"""ThumbnailCache against a local HTTP server.
+
+Run with ``python -m unittest discover tests`` from the repository root.
+"""
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from thumbnails import ThumbnailCache, ThumbnailError  # noqa: E402
+
+IMAGE_SIZE = 1000
+TIMEOUT = 10
+
+
+def fake_png(name):
+    """IMAGE_SIZE bytes that pass the cache's PNG signature check, different per name"""
+    data = b"\x89PNG\r\n\x1a\n" + name.encode("utf-8")
+    return data + bytes(IMAGE_SIZE - len(data))
+
+
+class ThumbnailServer(ThreadingHTTPServer):
+    """Serves fake PNGs under /<name>.png and text anywhere else, counting requests"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ThumbnailHandler)
+        self.requests = Counter()
+        self.release = threading.Event()
+        self.release.set()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class ThumbnailHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests[self.path] += 1
+        # Held while a test lines up requests for the same URL
+        self.server.release.wait(TIMEOUT)
+        if self.path.endswith(".png"):
+            body, content_type = fake_png(self.path), "image/png"
+        else:
+            body, content_type = b"<html>not a thumbnail</html>", "text/html"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThumbnailCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThumbnailServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.directory = tempfile.mkdtemp()
+        self.caches = []
+
+    def tearDown(self):
+        self.server.release.set()
+        for cache in self.caches:
+            cache.shutdown()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def cache(self, **kwargs):
+        cache = ThumbnailCache(self.directory, **kwargs)
+        self.caches.append(cache)
+        return cache
+
+    def load(self, cache, path):
+        """(image, error) for ``path``, waiting for the callback"""
+        results = queue.Queue()
+        cache.get(self.server.url(path), lambda url, image, error: results.put((image, error)))
+        return results.get(timeout=TIMEOUT)
+
+    def cached_files(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_fetches_and_caches(self):
+        cache = self.cache()
+        image, error = self.load(cache, "/a.png")
+        self.assertIsNone(error)
+        self.assertEqual(image, fake_png("/a.png"))
+        self.assertEqual(len(self.cached_files()), 1)
+
+        # The second request is a memory hit, delivered without a fetch
+        self.assertEqual(self.load(cache, "/a.png"), (image, None))
+        self.assertEqual(self.server.requests["/a.png"], 1)
+
+    def test_concurrent_requests_share_one_fetch(self):
+        cache = self.cache()
+        self.server.release.clear()
+        results = queue.Queue()
+        for _ in range(5):
+            cache.get(self.server.url("/shared.png"), lambda url, image, error: results.put((image, error)))
+        self.server.release.set()
+
+        delivered = [results.get(timeout=TIMEOUT) for _ in range(5)]
+        self.assertEqual(delivered, [(fake_png("/shared.png"), None)] * 5)
+        self.assertEqual(self.server.requests["/shared.png"], 1)
+
+    def test_rejects_non_images(self):
+        cache = self.cache()
+        image, error = self.load(cache, "/page.html")
+        self.assertIsNone(image)
+        self.assertIsInstance(error, ThumbnailError)
+        self.assertEqual(self.cached_files(), [])
+        self.assertEqual(len(cache.memory), 0)
+
+    def test_memory_budget_evicts_least_recently_used(self):
+        cache = self.cache(memory_budget=2 * IMAGE_SIZE)
+        for path in ("/a.png", "/b.png", "/c.png"):
+            self.load(cache, path)
+
+        self.assertEqual(len(cache.memory), 2)
+        self.assertLessEqual(cache.memory.size, 2 * IMAGE_SIZE)
+        self.assertIsNone(cache.memory.get(self.server.url("/a.png")))
+        # Evicted from memory but still on disk, so it comes back without a fetch
+        self.assertEqual(self.load(cache, "/a.png"), (fake_png("/a.png"), None))
+        self.assertEqual(self.server.requests["/a.png"], 1)
+
+    def test_disk_budget_evicts_least_recently_used(self):
+        cache = self.cache(memory_budget=0, disk_budget=2 * IMAGE_SIZE)
+        for path in ("/a.png", "/b.png", "/c.png"):
+            self.load(cache, path)
+
+        self.assertEqual(len(self.cached_files()), 2)
+        self.assertLessEqual(cache.disk.size, 2 * IMAGE_SIZE)
+        self.assertIsNone(cache.disk.get(self.server.url("/a.png")))
+        self.assertIsNotNone(cache.disk.get(self.server.url("/c.png")))
+
+    def test_warm_start_from_disk(self):
+        cache = self.cache()
+        for path in ("/a.png", "/b.png"):
+            self.load(cache, path)
+        cache.shutdown()
+
+        restarted = self.cache()
+        self.assertEqual(self.load(restarted, "/a.png"), (fake_png("/a.png"), None))
+        self.assertEqual(self.load(restarted, "/b.png"), (fake_png("/b.png"), None))
+        self.assertEqual(self.server.requests["/a.png"], 1)
+        self.assertEqual(self.server.requests["/b.png"], 1)
+        self.assertEqual(restarted.disk.size, 2 * IMAGE_SIZE)
+
+
+if __name__ == "__main__":
+    unittest.main()
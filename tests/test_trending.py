@@ -0,0 +1,163 @@
+"""TrendingIndex decay, epoch rebasing and the like flush that feeds it.
+
+Run with ``python -m unittest discover tests`` from the repository root.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+from media_store import MediaStore  # noqa: E402
+from migrations import migrate  # noqa: E402
+from services import Services  # noqa: E402
+from trending import HALF_LIFE, MAX_EXPONENT, MIN_SCORE, REBASE_AFTER, TrendingIndex  # noqa: E402
+
+START = 1_000_000_000.0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = START
+
+    def __call__(self):
+        return self.now
+
+
+class TrendingCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.directory, "test.db"))
+        migrate(self.db)
+        with self.db.transaction():
+            self.db.executemany(
+                "INSERT INTO videos (id, title, file_path, likes) VALUES (?, ?, ?, 0)",
+                [(i, f"Video {i}", f"/media/{i}.mp4") for i in range(1, 5)]
+            )
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def scores(self):
+        return dict(self.db.fetchall("SELECT video_id, score FROM trending"))
+
+    def epoch(self):
+        return self.db.fetchone("SELECT epoch FROM trending_state")[0]
+
+
+class TrendingIndexTest(TrendingCase):
+    def setUp(self):
+        super().setUp()
+        self.index = TrendingIndex(self.db, clock=self.clock)
+
+    def test_events_are_buffered_until_flush(self):
+        self.index.record(1, "view")
+        self.index.record(1, "like", 2)
+        self.assertEqual(self.scores(), {})
+        self.assertEqual(self.index.pending(), 1)
+        self.assertEqual(self.index.flush(), 1)
+        self.assertEqual(self.scores(), {1: 5.0})
+
+    def test_recent_events_outweigh_older_ones(self):
+        self.index.record(1, "comment")
+        self.index.record(2, "view")
+        self.index.flush()
+        self.assertEqual(self.index.top(), [1, 2])
+
+        # Two half-lives later a single view weighs as much as the old comment did
+        self.clock.now += 2 * HALF_LIFE
+        self.index.record(2, "view")
+        self.index.record(3, "view")
+        self.index.flush()
+        self.assertEqual(self.index.top(), [2, 3, 1])
+        self.assertAlmostEqual(self.scores()[3], 4.0)
+
+    def test_rebase_keeps_the_order_and_drops_decayed_scores(self):
+        self.index.record(1, "view", 3)
+        self.index.record(2, "view")
+        self.clock.now += REBASE_AFTER - HALF_LIFE
+        self.index.record(3, "view")
+        self.index.record(4, "view", 2)
+        self.index.flush()
+        self.assertEqual(self.index.top(), [4, 3, 1, 2])
+
+        self.clock.now += 2 * HALF_LIFE
+        self.index.flush()
+        self.assertEqual(self.epoch(), self.clock.now)
+        # Two half-lives on, 3 and 4 are worth a quarter of their views; 1 and 2
+        # are a month old and below MIN_SCORE
+        scores = self.scores()
+        self.assertEqual(sorted(scores), [3, 4])
+        self.assertAlmostEqual(scores[3], 0.25)
+        self.assertAlmostEqual(scores[4], 0.5)
+        self.assertGreater(min(scores.values()), MIN_SCORE)
+        self.assertEqual(self.index.top(), [4, 3])
+
+        # New events weigh in against the rebased scores
+        self.index.record(1, "view")
+        self.index.flush()
+        self.assertEqual(self.index.top(), [1, 4, 3])
+
+    def test_rebase_keeps_events_recorded_relative_to_the_old_epoch(self):
+        self.index.record(1, "view")
+        self.index.flush()
+        self.clock.now += REBASE_AFTER + HALF_LIFE
+        self.index.record(2, "view", when=START + REBASE_AFTER)
+        self.index.flush()
+        self.assertAlmostEqual(self.scores()[2], 0.5)
+
+    def test_event_too_far_past_the_epoch_rebases_first(self):
+        self.index.record(1, "view")
+        self.index.flush()
+        self.clock.now += (MAX_EXPONENT + 10) * HALF_LIFE
+        self.index.record(2, "view")
+        self.assertEqual(self.epoch(), self.clock.now)
+        self.index.flush()
+        self.assertEqual(self.scores(), {2: 1.0})
+
+    def test_epoch_is_shared_through_the_database(self):
+        self.index.record(1, "view")
+        self.index.flush()
+        self.clock.now += HALF_LIFE
+        other = TrendingIndex(self.db, clock=self.clock)
+        other.record(2, "view")
+        other.flush()
+        self.assertAlmostEqual(self.scores()[2], 2.0)
+
+
+class LikesFeedTrendingTest(TrendingCase):
+    def setUp(self):
+        super().setUp()
+        self.services = Services(self.db, MediaStore(self.db, os.path.join(self.directory, "blobs")), workers=1)
+        self.services.trending.index.clock = self.clock
+
+    def tearDown(self):
+        self.services.shutdown()
+        super().tearDown()
+
+    def test_new_likes_count_towards_trending(self):
+        self.services.videos.set_like(10, 1, True)
+        self.services.videos.set_like(11, 1, True)
+        self.services.flush()
+        self.assertEqual(self.scores(), {1: 4.0})
+
+        self.services.videos.set_like(10, 1, False)
+        self.services.flush()
+        self.assertEqual(self.scores(), {1: 4.0})
+
+    def test_an_early_like_flush_reaches_trending(self):
+        self.services.videos.likes.max_pending = 2
+        self.services.videos.set_like(10, 1, True)
+        self.services.videos.set_like(11, 2, True)  # Fills the buffer and flushes
+        self.assertEqual(self.services.videos.likes.pending(), 0)
+        self.services.trending.flush()
+        self.assertEqual(self.scores(), {1: 2.0, 2: 2.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
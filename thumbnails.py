@@ -0,0 +1,248 @@
+"""Two-tier thumbnail cache.
+
+Images are looked up in a memory LRU of decoded images bounded by bytes, then
+in a disk cache bounded by total file size, and only then fetched over the
+network. Fetching and decoding run on a worker pool; concurrent requests for
+the same URL share a single fetch. Results are handed back through
+``dispatch`` so the UI can marshal them onto its own thread.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"RIFF", "webp"),
+)
+
+
+class ThumbnailError(Exception):
+    pass
+
+
+def fetch_url(url, timeout=10):
+    """Download ``url``, returning (body, expected_length or None)"""
+    # urllib.request drags in http.client, email and ssl; only the fetch workers need it
+    import urllib.request
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        length = response.headers.get("Content-Length")
+        return response.read(), int(length) if length else None
+
+
+def image_extension(data):
+    """File extension for the image format of ``data``, or None if it isn't an image"""
+    for signature, extension in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    return None
+
+
+class MemoryLRU:
+    """Decoded images keyed by URL, evicting least recently used past ``budget`` bytes"""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key, value, nbytes):
+        with self._lock:
+            if key in self._items:
+                self.size -= self._items.pop(key)[1]
+            if nbytes > self.budget:
+                return
+            self._items[key] = (value, nbytes)
+            self.size += nbytes
+            while self.size > self.budget:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.size -= evicted
+
+    def __len__(self):
+        return len(self._items)
+
+
+class DiskLRU:
+    """Files in ``directory`` named by URL hash, evicted oldest-use first past ``budget`` bytes"""
+
+    def __init__(self, directory, budget):
+        self.directory = directory
+        self.budget = budget
+        self.size = 0
+        self._files = OrderedDict()  # key -> (file name, size)
+        self._lock = threading.Lock()
+        self._scanned = False
+
+    def _scan(self):
+        """Index the directory on first use rather than at startup; call with the lock held"""
+        if self._scanned:
+            return
+        self._scanned = True
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".part"):
+                os.remove(path)
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name.split(".")[0]] = (name, size)
+            self.size += size
+
+    @staticmethod
+    def key(url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def get(self, url):
+        """Path of the cached file for ``url``, or None; marks it recently used"""
+        key = self.key(url)
+        with self._lock:
+            self._scan()
+            entry = self._files.get(key)
+            if entry is None:
+                return None
+            self._files.move_to_end(key)
+        path = os.path.join(self.directory, entry[0])
+        try:
+            os.utime(path)
+        except OSError:
+            self.discard(url)
+            return None
+        return path
+
+    def put(self, url, data, extension):
+        key = self.key(url)
+        name = f"{key}.{extension}"
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{threading.get_ident()}.part"
+        # Scan before writing, so the scan can't mistake our .part file for a leftover
+        with self._lock:
+            self._scan()
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            previous = self._files.pop(key, None)
+            if previous is not None:
+                self.size -= previous[1]
+            self._files[key] = (name, len(data))
+            self.size += len(data)
+            evicted = []
+            while self.size > self.budget and len(self._files) > 1:
+                _, (old_name, old_size) = self._files.popitem(last=False)
+                self.size -= old_size
+                evicted.append(old_name)
+        if previous is not None and previous[0] != name:
+            evicted.append(previous[0])
+        for old_name in evicted:
+            try:
+                os.remove(os.path.join(self.directory, old_name))
+            except OSError:
+                pass
+        return path
+
+    def discard(self, url):
+        with self._lock:
+            self._scan()
+            entry = self._files.pop(self.key(url), None)
+            if entry is None:
+                return
+            self.size -= entry[1]
+        try:
+            os.remove(os.path.join(self.directory, entry[0]))
+        except OSError:
+            pass
+
+
+class ThumbnailCache:
+    """Fetch, cache and decode thumbnails.
+
+    ``decode(path)`` turns a cached file into the object handed to callbacks
+    and ``sizeof(image)`` reports its in-memory size. Both run on a worker
+    thread. ``dispatch(callback, *args)`` delivers results; by default it calls
+    the callback directly on the worker.
+    """
+
+    def __init__(self, directory, memory_budget=32 * 1024 * 1024, disk_budget=128 * 1024 * 1024,
+                 decode=None, sizeof=None, dispatch=None, fetch=fetch_url, workers=4):
+        self.memory = MemoryLRU(memory_budget)
+        self.disk = DiskLRU(directory, disk_budget)
+        self.decode = decode or _read_bytes
+        self.sizeof = sizeof or len
+        self.dispatch = dispatch or (lambda callback, *args: callback(*args))
+        self.fetch = fetch
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnails")
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, callback):
+        """Deliver the image for ``url`` as ``callback(url, image, error)``.
+
+        Memory hits are delivered synchronously.
+        """
+        image = self.memory.get(url)
+        if image is not None:
+            callback(url, image, None)
+            return
+        with self._lock:
+            waiting = self._pending.get(url)
+            if waiting is not None:
+                waiting.append(callback)
+                return
+            self._pending[url] = [callback]
+        self._executor.submit(self._load, url)
+
+    def _load(self, url):
+        image = error = None
+        try:
+            image = self._load_image(url)
+        except Exception as e:
+            error = e
+        with self._lock:
+            callbacks = self._pending.pop(url, [])
+        for callback in callbacks:
+            self.dispatch(callback, url, image, error)
+
+    def _load_image(self, url):
+        path = self.disk.get(url)
+        if path is not None:
+            try:
+                return self._decode(url, path)
+            except Exception:
+                # Corrupt or truncated entry: drop it and fetch again
+                self.disk.discard(url)
+        data, expected_length = self.fetch(url)
+        if expected_length is not None and len(data) != expected_length:
+            raise ThumbnailError(f"Truncated thumbnail for {url}")
+        extension = image_extension(data)
+        if extension is None:
+            raise ThumbnailError(f"Not an image: {url}")
+        return self._decode(url, self.disk.put(url, data, extension))
+
+    def _decode(self, url, path):
+        image = self.decode(path)
+        self.memory.put(url, image, self.sizeof(image))
+        return image
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def _read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
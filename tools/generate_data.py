@@ -0,0 +1,328 @@
+"""Bulk synthetic data for scale testing.
+
+Streams users, channels, videos, comments, watch history and subscriptions into an
+amazstreme database with the current schema:
+
+    python tools/generate_data.py scale.db --videos 1000000 --comments 5000000
+
+Popularity is Zipf-distributed: a few videos collect most of the likes,
+views (watch_history rows) and comments, and most videos get almost none.
+Everything derives from ``--seed``, one generator per table, so the same
+arguments always produce the same database.
+
+Rows are written with executemany in large transactions while the
+durability pragmas are relaxed, secondary indexes are dropped, the FTS
+triggers are replaced by a single rebuild at the end and the channel count
+triggers by a single recount. The database is returned to its normal
+settings afterwards.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from array import array
+from bisect import bisect
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from channels import recount_channels
+from database import Database
+from migrations import migrate
+
+PASSWORD = "password"
+BATCH_SIZE = 50000
+COMMIT_EVERY = 1000000
+
+FIRST_NAMES = [
+    "aarav", "priya", "rahul", "ananya", "vikram", "sneha", "arjun", "kavya", "rohan", "isha",
+    "james", "maria", "li", "fatima", "carlos", "yuki", "omar", "sofia", "liam", "emma",
+]
+LAST_NAMES = [
+    "sharma", "patel", "singh", "gupta", "raikwal", "khan", "iyer", "das", "mehta", "joshi",
+    "smith", "garcia", "chen", "ali", "silva", "tanaka", "nguyen", "muller", "rossi", "kim",
+]
+# (category, relative share of uploads, topic nouns, tags)
+CATEGORIES = [
+    ("Entertainment", 20, ["prank", "reaction", "challenge", "skit", "trailer"], ["funny", "viral", "comedy"]),
+    ("Gaming", 16, ["speedrun", "boss fight", "build", "walkthrough", "mod"], ["gaming", "gameplay", "pc"]),
+    ("Music", 14, ["cover", "remix", "live set", "album", "beat"], ["music", "song", "live"]),
+    ("Tech", 12, ["phone", "laptop", "gadget", "setup", "smartwatch"], ["tech", "review", "unboxing"]),
+    ("Education", 10, ["python", "calculus", "history", "physics", "kivy"], ["tutorial", "learn", "course"]),
+    ("Food", 9, ["biryani", "pasta", "street food", "dessert", "curry"], ["recipe", "cooking", "food"]),
+    ("DIY", 7, ["shelf", "lamp", "garden bed", "desk", "planter"], ["diy", "howto", "crafts"]),
+    ("Nature", 6, ["waterfall", "wildlife", "mountain", "forest", "ocean"], ["nature", "4k", "relax"]),
+    ("General", 6, ["vlog", "day", "trip", "story", "update"], ["vlog", "life", "daily"]),
+]
+TITLE_TEMPLATES = [
+    "{Topic} Review", "How to Make a {Topic}", "Top 10 {Topic} Moments", "{Topic} in {year}",
+    "I Tried the {Topic} Everyone Talks About", "Ultimate {Topic} Guide", "{Topic} for Beginners",
+    "{Topic} vs {Other}", "My First {Topic}", "Why {Topic} Is Overrated",
+]
+COMMENT_TEMPLATES = [
+    "Great video!", "First!", "This {topic} is amazing", "Can you do a video on {other}?",
+    "Watching this in {year}", "Thanks, this helped a lot", "Who else is here from the {topic} video?",
+    "The part at {minute}:{second:02d} was the best", "Underrated channel", "Not sure about the {topic} tbh",
+]
+# The app's built-in channels, as seeded by migration 11
+TEMPLATE_CHANNELS = ["TechReviews", "NatureChannel", "UserUploads"]
+CHANNEL_COUNT = 500
+
+
+class Zipf:
+    """Sampler of ranks 1..n with P(rank) proportional to 1 / rank**s"""
+
+    def __init__(self, n, s, rng):
+        self.cum = array("d")
+        total = 0.0
+        for rank in range(1, n + 1):
+            total += rank ** -s
+            self.cum.append(total)
+        self.total = total
+        self.rng = rng
+        self.n = n
+        self.s = s
+
+    def weight(self, rank):
+        """Share of all samples that fall on ``rank``"""
+        return rank ** -self.s / self.total
+
+    def sample(self):
+        return min(bisect(self.cum, self.rng.random() * self.total) + 1, self.n)
+
+
+def _rng(seed, table):
+    return random.Random(f"{seed}:{table}")
+
+
+def _batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _timestamp(rng, days=730):
+    return f"-{rng.randint(0, days * 86400)} seconds"
+
+
+@contextmanager
+def relaxed_pragmas(conn):
+    """Trade durability for speed; a crash mid-load loses the database"""
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    cache_size = conn.execute("PRAGMA cache_size").fetchone()[0]
+    conn.execute("PRAGMA journal_mode=MEMORY")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-262144")
+    conn.execute("PRAGMA locking_mode=EXCLUSIVE")
+    try:
+        yield conn
+    finally:
+        conn.execute("PRAGMA locking_mode=NORMAL")
+        conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        conn.execute(f"PRAGMA synchronous={synchronous}")
+        conn.execute(f"PRAGMA cache_size={cache_size}")
+
+
+@contextmanager
+def deferred_indexes(db):
+    """Drop secondary indexes, the FTS sync triggers and the channel count
+    triggers; rebuild them on exit.
+
+    Building an index once over the loaded rows, or counting them once, is
+    far cheaper than updating it row by row. Other triggers stay in place.
+    """
+    conn = db.connection
+    saved = conn.execute('''
+        SELECT type, name, sql FROM sqlite_master
+        WHERE sql IS NOT NULL AND (
+            type = 'index' OR (type = 'trigger' AND (
+                name LIKE 'videos_fts_%' OR name LIKE 'channel_counts_%'
+            ))
+        )
+    ''').fetchall()
+    for kind, name, _ in saved:
+        conn.execute(f"DROP {kind.upper()} {name}")
+    conn.commit()
+    try:
+        yield
+    finally:
+        for _, _, sql in saved:
+            conn.execute(sql)
+        if any(name.startswith("videos_fts_") for _, name, _ in saved):
+            conn.execute("INSERT INTO videos_fts (videos_fts) VALUES ('rebuild')")
+        conn.commit()
+        if any(name.startswith("channel_counts_") for _, name, _ in saved):
+            recount_channels(db)
+
+
+def _insert(conn, sql, rows, progress, table, total):
+    done = 0
+    since_commit = 0
+    for batch in _batches(rows):
+        conn.executemany(sql, batch)
+        done += len(batch)
+        since_commit += len(batch)
+        if since_commit >= COMMIT_EVERY:
+            conn.commit()
+            since_commit = 0
+        if progress:
+            progress(table, done, total)
+    conn.commit()
+
+
+def user_rows(seed, users):
+    rng = _rng(seed, "users")
+    for user_id in range(1, users + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield (
+            user_id, f"{first}_{last}{user_id}", PASSWORD,
+            f"https://via.placeholder.com/100x100?text={first.capitalize()}",
+            f"{first.capitalize()} {last.capitalize()} makes videos" if rng.random() < 0.1 else "",
+        )
+
+
+def channel_names():
+    return TEMPLATE_CHANNELS + [f"Channel{i}" for i in range(len(TEMPLATE_CHANNELS), CHANNEL_COUNT)]
+
+
+def channel_rows():
+    for name in channel_names():
+        yield name, f"https://via.placeholder.com/100x100?text={name}"
+
+
+def video_rows(seed, users, videos, popularity, rank_of, channel_ids):
+    rng = _rng(seed, "videos")
+    # Channel and upload time come from their own generator, keeping the other columns as they were
+    channel_rng = _rng(seed, "video_channels")
+    channels = Zipf(len(channel_ids), 1.1, channel_rng)
+    uploaders = Zipf(users, 1.2, rng)
+    category_weights = [c[1] for c in CATEGORIES]
+    max_likes = max(10, users // 2)
+    for video_id in range(1, videos + 1):
+        category, _, topics, tags = rng.choices(CATEGORIES, category_weights)[0]
+        topic, other = rng.sample(topics, 2)
+        title = rng.choice(TITLE_TEMPLATES).format(
+            Topic=topic.title(), Other=other.title(), year=rng.randint(2015, 2025)
+        )
+        rank = rank_of[video_id - 1]
+        likes = int(max_likes * popularity.weight(rank) / popularity.weight(1) * rng.lognormvariate(0, 0.5))
+        duration_ms = int(rng.lognormvariate(12.9, 0.9))  # median around 7 minutes
+        yield (
+            video_id, title, f"media/synthetic/{video_id}.mp4", uploaders.sample(), likes,
+            category, ",".join(tags + [topic]), duration_ms // 1000, duration_ms,
+            channel_ids[channels.sample() - 1], _timestamp(channel_rng),
+        )
+
+
+def comment_rows(seed, users, comments, popularity, video_of):
+    rng = _rng(seed, "comments")
+    commenters = Zipf(users, 0.8, rng)
+    for _ in range(comments):
+        topics = rng.choice(CATEGORIES)[2]
+        text = rng.choice(COMMENT_TEMPLATES).format(
+            topic=rng.choice(topics), other=rng.choice(topics), year=rng.randint(2020, 2025),
+            minute=rng.randint(0, 20), second=rng.randint(0, 59),
+        )
+        yield video_of[popularity.sample() - 1], commenters.sample(), text, _timestamp(rng)
+
+
+def history_rows(seed, users, history, popularity, video_of):
+    rng = _rng(seed, "watch_history")
+    viewers = Zipf(users, 0.6, rng)
+    for _ in range(history):
+        progress = 100 if rng.random() < 0.3 else rng.randint(0, 99)
+        yield viewers.sample(), video_of[popularity.sample() - 1], progress, _timestamp(rng, 365)
+
+
+def subscription_rows(seed, users):
+    rng = _rng(seed, "subscriptions")
+    channels = channel_names()
+    popular = Zipf(len(channels), 1.1, rng)
+    for user_id in range(1, users + 1):
+        for channel in {channels[popular.sample() - 1] for _ in range(int(rng.expovariate(0.3)))}:
+            yield user_id, channel
+
+
+def generate(db, users=1000, videos=10000, comments=100000, history=50000, seed=0, progress=None):
+    """Fill an empty database with synthetic rows, deterministically from ``seed``"""
+    migrate(db)
+    conn = db.connection
+    rng = _rng(seed, "popularity")
+    popularity = Zipf(videos, 1.0, rng)
+    # Popularity rank of each video id and the video id holding each rank
+    video_of = array("I", range(1, videos + 1))
+    rng.shuffle(video_of)
+    rank_of = array("I", bytes(4 * videos))
+    for rank, video_id in enumerate(video_of, 1):
+        rank_of[video_id - 1] = rank
+
+    with relaxed_pragmas(conn), deferred_indexes(db):
+        _insert(conn, '''
+            INSERT INTO users (id, username, password, avatar_path, bio) VALUES (?, ?, ?, ?, ?)
+        ''', user_rows(seed, users), progress, "users", users)
+        # The migrations already created the app's built-in channels
+        _insert(conn, '''
+            INSERT OR IGNORE INTO channels (name, logo) VALUES (?, ?)
+        ''', channel_rows(), progress, "channels", None)
+        ids = dict(conn.execute("SELECT name, id FROM channels").fetchall())
+        channel_ids = [ids[name] for name in channel_names()]
+        _insert(conn, '''
+            INSERT INTO videos (
+                id, title, file_path, uploader_id, likes, category, tags, duration, duration_ms,
+                channel_id, created_at
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now', ?))
+        ''', video_rows(seed, users, videos, popularity, rank_of, channel_ids), progress, "videos", videos)
+        _insert(conn, '''
+            INSERT INTO comments (video_id, user_id, text, timestamp) VALUES (?, ?, ?, datetime('now', ?))
+        ''', comment_rows(seed, users, comments, popularity, video_of), progress, "comments", comments)
+        # A viewer watching the same video twice keeps one row, so there can be fewer than asked for
+        _insert(conn, '''
+            INSERT OR IGNORE INTO watch_history (user_id, video_id, progress, last_watched)
+            VALUES (?, ?, ?, datetime('now', ?))
+        ''', history_rows(seed, users, history, popularity, video_of), progress, "watch_history", history)
+        _insert(conn, '''
+            INSERT OR IGNORE INTO subscriptions (user_id, channel_name) VALUES (?, ?)
+        ''', subscription_rows(seed, users), progress, "subscriptions", None)
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA optimize")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic amazstreme database")
+    parser.add_argument("db", help="database file to create")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--videos", type=int, default=100000)
+    parser.add_argument("--comments", type=int, default=1000000)
+    parser.add_argument("--history", type=int, default=500000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--force", action="store_true", help="replace an existing database")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.db):
+        if not args.force:
+            parser.error(f"{args.db} exists, pass --force to replace it")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+
+    def progress(table, done, total):
+        end = "\n" if done == total else ""
+        print(f"\r{table}: {done}" + (f"/{total}" if total else ""), end=end, file=sys.stderr)
+
+    started = time.perf_counter()
+    db = Database(args.db)
+    generate(db, args.users, args.videos, args.comments, args.history, args.seed, progress)
+    db.close()
+    print(f"\nGenerated {args.db} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Incrementally maintained trending scores.
+
+Every view, like and comment adds ``weight * 2 ** ((t - epoch) / HALF_LIFE)``
+to its video's score in the ``trending`` table. Since all scores share the
+epoch, this is the same ranking as decaying every score by half each
+HALF_LIFE, without ever touching old rows: an event costs one dict update in
+memory, and ``flush()`` upserts one row per video that had events. The
+(score, video_id) index serves the top K in index order.
+
+Scores grow with time, so once the epoch is ``REBASE_AFTER`` old the flush
+moves it forward, rescaling every score by the same factor and dropping the
+ones that have decayed to nothing. The order doesn't change. An event more
+than ``MAX_EXPONENT`` half-lives past the epoch (the app wasn't flushed for
+weeks) flushes first, so its weight can't overflow a float.
+"""
+import threading
+import time
+
+HALF_LIFE = 24 * 3600.0
+REBASE_AFTER = 30 * 24 * 3600.0
+# Scores this small at a rebase are dropped: a lone like gets there in 11 half-lives
+MIN_SCORE = 1e-3
+WEIGHTS = {"view": 1.0, "like": 2.0, "comment": 4.0}
+TOP_K = 200
+# Well below the 1024 half-lives where 2 ** exponent overflows
+MAX_EXPONENT = 2 * REBASE_AFTER / HALF_LIFE
+
+
+class TrendingIndex:
+    def __init__(self, db, clock=time.time):
+        self.db = db
+        self.clock = clock
+        self.epoch = None
+        self._pending = {}  # video id -> score to add
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _load_epoch(self):
+        row = self.db.fetchone("SELECT epoch FROM trending_state")
+        if row is None:
+            with self.db.transaction():
+                self.db.execute("INSERT OR IGNORE INTO trending_state (id, epoch) VALUES (0, ?)", (self.clock(),))
+            row = self.db.fetchone("SELECT epoch FROM trending_state")
+        return row[0]
+
+    def record(self, video_id, kind, count=1, when=None):
+        """Count ``count`` events of ``kind`` ("view", "like" or "comment"); no database work"""
+        when = self.clock() if when is None else when
+        if self._add(video_id, WEIGHTS[kind] * count, when):
+            return
+        # The epoch is too old to weigh this event against; the flush rebases it to now
+        self.flush()
+        if not self._add(video_id, WEIGHTS[kind] * count, when):
+            raise ValueError(f"Event time {when} is too far ahead of the trending epoch")
+
+    def _add(self, video_id, weight, when):
+        with self._lock:
+            if self.epoch is None:
+                self.epoch = self._load_epoch()
+            exponent = (when - self.epoch) / HALF_LIFE
+            if exponent > MAX_EXPONENT:
+                return False
+            self._pending[video_id] = self._pending.get(video_id, 0.0) + weight * 2 ** exponent
+            return True
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Add the buffered scores to the table; returns the number of videos updated"""
+        with self._flush_lock:
+            with self._lock:
+                if self.epoch is None:
+                    self.epoch = self._load_epoch()
+                pending, self._pending = self._pending, {}
+                epoch = self.epoch
+            now = self.clock()
+            rebase = now - epoch > REBASE_AFTER
+            factor = 2 ** ((epoch - now) / HALF_LIFE) if rebase else 1.0
+            try:
+                with self.db.transaction():
+                    if rebase:
+                        self.db.execute("UPDATE trending SET score = score * ?", (factor,))
+                        self.db.execute("DELETE FROM trending WHERE score < ?", (MIN_SCORE,))
+                        self.db.execute("UPDATE trending_state SET epoch = ?", (now,))
+                    if pending:
+                        self.db.executemany('''
+                            INSERT INTO trending (video_id, score) VALUES (?, ?)
+                            ON CONFLICT (video_id) DO UPDATE SET score = score + excluded.score
+                        ''', [(video_id, score * factor) for video_id, score in pending.items()])
+            except BaseException:
+                with self._lock:
+                    for video_id, score in pending.items():
+                        self._pending[video_id] = self._pending.get(video_id, 0.0) + score
+                raise
+            if rebase:
+                with self._lock:
+                    # Events recorded during the flush are still relative to the old epoch
+                    self._pending = {video_id: score * factor for video_id, score in self._pending.items()}
+                    self.epoch = now
+            return len(pending)
+
+    def top(self, limit=TOP_K):
+        """Ids of the ``limit`` highest scoring videos, best first"""
+        return [row[0] for row in self.db.fetchall(
+            "SELECT video_id FROM trending ORDER BY score DESC, video_id DESC LIMIT ?", (limit,)
+        )]